@@ -0,0 +1,52 @@
+"""
+Compares CSVReader's list-column parser with plain ast.literal_eval over every list cell
+of recipes.csv, and checks both give the same lists.
+
+    python -m benchmarks.parse_list_benchmark [path/to/recipes.csv]
+"""
+import csv
+import sys
+import time
+from ast import literal_eval
+from pathlib import Path
+
+from recipe.adapters.datareader.csvreader import parse_list
+
+DEFAULT_DATA_PATH = Path(__file__).resolve().parent.parent / "recipe" / "adapters" / "data" / "recipes.csv"
+LIST_COLUMNS = ("Images", "RecipeIngredientQuantities", "RecipeIngredientParts", "RecipeInstructions")
+
+
+def literal_eval_list(value: str) -> list:
+    # The parser CSVReader used before the tokenizer
+    if value == "None":
+        return []
+    try:
+        return literal_eval(value)
+    except (ValueError, SyntaxError):
+        return []
+
+
+def time_parser(parser, cells, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for cell in cells:
+            parser(cell)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(data_path: Path) -> None:
+    with open(data_path, encoding="utf-8") as f:
+        cells = [row[column] for row in csv.DictReader(f) for column in LIST_COLUMNS]
+
+    mismatches = sum(1 for cell in cells if parse_list(cell) != literal_eval_list(cell))
+    baseline = time_parser(literal_eval_list, cells)
+    tokenizer = time_parser(parse_list, cells)
+    print(f"{len(cells)} cells, {mismatches} mismatches")
+    print(f"literal_eval: {baseline:.3f}s")
+    print(f"parse_list:   {tokenizer:.3f}s ({baseline / tokenizer:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_DATA_PATH)
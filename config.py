@@ -21,4 +21,21 @@ class Config:
     SQLALCHEMY_ECHO = False
     if echo_string.lower().strip() == "true":
         SQLALCHEMY_ECHO = True
-    REPOSITORY = environ.get('REPOSITORY')
\ No newline at end of file
+    REPOSITORY = environ.get('REPOSITORY')
+
+    # Database repository connection pool: queue, singleton (one connection per thread) or null (no pooling)
+    DATABASE_POOL = environ.get('DATABASE_POOL', 'queue')
+    DATABASE_POOL_SIZE = int(environ.get('DATABASE_POOL_SIZE', 5))
+    DATABASE_POOL_MAX_OVERFLOW = int(environ.get('DATABASE_POOL_MAX_OVERFLOW', 10))
+    DATABASE_POOL_TIMEOUT = float(environ.get('DATABASE_POOL_TIMEOUT', 30))
+    # Set WAL journaling, synchronous=NORMAL, mmap, cache size and in-memory temp tables on each SQLite connection
+    tuning_string = environ.get('SQLITE_TUNING', 'True')
+    SQLITE_TUNING = tuning_string.lower().strip() == "true"
+
+    # Rows per executemany batch when an empty database is bulk populated
+    POPULATE_BATCH_SIZE = int(environ.get('POPULATE_BATCH_SIZE', 1000))
+    # Processes parsing the CSV file at startup, 1 reads it in the web process
+    POPULATE_WORKERS = int(environ.get('POPULATE_WORKERS', 1))
+    # Memory repository: cache the parsed csv rows in a snapshot file next to the csv
+    snapshot_string = environ.get('CATALOGUE_SNAPSHOT', 'True')
+    CATALOGUE_SNAPSHOT = snapshot_string.lower().strip() == "true"
\ No newline at end of file
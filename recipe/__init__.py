@@ -1,17 +1,17 @@
 """Initialize Flask app."""
-from flask import Flask, session
+from flask import Flask, request, session
 from pathlib import Path
 import recipe.adapters.repository as repo
 from recipe.adapters import memory_repository, repository_populate, database_repository
+from recipe.adapters.engine import PoolMetrics, create_database_engine
 from recipe.adapters.memory_repository import MemoryRepository
+from recipe.adapters.migrations import migrate
 from recipe.adapters.orm import map_model_to_tables, mapper_registry
-from recipe.adapters.repository_populate import populate
 from recipe.authentication.authentication import authentication_blueprint
 
 # imports from SQLAlchemy
-from sqlalchemy import create_engine, inspect
+from sqlalchemy import inspect
 from sqlalchemy.orm import sessionmaker, clear_mappers
-from sqlalchemy.pool import NullPool
 
 
 
@@ -25,8 +25,10 @@ def create_app(test_config=None):
 
     @app.before_request
     def check_session_user():
+        if request.endpoint == 'static':
+            return
         user_name = session.get("user_name")
-        if user_name and repo.repo_instance.get_user(user_name) is None:
+        if user_name and not repo.repo_instance.user_exists(user_name):
             session.clear()  # invalidate cookie if user no longer exists
 
 
@@ -42,21 +44,33 @@ def create_app(test_config=None):
         repo.repo_instance = memory_repository.MemoryRepository()
         # fill the content of the repository from the provided csv files (has to be done every time we start app!)
         database_mode = False
-        repository_populate.populate(data_path, repo.repo_instance, database_mode)
+        snapshot_path = None
+        if app.config['CATALOGUE_SNAPSHOT']:
+            # parsed rows are cached next to the csv file, so later starts skip parsing it
+            snapshot_path = Path(data_path).with_name(Path(data_path).name + '.snapshot')
+        repository_populate.populate(data_path, repo.repo_instance, database_mode,
+                                     workers=app.config['POPULATE_WORKERS'], snapshot_path=snapshot_path)
 
     elif app.config['REPOSITORY'] == 'database':
         # Configure database.
         database_uri = app.config['SQLALCHEMY_DATABASE_URI']
 
         database_echo = app.config['SQLALCHEMY_ECHO']
-        database_engine = create_engine(database_uri, connect_args={"check_same_thread": False}, poolclass=NullPool,
-                                        echo=database_echo)
+        database_engine = create_database_engine(
+            database_uri, echo=database_echo, pool=app.config['DATABASE_POOL'],
+            pool_size=app.config['DATABASE_POOL_SIZE'], max_overflow=app.config['DATABASE_POOL_MAX_OVERFLOW'],
+            pool_timeout=app.config['DATABASE_POOL_TIMEOUT'], pragmas=None if app.config['SQLITE_TUNING'] else {})
+        # Checkout counts and connection times of the pool, read with app.extensions['pool_metrics'].as_dict()
+        app.extensions['pool_metrics'] = PoolMetrics().install(database_engine)
 
         # Create the database session factory using sessionmaker (this has to be done once, in a global manner)
         session_factory = sessionmaker(autocommit=False, autoflush=True, bind=database_engine)
         # Create the SQLAlchemy DatabaseRepository instance for an sqlite3-based repository.
         repo.repo_instance = database_repository.SqlAlchemyRepository(session_factory)
 
+        # Bring a database written by an earlier version up to the current schema
+        migrate(database_engine)
+
         if app.config['TESTING'] == 'True' or len(database_engine.table_names()) == 0:
             print("REPOPULATING DATABASE...")
             # For testing, or first-time use of the web application, reinitialise the database.
@@ -69,21 +83,21 @@ def create_app(test_config=None):
             map_model_to_tables()
 
             database_mode = True
-            repository_populate.populate(data_path, repo.repo_instance, database_mode)
+            repository_populate.populate(data_path, repo.repo_instance, database_mode, bulk=True,
+                                         batch_size=app.config['POPULATE_BATCH_SIZE'],
+                                         workers=app.config['POPULATE_WORKERS'])
             print("REPOPULATING DATABASE... FINISHED")
 
         else:
             # Solely generate mappings that map domain model classes to the database tables.
             map_model_to_tables()
 
-    populate(data_path, repo.repo_instance, database_mode)
-
     with app.app_context():
         from recipe.home.home import home_blueprint
         from recipe.browse.browse import browse_blueprint
         from recipe.recipe_detail.recipe_detail import recipe_blueprint
         from recipe.authentication.authentication import authentication_blueprint
-        from recipe.search_function.search_function import search_blueprint
+        from recipe.search_function.search_function import search_blueprint, search_service
         from recipe.favorites.favorite import favorite_blueprint
 
         app.register_blueprint(home_blueprint)
@@ -92,6 +106,8 @@ def create_app(test_config=None):
         app.register_blueprint(authentication_blueprint)
         app.register_blueprint(search_blueprint)
         app.register_blueprint(favorite_blueprint)
+        # Hit and miss counts of the search result cache, read with app.extensions['search_cache'].cache_stats()
+        app.extensions['search_cache'] = search_service
 
         # Register a callback the makes sure that database sessions are associated with http requests
         # We reset the session inside the database repository before a new flask request is generated
@@ -106,15 +122,4 @@ def create_app(test_config=None):
             if isinstance(repo.repo_instance, database_repository.SqlAlchemyRepository):
                 repo.repo_instance.close_session()
 
-        # Provides full lists of recipes for search suggestions
-        @app.context_processor
-        def inject_search_data():
-            recipes = repo.repo_instance.get_recipes(2, 3, "s")
-            categories = sorted({r.category.name for r in recipes})
-            names = sorted({r.name for r in recipes})
-            authors = sorted({r.author.name for r in recipes})
-            ingredients = sorted({ing for r in recipes for ing in getattr(r, "ingredients", [])})
-
-            return dict(categories=categories, names=names, authors=authors, ingredients=ingredients)
-
-    return app
\ No newline at end of file
+    return app
@@ -0,0 +1,138 @@
+import time
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+from recipe.adapters.orm import (
+    authors_table, categories_table, recipe_table, nutrition_table, image_table, ingredient_table, instruction_table
+)
+from recipe.domainmodel.author import Author
+from recipe.domainmodel.category import Category
+from recipe.domainmodel.nutrition import Nutrition
+from recipe.domainmodel.recipe import Recipe
+from recipe.domainmodel.recipe_image import RecipeImage
+from recipe.domainmodel.recipe_ingredient import RecipeIngredient
+from recipe.domainmodel.recipe_instruction import RecipeInstruction
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Parents come before the tables referencing them, buffers are always flushed in this order
+TABLES_IN_INSERT_ORDER = (
+    authors_table, categories_table, recipe_table, nutrition_table, image_table, ingredient_table, instruction_table
+)
+
+
+class BulkLoader:
+    """
+    Writes domain objects straight to the tables with Core INSERT ... ON CONFLICT DO NOTHING
+    statements, executed as executemany batches of batch_size rows on one connection.
+    Rows whose primary key already exists are skipped. Images, ingredients and instructions
+    have generated ids that never conflict, so those of recipes already stored when the
+    loader was created are dropped instead, and loading the same data again adds nothing.
+    """
+
+    def __init__(self, connection, batch_size: int = DEFAULT_BATCH_SIZE):
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive int.")
+        self.__connection = connection
+        self.__batch_size = batch_size
+        self.__stored_recipe_ids = set(connection.execute(select(recipe_table.c.id)).scalars())
+        self.__buffers = {table.name: [] for table in TABLES_IN_INSERT_ORDER}
+        self.__buffered = 0
+        self.__rows_written = 0
+        self.__started = time.perf_counter()
+        self.__elapsed = 0.0
+
+    @property
+    def rows_written(self) -> int:
+        """ Rows inserted, the ones skipped as duplicates are not counted. """
+        return self.__rows_written
+
+    @property
+    def elapsed(self) -> float:
+        """ Seconds spent between creating the loader and the last flush. """
+        return self.__elapsed
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.__rows_written / self.__elapsed if self.__elapsed > 0 else 0.0
+
+    def add_author(self, author: Author) -> None:
+        self.__add(authors_table, {'id': author.id, 'name': author.name})
+
+    def add_category(self, category: Category) -> None:
+        self.__add(categories_table, {'id': category.id, 'name': category.name})
+
+    def add_recipe(self, recipe: Recipe) -> None:
+        self.__add(recipe_table, {
+            'id': recipe.id,
+            'name': recipe.name,
+            'author_id': recipe.author.id,
+            'cook_time': recipe.cook_time,
+            'preparation_time': recipe.preparation_time,
+            'date': recipe.date,
+            'description': recipe.description,
+            'category_id': recipe.category.id if recipe.category is not None else None,
+            'rating': recipe.rating,
+            'servings': recipe.servings,
+            'recipe_yield': recipe.recipe_yield,
+        })
+
+    def add_nutrition(self, nutrition: Nutrition) -> None:
+        # nutrition ids are recipe ids
+        self.__add(nutrition_table, {
+            'id': nutrition.id,
+            'recipe_id': nutrition.id,
+            'calories': nutrition.calories,
+            'fat': nutrition.fat,
+            'saturated_fat': nutrition.saturated_fat,
+            'cholesterol': nutrition.cholesterol,
+            'sodium': nutrition.sodium,
+            'carbohydrates': nutrition.carbohydrates,
+            'fiber': nutrition.fiber,
+            'sugar': nutrition.sugar,
+            'protein': nutrition.protein,
+            'health_stars': nutrition.health_stars,
+        })
+
+    def add_image(self, image: RecipeImage) -> None:
+        if image.recipe_id in self.__stored_recipe_ids:
+            return
+        self.__add(image_table, {'recipe_id': image.recipe_id, 'url': image.url, 'position': image.position})
+
+    def add_ingredient(self, ingredient: RecipeIngredient) -> None:
+        if ingredient.recipe_id in self.__stored_recipe_ids:
+            return
+        self.__add(ingredient_table, {
+            'recipe_id': ingredient.recipe_id,
+            'ingredient': ingredient.ingredient,
+            'quantity': ingredient.quantity,
+            'position': ingredient.position,
+        })
+
+    def add_instruction(self, instruction: RecipeInstruction) -> None:
+        if instruction.recipe_id in self.__stored_recipe_ids:
+            return
+        self.__add(instruction_table, {
+            'recipe_id': instruction.recipe_id,
+            'step': instruction.step,
+            'position': instruction.position,
+        })
+
+    def __add(self, table, row: dict) -> None:
+        self.__buffers[table.name].append(row)
+        self.__buffered += 1
+        if self.__buffered >= self.__batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """ Writes every buffered row, parents first so foreign keys always resolve. """
+        for table in TABLES_IN_INSERT_ORDER:
+            rows = self.__buffers[table.name]
+            if rows:
+                result = self.__connection.execute(insert(table).on_conflict_do_nothing(), rows)
+                # sums the changes of every row, so rows skipped by ON CONFLICT DO NOTHING add nothing
+                self.__rows_written += max(0, result.rowcount)
+                self.__buffers[table.name] = []
+        self.__buffered = 0
+        self.__elapsed = time.perf_counter() - self.__started
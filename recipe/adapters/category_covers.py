@@ -0,0 +1,31 @@
+from typing import Dict
+
+from recipe.adapters.sorted_views import fold_name
+
+
+class CategoryCovers:
+    """
+    Per category name: the first image of its first recipe by name (case-insensitive, ties
+    go to the recipe added first). Recipes are added one at a time, so the map never needs
+    a pass over the whole catalogue.
+    """
+
+    def __init__(self):
+        # category name -> ((lowercase recipe name, insertion order), image url or None)
+        self.__covers = {}
+        self.__added = 0
+
+    def clear(self) -> None:
+        self.__covers.clear()
+        self.__added = 0
+
+    def add(self, category_name: str, recipe_name: str, image_url: str | None) -> None:
+        key = (fold_name(recipe_name), self.__added)
+        self.__added += 1
+        current = self.__covers.get(category_name)
+        if current is None or key < current[0]:
+            self.__covers[category_name] = (key, image_url)
+
+    def cover_images(self) -> Dict[str, str | None]:
+        """ Image of each category's first recipe, None when that recipe has no image. """
+        return {category_name: image_url for category_name, (_, image_url) in self.__covers.items()}
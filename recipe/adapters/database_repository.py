@@ -1,13 +1,26 @@
+from contextlib import contextmanager
 from datetime import date
 from pathlib import Path
-from typing import List
+from typing import Iterator, List
 
-from sqlalchemy import desc, asc
+from sqlalchemy import desc, asc, distinct, func, and_, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm.exc import NoResultFound
 
-from sqlalchemy.orm import scoped_session
+from sqlalchemy.orm import scoped_session, selectinload, joinedload, lazyload
 
+from recipe.adapters import fulltext
+from recipe.adapters.bulk_loader import BulkLoader, DEFAULT_BATCH_SIZE
+from recipe.adapters.category_covers import CategoryCovers
+from recipe.adapters.orm import (
+    authors_table, catalogue_table, categories_table, favorite_table, ingredient_table, recipe_table, review_table,
+    user_table
+)
+from recipe.adapters.related_recipes import RELATED_RECIPES_LIMIT, RelatedRecipesIndex
 from recipe.adapters.repository import AbstractRepository
+from recipe.adapters.search_index import SEARCH_FIELDS, SORT_ALPHABETICAL, SearchPage, resolve_search_sort
+from recipe.adapters.sorted_views import resolve_sort_method
+from recipe.adapters.ttl_cache import TTLCache
 from recipe.domainmodel.author import Author
 from recipe.domainmodel.category import Category
 from recipe.domainmodel.favourite import Favourite
@@ -20,6 +33,25 @@ from recipe.domainmodel.review import Review
 from recipe.domainmodel.user import User
 
 
+# SQLite limits the number of bound parameters, so IN (...) lists are split into chunks of this size
+IN_CLAUSE_CHUNK_SIZE = 500
+
+# Usernames remembered as existing. A user removed through another process is noticed
+# at most KNOWN_USERS_CACHE_TTL seconds later.
+KNOWN_USERS_CACHE_SIZE = 1024
+KNOWN_USERS_CACHE_TTL = 60
+
+# Loader strategies for the image, ingredient and instruction relationships of Recipe.
+# selectin batches the children of every loaded recipe into IN (...) queries, joined loads them
+# in the same statement (best for a single recipe), lazy loads each collection on first access.
+CHILD_LOADERS = {
+    'selectin': selectinload,
+    'joined': joinedload,
+    'lazy': lazyload,
+}
+RECIPE_CHILD_RELATIONSHIPS = ('_Recipe__image_rows', '_Recipe__ingredient_rows', '_Recipe__instruction_rows')
+
+
 class SessionContextManager:
     def __init__(self, session_factory):
         self.__session_factory = session_factory
@@ -43,9 +75,9 @@ class SessionContextManager:
 
     def reset_session(self):
         # this method can be used e.g. to allow Flask to start a new session for each http request,
-        # via the 'before_request' callback
-        self.close_current_session()
-        self.__session = scoped_session(self.__session_factory)
+        # via the 'before_request' callback. remove() closes this thread's session, which returns its
+        # connection to the pool, and keeps the registry other threads are using.
+        self.__session.remove()
 
     def close_current_session(self):
         if not self.__session is None:
@@ -56,8 +88,17 @@ class SessionContextManager:
 
 class SqlAlchemyRepository(AbstractRepository):
 
-    def __init__(self, session_factory):
+    def __init__(self, session_factory, child_loading: str = 'selectin'):
+        if child_loading not in CHILD_LOADERS:
+            raise ValueError(f"child_loading must be one of {', '.join(CHILD_LOADERS)}")
         self._session_cm = SessionContextManager(session_factory)
+        self._child_loading = child_loading
+        # Category cover images and recipe counts, built lazily after each population
+        self._category_covers: CategoryCovers | None = None
+        # Ingredients and category of every recipe for related recipes, built lazily after each population
+        self._related_recipes: RelatedRecipesIndex | None = None
+        # Usernames known to exist, so validating a session cookie is usually not a query
+        self._known_users = TTLCache(KNOWN_USERS_CACHE_SIZE, KNOWN_USERS_CACHE_TTL)
 
     def close_session(self):
         self._session_cm.close_current_session()
@@ -88,6 +129,24 @@ class SqlAlchemyRepository(AbstractRepository):
             print(f'User {user_name} was not found')
         return user
 
+    def user_exists(self, user_name: str) -> bool:
+        if self._known_users.get(user_name):
+            return True
+        # Only the primary key is selected, the user and its relationships are not loaded
+        exists = self._session_cm.session.query(User._User__username).filter(
+            User._User__username == user_name
+        ).first() is not None
+        if exists:
+            self._known_users.put(user_name, True)
+        return exists
+
+    def remove_user(self, user_name: str):
+        with self._session_cm as scm:
+            for table in (favorite_table, review_table, user_table):
+                scm.session.execute(table.delete().where(table.c.username == user_name))
+            scm.commit()
+        self._known_users.discard(user_name)
+
 
     def add_review(self, review: Review):
         with self._session_cm as scm:
@@ -142,14 +201,15 @@ class SqlAlchemyRepository(AbstractRepository):
         return favourites
 
     """----------------------Recipe actions----------------------"""
-    def get_all_recipes(self) -> List[Recipe]:
-        with self._session_cm as scm:
-            recipes: list[Recipe] = scm.session.query(Recipe).all()
-            for recipe in recipes:
-                self._populate_recipe_data_in_session(recipe, scm.session)
-            return recipes
-
-    def get_recipes(self, page: int, page_size: int, sort_method: str) -> List[Recipe]:
+    def get_all_recipes(self, child_loading: str = None) -> List[Recipe]:
+        # Reads don't go through the session context manager: its rollback would expire
+        # every loaded recipe and make each one reload itself on next attribute access.
+        session = self._session_cm.session
+        recipes: list[Recipe] = self._recipe_query(session, child_loading).all()
+        self._populate_recipes_data_in_session(recipes, session)
+        return recipes
+
+    def get_recipes(self, page: int, page_size: int, sort_method: str, child_loading: str = None) -> List[Recipe]:
         # Sanitize pagination inputs
         if page is None or page < 1:
             page = 1
@@ -157,30 +217,59 @@ class SqlAlchemyRepository(AbstractRepository):
             page_size = 10
         offset = (page - 1) * page_size
 
-        with self._session_cm as scm:
-            q = scm.session.query(Recipe)
-
-            # Basic sort options supported by current schema
-            sort_method = (sort_method or 'name').lower()
-            if sort_method in ('name', 'name_asc'):
-                q = q.order_by(Recipe._Recipe__name.asc(), Recipe._Recipe__id.asc())
-            elif sort_method in ('name_desc', 'desc_name'):
-                q = q.order_by(Recipe._Recipe__name.desc(), Recipe._Recipe__id.asc())
-            elif sort_method in ('id', 'id_asc'):
-                q = q.order_by(Recipe._Recipe__id.asc())
-            elif sort_method in ('id_desc', 'desc_id'):
-                q = q.order_by(Recipe._Recipe__id.desc())
-            else:
-                # Fallback to name ascending if unknown
-                q = q.order_by(Recipe._Recipe__name.asc(), Recipe._Recipe__id.asc())
-
-            recipes: List[Recipe] = q.offset(offset).limit(page_size).all()
-
-            # Populate related data (images, ingredients, instructions, etc.)
-            for r in recipes:
-                self._populate_recipe_data_in_session(r, scm.session)
-
-            return recipes
+        session = self._session_cm.session
+        q = self._recipe_query(session, child_loading)
+
+        # Basic sort options supported by current schema, names compare case-insensitively
+        sort_method = (sort_method or 'name').lower()
+        name = func.lower(Recipe._Recipe__name)
+        if sort_method in ('name', 'name_asc'):
+            q = q.order_by(name.asc(), Recipe._Recipe__id.asc())
+        elif sort_method in ('name_desc', 'desc_name'):
+            q = q.order_by(name.desc(), Recipe._Recipe__id.asc())
+        elif sort_method in ('id', 'id_asc'):
+            q = q.order_by(Recipe._Recipe__id.asc())
+        elif sort_method in ('id_desc', 'desc_id'):
+            q = q.order_by(Recipe._Recipe__id.desc())
+        else:
+            # Fallback to name ascending if unknown
+            q = q.order_by(name.asc(), Recipe._Recipe__id.asc())
+
+        recipes: List[Recipe] = q.offset(offset).limit(page_size).all()
+
+        # Populate related data (images, ingredients, instructions, etc.)
+        self._populate_recipes_data_in_session(recipes, session)
+
+        return recipes
+
+    def count_recipes(self) -> int:
+        return self._session_cm.session.query(func.count(Recipe._Recipe__id)).scalar()
+
+    def get_recipes_after(self, after: tuple | None, page_size: int, sort_method: str,
+                          child_loading: str = None) -> List[Recipe]:
+        if page_size is None or page_size < 1:
+            page_size = 10
+
+        session = self._session_cm.session
+        q = self._recipe_query(session, child_loading)
+        recipe_id, name = Recipe._Recipe__id, func.lower(Recipe._Recipe__name)
+
+        # Seek past the cursor with a WHERE clause instead of OFFSET, same orders as get_recipes
+        view, backwards = resolve_sort_method(sort_method)
+        if view == 'id':
+            if after is not None:
+                q = q.filter(recipe_id < after[1] if backwards else recipe_id > after[1])
+            q = q.order_by(recipe_id.desc() if backwards else recipe_id.asc())
+        else:
+            if after is not None:
+                value, last_id = after
+                q = q.filter(or_(name < value if backwards else name > value,
+                                 and_(name == value, recipe_id > last_id)))
+            q = q.order_by(name.desc() if backwards else name.asc(), recipe_id.asc())
+
+        recipes: List[Recipe] = q.limit(page_size).all()
+        self._populate_recipes_data_in_session(recipes, session)
+        return recipes
 
     def get_authors(self) -> dict[int, Author]:
         query = self._session_cm.session.query(Author)
@@ -188,6 +277,45 @@ class SqlAlchemyRepository(AbstractRepository):
         dic = {i.id: i for i in authors}
         return dic
 
+    def get_category_cover_images(self) -> dict[str, str | None]:
+        return self._get_category_covers().cover_images()
+
+    def _get_category_covers(self) -> CategoryCovers:
+        if self._category_covers is None:
+            covers = CategoryCovers()
+            # One row per recipe with its first image, no recipe objects are loaded
+            rows = self._session_cm.session.query(
+                Category._Category__name, Recipe._Recipe__name, RecipeImage._RecipeImage__url
+            ).select_from(Recipe).join(Category, Recipe._Recipe__category).outerjoin(
+                RecipeImage, and_(RecipeImage._RecipeImage__recipe_id == Recipe._Recipe__id,
+                                  RecipeImage._RecipeImage__position == 0)
+            ).order_by(Recipe._Recipe__id)
+            for category_name, recipe_name, image_url in rows:
+                covers.add(category_name, recipe_name, image_url)
+            self._category_covers = covers
+        return self._category_covers
+
+    def get_related_recipes(self, recipe_id: int, limit: int = RELATED_RECIPES_LIMIT) -> List[Recipe]:
+        return self.get_recipes_by_ids(self._get_related_recipes().related(recipe_id, limit))
+
+    def _get_related_recipes(self) -> RelatedRecipesIndex:
+        if self._related_recipes is None:
+            index = RelatedRecipesIndex()
+            # Only ingredient names and category ids are selected, no recipe objects are loaded
+            ingredients: dict[int, list[str]] = {}
+            ingredient_rows = self._session_cm.session.query(
+                RecipeIngredient._RecipeIngredient__recipe_id, RecipeIngredient._RecipeIngredient__ingredient
+            )
+            for recipe_id, ingredient in ingredient_rows:
+                ingredients.setdefault(recipe_id, []).append(ingredient)
+            recipe_rows = self._session_cm.session.query(
+                Recipe._Recipe__id, recipe_table.c.category_id
+            ).order_by(Recipe._Recipe__id)
+            for recipe_id, category_id in recipe_rows:
+                index.add_entry(recipe_id, category_id, ingredients.get(recipe_id, []))
+            self._related_recipes = index
+        return self._related_recipes
+
     def get_categories(self) -> dict[str, Category]:
         with self._session_cm as scm:
             categories: list[Category] = scm.session.query(Category).all()
@@ -202,12 +330,23 @@ class SqlAlchemyRepository(AbstractRepository):
                 )
                 if recipe not in query.all():
                     scm.session.merge(recipe)
+                    fulltext.index_recipe(scm.session.connection(), recipe.id, recipe.name,
+                                          recipe.category.name if recipe.category is not None else "",
+                                          recipe.author.name if recipe.author is not None else "",
+                                          recipe.ingredients)
+                    self._bump_catalogue_generation(scm.session)
                     scm.commit()
-
-    def get_recipe_by_id(self, recipe_id: int) -> Recipe:
+                    if self._category_covers is not None and recipe.category is not None:
+                        self._category_covers.add(recipe.category.name, recipe.name,
+                                                  recipe.images[0] if recipe.images else None)
+                    if self._related_recipes is not None:
+                        self._related_recipes.add_entry(recipe.id, recipe.category.id if recipe.category else None,
+                                                        recipe.ingredients)
+
+    def get_recipe_by_id(self, recipe_id: int, child_loading: str = None) -> Recipe:
         recipe = None
         try:
-            query = self._session_cm.session.query(Recipe).filter(
+            query = self._recipe_query(self._session_cm.session, child_loading).filter(
                 Recipe._Recipe__id == recipe_id
             )
             recipe = query.one()
@@ -224,6 +363,92 @@ class SqlAlchemyRepository(AbstractRepository):
         nutri = query.one()
         return nutri
 
+    def get_nutrition_by_recipe_ids(self, recipe_ids: List[int]) -> dict[int, Nutrition]:
+        session = self._session_cm.session
+        unique_ids = list(dict.fromkeys(recipe_ids))
+        nutrition: dict[int, Nutrition] = {}
+        for start in range(0, len(unique_ids), IN_CLAUSE_CHUNK_SIZE):
+            rows = session.query(Nutrition).filter(
+                Nutrition._Nutrition__id.in_(unique_ids[start:start + IN_CLAUSE_CHUNK_SIZE])
+            )
+            nutrition.update((n.id, n) for n in rows)
+        return nutrition
+
+    def get_recipes_by_ids(self, recipe_ids: List[int], child_loading: str = None) -> List[Recipe]:
+        if not recipe_ids:
+            return []
+        session = self._session_cm.session
+        unique_ids = list(dict.fromkeys(recipe_ids))
+        recipes: list[Recipe] = []
+        for start in range(0, len(unique_ids), IN_CLAUSE_CHUNK_SIZE):
+            recipes.extend(self._recipe_query(session, child_loading).filter(
+                Recipe._Recipe__id.in_(unique_ids[start:start + IN_CLAUSE_CHUNK_SIZE])
+            ).all())
+        self._populate_recipes_data_in_session(recipes, session)
+        by_id = {recipe.id: recipe for recipe in recipes}
+        return [by_id[i] for i in recipe_ids if i in by_id]
+
+    """----------------------Search----------------------"""
+    def search_recipe_page(self, query: str, filter_by: str, offset: int, limit: int,
+                           after: tuple | None = None, sort_by: str | None = None) -> SearchPage:
+        # Matching, ranking and paging all run in SQLite, only the page's ids come back
+        order_by = None
+        if resolve_search_sort(query, sort_by) == SORT_ALPHABETICAL:
+            order_by = filter_by if filter_by in SEARCH_FIELDS else 'name'
+        connection = self._session_cm.session.connection()
+        match = fulltext.match_expression(query, filter_by)
+        if match is None:
+            # Blank queries and queries with a unary NOT, which FTS5 cannot run on its own
+            return fulltext.recipe_page(connection, query, filter_by, offset, limit, after, order_by)
+        return fulltext.search_page(connection, match, offset, limit, after, order_by)
+
+    def rebuild_fulltext_index(self) -> None:
+        """ Refills the full-text table from the recipe tables, run once a population has finished. """
+        with self._session_cm as scm:
+            fulltext.rebuild_fulltext(scm.session.connection())
+            self._bump_catalogue_generation(scm.session)
+            scm.commit()
+
+    def get_catalogue_generation(self) -> int:
+        # Read from the database, so every process sees the writes of the others
+        generation = self._session_cm.session.execute(
+            select(catalogue_table.c.generation).where(catalogue_table.c.id == 1)
+        ).scalar()
+        return generation or 0
+
+    @staticmethod
+    def _bump_catalogue_generation(session) -> None:
+        """ Bumps the catalogue generation as part of the session's pending transaction. """
+        upsert = sqlite_insert(catalogue_table).values(id=1, generation=1)
+        session.execute(upsert.on_conflict_do_update(
+            index_elements=[catalogue_table.c.id], set_={'generation': catalogue_table.c.generation + 1}
+        ))
+
+    def get_search_completions(self, prefix: str, group: str, limit: int = 10) -> List[str]:
+        prefix = (prefix or "").strip().lower()
+        if not prefix or limit < 1:
+            return []
+        value, recipe_id, source = self._completion_source(group)
+        # a range on the lowercase value, so the lower() index is searched instead of scanned
+        folded = func.lower(value)
+        query = select(value).select_from(source).where(folded >= prefix, folded < prefix + "\uffff").group_by(
+            value
+        ).order_by(func.count(distinct(recipe_id)).desc(), folded, value).limit(limit)
+        return list(self._session_cm.session.execute(query).scalars())
+
+    @staticmethod
+    def _completion_source(group: str):
+        """ (value column, recipe id column, table) of a suggestion group, counting only values recipes use. """
+        if group == 'names':
+            return recipe_table.c.name, recipe_table.c.id, recipe_table
+        if group == 'categories':
+            return categories_table.c.name, recipe_table.c.id, categories_table.join(
+                recipe_table, recipe_table.c.category_id == categories_table.c.id)
+        if group == 'authors':
+            return authors_table.c.name, recipe_table.c.id, authors_table.join(
+                recipe_table, recipe_table.c.author_id == authors_table.c.id)
+        return ingredient_table.c.ingredient, ingredient_table.c.recipe_id, ingredient_table
+
 
 
 
@@ -236,6 +461,7 @@ class SqlAlchemyRepository(AbstractRepository):
                 )
                 if category not in query.all():
                     scm.session.add(category)
+                    self._bump_catalogue_generation(scm.session)
                     scm.commit()
 
     def add_nutrition(self, id: str, nutri: Nutrition) -> None:
@@ -256,6 +482,7 @@ class SqlAlchemyRepository(AbstractRepository):
                 )
                 if author not in query.all():
                     scm.session.add(author)
+                    self._bump_catalogue_generation(scm.session)
                     scm.commit()
 
     def add_instruction(self, instruction: RecipeInstruction) -> None:
@@ -286,6 +513,7 @@ class SqlAlchemyRepository(AbstractRepository):
                 )
                 if ingredient not in query.all():
                     scm.session.add(ingredient)
+                    self._bump_catalogue_generation(scm.session)
                     scm.commit()
 
     def add_multiple_instruction(self, instruction: list[RecipeInstruction]) -> None:
@@ -316,6 +544,7 @@ class SqlAlchemyRepository(AbstractRepository):
                 )
                 if not existing_ingredient:
                     scm.session.add(i)
+            self._bump_catalogue_generation(scm.session)
             scm.commit()
 
     def add_multiple_category(self, category: dict[str, Category]) -> None:
@@ -326,6 +555,7 @@ class SqlAlchemyRepository(AbstractRepository):
                 ).first()
                 if not existing_category:
                     scm.session.merge(category[i])
+            self._bump_catalogue_generation(scm.session)
             scm.commit()
 
     def add_multiple_nutrition(self, nutri: dict[int, Nutrition]) -> None:
@@ -346,6 +576,7 @@ class SqlAlchemyRepository(AbstractRepository):
                 ).first()
                 if not existing_author:
                     scm.session.merge(author[i])
+            self._bump_catalogue_generation(scm.session)
             scm.commit()
 
     def add_multiple_image(self, image: list[RecipeImage]) -> None:
@@ -369,44 +600,66 @@ class SqlAlchemyRepository(AbstractRepository):
                 existing_recipe = scm.session.query(Recipe).filter(Recipe._Recipe__id == i.id).first()
                 if not existing_recipe:
                     scm.session.merge(i)
+            self._bump_catalogue_generation(scm.session)
             scm.commit()
-
+        # Ingredients are stored separately, so rebuild the lookups from the database on next use
+        self._category_covers = None
+        self._related_recipes = None
+
+
+    @contextmanager
+    def bulk_loader(self, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[BulkLoader]:
+        """
+        Yields a BulkLoader writing through this repository's connection. Everything loaded
+        is committed in a single transaction.
+        """
+        session = self._session_cm.session
+        loader = BulkLoader(session.connection(), batch_size)
+        try:
+            yield loader
+            loader.flush()
+            self._bump_catalogue_generation(session)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self._category_covers = None
+            self._related_recipes = None
 
     """-----------------------populate data-------------------"""
     def _populate_recipe_data(self, recipe: Recipe) -> None:
         if recipe is None:
             return
-        # Use the same session context
-        with self._session_cm as scm:
-            self._populate_recipe_data_in_session(recipe, scm.session)
+        self._populate_recipe_data_in_session(recipe, self._session_cm.session)
 
     def _populate_recipe_data_in_session(self, recipe: Recipe, session):
         if recipe is None:
             return
-
-        # Load and populate images
-        recipe_images = session.query(RecipeImage).filter(
-            RecipeImage._RecipeImage__recipe_id == recipe.id
-        ).order_by(RecipeImage._RecipeImage__position).all()
-
-        if recipe_images:
-            image_urls = [img.url for img in recipe_images]
-            recipe._Recipe__images = image_urls
-        else:
-            print(f"DEBUG: No images found for recipe {recipe.id}")
-
-        # Load and populate ingredient
-        recipe_ingredients = session.query(RecipeIngredient).filter(
-            RecipeIngredient._RecipeIngredient__recipe_id == recipe.id
-        ).order_by(RecipeIngredient._RecipeIngredient__position).all()
-
-        if recipe_ingredients:
-            recipe._Recipe__ingredients = [i.ingredient for i in recipe_ingredients]
-            recipe._Recipe__ingredient_quantities = [i.quantity for i in recipe_ingredients]
-
-        # Load and populate instruction
-        recipe_instructions = session.query(RecipeInstruction).filter(
-            RecipeInstruction._RecipeInstruction__recipe_id == recipe.id
-        ).order_by(RecipeInstruction._RecipeInstruction__position).all()
-        if recipe_instructions:
-            recipe._Recipe__instructions = [i.step for i in recipe_instructions]
+        self._populate_recipes_data_in_session([recipe], session)
+
+    def _populate_recipes_data_in_session(self, recipes: List[Recipe], session):
+        """
+        Copies the image, ingredient and instruction relationships onto the domain attributes.
+        Collections already loaded by the query's loader strategy cost no further queries.
+        """
+        for recipe in recipes:
+            if recipe is None:
+                continue
+            recipe._Recipe__images = [img.url for img in recipe._Recipe__image_rows]
+
+            ingredient_rows = recipe._Recipe__ingredient_rows
+            recipe._Recipe__ingredients = [i.ingredient for i in ingredient_rows]
+            recipe._Recipe__ingredient_quantities = [i.quantity for i in ingredient_rows]
+
+            recipe._Recipe__instructions = [i.step for i in recipe._Recipe__instruction_rows]
+
+    def _recipe_query(self, session, child_loading: str = None):
+        """ Recipe query loading the child relationships with the given (or the default) strategy. """
+        child_loading = child_loading or self._child_loading
+        if child_loading not in CHILD_LOADERS:
+            raise ValueError(f"child_loading must be one of {', '.join(CHILD_LOADERS)}")
+        loader = CHILD_LOADERS[child_loading]
+        return session.query(Recipe).options(
+            *(loader(getattr(Recipe, name)) for name in RECIPE_CHILD_RELATIONSHIPS)
+        )
@@ -1,13 +1,18 @@
 from __future__ import annotations
 
 import csv
+import io
+import re
 from ast import literal_eval
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from tkinter import Image
-from typing import List
+from typing import BinaryIO, Iterator, List, NamedTuple
 from dateutil import parser as date_parser
 
+from recipe.adapters.datareader import snapshot
 from recipe.domainmodel.recipe import Recipe
 from recipe.domainmodel.author import Author
 from recipe.domainmodel.nutrition import Nutrition
@@ -17,6 +22,184 @@ from recipe.domainmodel.recipe_ingredient import RecipeIngredient
 from recipe.domainmodel.recipe_instruction import RecipeInstruction
 
 
+class RecipeBundle(NamedTuple):
+    """Domain objects read from one CSV row."""
+    recipe: Recipe
+    nutrition: Nutrition
+    images: list[RecipeImage]
+    ingredients: list[RecipeIngredient]
+    instructions: list[RecipeInstruction]
+
+
+class RecipeRow(NamedTuple):
+    """Parsed values of one CSV row, made of plain types so it can cross process boundaries."""
+    recipe_id: int
+    name: str
+    author_id: int
+    author_name: str
+    category: str
+    cook_time: int
+    preparation_time: int
+    created_date: datetime | None
+    description: str
+    servings: str | None
+    recipe_yield: str | None
+    nutrition: dict
+    image_urls: list[str]
+    ingredient_quantities: list[str]
+    ingredient_parts: list[str]
+    instruction_steps: list[str]
+
+
+# Nutrition keyword arguments and the CSV columns holding them
+NUTRITION_COLUMNS = {
+    'calories': "Calories",
+    'fat': "FatContent",
+    'saturated_fat': "SaturatedFatContent",
+    'cholesterol': "CholesterolContent",
+    'sodium': "SodiumContent",
+    'carbohydrates': "CarbohydrateContent",
+    'fiber': "FiberContent",
+    'sugar': "SugarContent",
+    'protein': "ProteinContent",
+}
+
+# Bumped whenever parse_row changes the values it produces, so older snapshots are not reused
+PARSER_VERSION = 1
+
+# What a snapshot must have been written for to hold RecipeRow values
+ROW_LAYOUT = f"{PARSER_VERSION}:{','.join(RecipeRow._fields)}"
+
+# Bytes of the CSV parsed by a worker process at a time
+CHUNK_BYTES = 256 * 1024
+
+# Chunks queued per worker process, more than one so slow chunks even out; the rest of the
+# file is only split once these are done, which bounds memory whatever the file size
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+# Cell values standing for an empty list
+EMPTY_LIST_SENTINELS = frozenset({"", "None", "NA", "[]", "character(0)"})
+
+# One quoted item of a Python list of strings without escape sequences, and what follows it
+_LIST_ITEM = re.compile(r"""\s*(?:'([^'\\]*)'|"([^"\\]*)")\s*([,\]])""")
+
+
+def parse_list(value: str | None) -> list[str]:
+    """
+    Parses the Python-list-of-strings cells ("['a', "b's"]") used by the list columns.
+    Cells without escape sequences are tokenized directly; anything else (escaped quotes,
+    unusual layout, malformed cells) falls back to ast.literal_eval. Sentinel and
+    unparseable cells give an empty list.
+    """
+    if value is None:
+        return []
+    text = value.strip()
+    if text in EMPTY_LIST_SENTINELS:
+        return []
+
+    if text[0] == "[" and "\\" not in text:
+        items = []
+        position = 1
+        while True:
+            match = _LIST_ITEM.match(text, position)
+            if match is None:
+                break
+            single_quoted, double_quoted, separator = match.groups()
+            items.append(single_quoted if single_quoted is not None else double_quoted)
+            position = match.end()
+            if separator == "]":
+                if position == len(text):
+                    return items
+                break
+
+    return _literal_eval_list(text)
+
+
+def _literal_eval_list(text: str) -> list:
+    try:
+        parsed = literal_eval(text)
+    except (ValueError, SyntaxError):
+        return []
+    return list(parsed) if isinstance(parsed, (list, tuple)) else []
+
+
+def parse_row(row: dict) -> RecipeRow:
+    """ Converts the cells of one CSV row; the CPU heavy part of reading the file. """
+    created_date = None
+    if row.get("DatePublished"):
+        try:
+            created_date = date_parser.parse(row["DatePublished"])
+        except (ValueError, OverflowError):
+            created_date = None
+
+    return RecipeRow(
+        recipe_id = int(row["RecipeId"]),
+        name = row["Name"],
+        author_id = int(row["AuthorId"]),
+        author_name = row["AuthorName"],
+        category = row["RecipeCategory"],
+        cook_time = int(row["CookTime"]) if row["CookTime"] else 0,
+        preparation_time = int(row["PrepTime"]) if row["PrepTime"] else 0,
+        created_date = created_date,
+        description = row.get("Description", ""),
+        servings = row.get("RecipeServings"),
+        recipe_yield = row.get("RecipeYield"),
+        nutrition = {key: float(row[column]) if row[column] else None for key, column in NUTRITION_COLUMNS.items()},
+        image_urls = parse_list(row.get("Images")),
+        ingredient_quantities = parse_list(row.get("RecipeIngredientQuantities")),
+        ingredient_parts = parse_list(row.get("RecipeIngredientParts")),
+        instruction_steps = parse_list(row.get("RecipeInstructions")),
+    )
+
+
+def chunk_offsets(f: BinaryIO, start: int, chunk_size: int) -> Iterator[tuple[int, int]]:
+    """
+    Byte ranges of whole rows, from start to the end of the binary file f, each at least
+    chunk_size long except the last. Newlines inside quoted fields (descriptions,
+    instructions) never end a range. The file is read block by block, so memory stays
+    bounded whatever its size.
+    """
+    # A newline ends a row when an even number of quote characters precede it; escaped quotes
+    # are doubled so they never change the parity. Both are single bytes in UTF-8.
+    f.seek(start)
+    chunk_start = position = start
+    in_quotes = False
+    while True:
+        block = f.read(chunk_size)
+        if not block:
+            break
+        # the current range ends at the first row end which makes it chunk_size bytes or longer
+        scanned = 0
+        target = chunk_start + chunk_size - 1 - position
+        while target < len(block):
+            target = max(target, scanned)
+            newline = block.find(b"\n", target)
+            if newline == -1:
+                break
+            in_quotes ^= block.count(b'"', scanned, newline) % 2 == 1
+            scanned = newline + 1
+            if not in_quotes:
+                yield chunk_start, position + scanned
+                chunk_start = position + scanned
+                target = scanned + chunk_size - 1
+            else:
+                target = scanned
+        in_quotes ^= block.count(b'"', scanned) % 2 == 1
+        position += len(block)
+    if chunk_start < position:
+        yield chunk_start, position
+
+
+def _parse_chunk(file_path: Path, fieldnames: List[str], start: int, end: int) -> List[RecipeRow]:
+    # Runs in the worker processes, which read their own byte range so no text is sent to them
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+    # newline=None turns \r\n into \n, as reading the file in text mode does
+    rows = csv.DictReader(io.StringIO(text, newline=None), fieldnames=fieldnames)
+    return [parse_row(row) for row in rows]
+
+
 class CSVReader:
     def __init__(self, file_path: str | Path):
         self.__file_path = Path(file_path)
@@ -28,105 +211,130 @@ class CSVReader:
         self.__ingredients: list[RecipeIngredient] = []
         self.__instructions: list[RecipeInstruction] = []
 
-    def extract_data(self) -> None:
-        """Reads the CSV and creates domain model objects."""
+    def extract_data(self, workers: int = 1, snapshot_path: str | Path | None = None) -> None:
+        """
+        Reads the CSV and creates domain model objects. When a snapshot path is given, the
+        parsed rows are loaded from it if it was written for the current content of the CSV,
+        otherwise the CSV is parsed and the snapshot (re)written.
+        """
+        rows = self.__load_rows(workers, snapshot_path)
+        for bundle in map(self.__build_bundle, rows):
+            recipe = bundle.recipe
+            self.__nutrition[recipe.id] = bundle.nutrition
+            self.__recipes.append(recipe)
+            # connect author & category relationships
+#            recipe.author.add_recipe(recipe)
+            recipe.category.add_recipe(recipe)
+            self.__images.extend(bundle.images)
+            self.__ingredients.extend(bundle.ingredients)
+            self.__instructions.extend(bundle.instructions)
+
+    def iter_recipes(self, workers: int = 1) -> Iterator[RecipeBundle]:
+        """
+        Reads the CSV lazily, yielding one RecipeBundle per row so callers can consume it in
+        bounded memory. Only authors and categories are kept, as they are shared between rows;
+        nothing is added to the lists returned by the accessors.
+
+        With more than one worker the rows are parsed in a process pool, chunk by chunk.
+        Domain objects are still built here in file order, so authors and categories are
+        shared and numbered exactly as in a serial read.
+        """
+        for row in self.__parse_rows(workers):
+            yield self.__build_bundle(row)
 
-        def parse_list(value:str) -> list:
-            if value == "None":
-                return []
+    def __load_rows(self, workers: int, snapshot_path: str | Path | None) -> Iterator[RecipeRow]:
+        if snapshot_path is None:
+            return self.__parse_rows(workers)
+        stored = snapshot.load_rows(snapshot_path, self.__file_path, ROW_LAYOUT)
+        if stored is not None:
             try:
-                return literal_eval(value)
-            except (ValueError, SyntaxError):
-                return []
+                return iter([RecipeRow._make(row) for row in stored])
+            except TypeError:
+                pass  # rows of another shape, parsed again below like any other miss
+        rows = list(self.__parse_rows(workers))
+        snapshot.save_rows(snapshot_path, self.__file_path, rows, ROW_LAYOUT)
+        return iter(rows)
 
+    def __parse_rows(self, workers: int) -> Iterator[RecipeRow]:
+        return self.__parse_in_processes(workers) if workers > 1 else self.__parse_serially()
+
+    def __parse_serially(self) -> Iterator[RecipeRow]:
         with open(self.__file_path, encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            category_id = 0
-            for row in reader:
-
-                created_date = None,
-                if row.get("DatePublished"):
-                    try:
-                        created_date = date_parser.parse(row["DatePublished"])
-                    except (ValueError, OverflowError):
-                        created_date = None
-
-                # --- Author ---
-                author_id = int(row["AuthorId"])
-                if author_id not in self.__authors:
-                    self.__authors[author_id] = Author(
-                        author_id = author_id,
-                        name = row["AuthorName"]
-                    )
-
-                # --- Category ---
-                category_type = row["RecipeCategory"]
-                if category_type not in self.__categories:
-                    category_id = category_id + 1
-                    self.__categories[category_type] = Category(
-                        name = category_type,
-                        category_id = category_id
-                    )
-
-                # --- Nutrition ---
-                nutrition = Nutrition(
-                    id = int(row["RecipeId"]),
-                    calories = float(row["Calories"]) if row["Calories"] else None,
-                    fat = float(row["FatContent"]) if row["FatContent"] else None,
-                    saturated_fat = float(row["SaturatedFatContent"]) if row["SaturatedFatContent"] else None,
-                    cholesterol = float(row["CholesterolContent"]) if row["CholesterolContent"] else None,
-                    sodium = float(row["SodiumContent"]) if row["SodiumContent"] else None,
-                    carbohydrates = float(row["CarbohydrateContent"]) if row["CarbohydrateContent"] else None,
-                    fiber = float(row["FiberContent"]) if row["FiberContent"] else None,
-                    sugar = float(row["SugarContent"]) if row["SugarContent"] else None,
-                    protein = float(row["ProteinContent"]) if row["ProteinContent"] else None
-                )
-                self.__nutrition[int(row["RecipeId"])] = nutrition
-
-                # --- Recipe ---
-                recipe = Recipe(
-                    recipe_id = int(row["RecipeId"]),
-                    name = row["Name"],
-                    author = self.__authors[author_id],
-                    cook_time = int(row["CookTime"]) if row["CookTime"] else 0,
-                    preparation_time = int(row["PrepTime"]) if row["PrepTime"] else 0,
-                    created_date = created_date,
-                    description = row.get("Description", ""),
-                    images = parse_list(row.get("Images")),
-                    category = self.__categories[category_type],
-                    ingredient_quantities = parse_list(row.get("RecipeIngredientQuantities")),
-                    ingredients = parse_list(row.get("RecipeIngredientParts")),
-                    nutrition = nutrition,
-                    servings = row.get("RecipeServings"),
-                    recipe_yield = row.get("RecipeYield"),
-                    instructions = parse_list(row.get("RecipeInstructions"))
-                )
-
-                self.__recipes.append(recipe)
-                # connect author & category relationships
-#                self.__authors[author_id].add_recipe(recipe)
-                self.__categories[category_type].add_recipe(recipe)
-
-                id = int(row["RecipeId"])
-                image_urls = parse_list(row.get("Images"))
-#                images = []
-                for i in range(len(image_urls)):
-#                    images.append(RecipeImage(id, image_urls[i], i))
-                    self.__images.append(RecipeImage(id, image_urls[i], i))
-
-                ingredient_quantities = parse_list(row.get("RecipeIngredientQuantities"))
-                ingredient_part = parse_list(row.get("RecipeIngredientParts"))
-#                ingredients = []
-                for i in range(min(len(ingredient_quantities), len(ingredient_part))):
-#                    ingredients.append(RecipeIngredient(id, ingredient_quantities[i], ingredient_part[i], i))
-                    self.__ingredients.append(RecipeIngredient(id, ingredient_quantities[i], ingredient_part[i], i))
-
-                instruction = parse_list(row.get("RecipeInstructions"))
-#                instructions = []
-                for i in range(len(instruction)):
-#                    instructions.append(RecipeInstruction(id, instruction[i], i))
-                    self.__instructions.append(RecipeInstruction(id, instruction[i], i))
+            for row in csv.DictReader(f):
+                yield parse_row(row)
+
+    def __parse_in_processes(self, workers: int) -> Iterator[RecipeRow]:
+        with open(self.__file_path, "rb") as f:
+            header = f.readline()
+            while header.count(b'"') % 2 == 1:
+                line = f.readline()
+                if not line:
+                    break
+                header += line
+            fieldnames = next(csv.reader([header.decode("utf-8")]), [])
+
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                pending = deque()
+                for start, end in chunk_offsets(f, len(header), CHUNK_BYTES):
+                    pending.append(executor.submit(_parse_chunk, self.__file_path, fieldnames, start, end))
+                    # results are taken in submission order, whichever worker finishes first
+                    if len(pending) >= workers * CHUNKS_IN_FLIGHT_PER_WORKER:
+                        yield from pending.popleft().result()
+                while pending:
+                    yield from pending.popleft().result()
+
+    def __build_bundle(self, row: RecipeRow) -> RecipeBundle:
+        # --- Author ---
+        if row.author_id not in self.__authors:
+            self.__authors[row.author_id] = Author(
+                author_id = row.author_id,
+                name = row.author_name
+            )
+
+        # --- Category ---
+        if row.category not in self.__categories:
+            self.__categories[row.category] = Category(
+                name = row.category,
+                category_id = len(self.__categories) + 1
+            )
+
+        # --- Nutrition ---
+        recipe_id = row.recipe_id
+        nutrition = Nutrition(id = recipe_id, **row.nutrition)
+
+        # Each list column is shared by the recipe and its child rows
+        image_urls = row.image_urls
+        ingredient_quantities = row.ingredient_quantities
+        ingredient_parts = row.ingredient_parts
+        instruction_steps = row.instruction_steps
+
+        # --- Recipe ---
+        recipe = Recipe(
+            recipe_id = recipe_id,
+            name = row.name,
+            author = self.__authors[row.author_id],
+            cook_time = row.cook_time,
+            preparation_time = row.preparation_time,
+            created_date = row.created_date,
+            description = row.description,
+            images = image_urls,
+            category = self.__categories[row.category],
+            ingredient_quantities = ingredient_quantities,
+            ingredients = ingredient_parts,
+            nutrition = nutrition,
+            servings = row.servings,
+            recipe_yield = row.recipe_yield,
+            instructions = instruction_steps
+        )
+
+        images = [RecipeImage(recipe_id, image_urls[i], i) for i in range(len(image_urls))]
+        ingredients = [
+            RecipeIngredient(recipe_id, ingredient_quantities[i], ingredient_parts[i], i)
+            for i in range(min(len(ingredient_quantities), len(ingredient_parts)))
+        ]
+        instructions = [RecipeInstruction(recipe_id, instruction_steps[i], i) for i in range(len(instruction_steps))]
 
+        return RecipeBundle(recipe, nutrition, images, ingredients, instructions)
 
     # --- Accessors ---
     def get_recipes(self) -> List[Recipe]:
@@ -0,0 +1,107 @@
+"""
+On-disk snapshot of the rows parsed from a CSV file, so a process can skip parsing the
+file when it has not changed since the snapshot was written.
+
+Layout (little endian):
+
+    magic          8 bytes   b"RCPSNAP\\0"
+    version        uint16    FORMAT_VERSION
+    csv size       uint64
+    csv mtime      int64     nanoseconds
+    csv sha256     32 bytes
+    layout sha256  32 bytes  of the row layout the caller passes, e.g. parser version and field names
+    payload size   uint64
+    payload        UTF-8 JSON array of rows, datetimes as {"$datetime": ISO 8601 text}
+
+The payload is plain data, so loading a snapshot never runs code stored in the file.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import List
+import struct
+
+MAGIC = b"RCPSNAP\0"
+FORMAT_VERSION = 2
+
+_HEADER = struct.Struct("<8sHQq32s32sQ")
+_DATETIME_KEY = "$datetime"
+
+
+def csv_fingerprint(csv_path: str | Path) -> tuple:
+    """ (size, mtime in ns, sha256 digest) identifying the content of the CSV file. """
+    stat = os.stat(csv_path)
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return stat.st_size, stat.st_mtime_ns, digest.digest()
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {_DATETIME_KEY: value.isoformat()}
+    raise TypeError(f"cannot store {type(value).__name__} in a snapshot")
+
+
+def _decode_object(values: dict):
+    if len(values) == 1 and _DATETIME_KEY in values:
+        return datetime.fromisoformat(values[_DATETIME_KEY])
+    return values
+
+
+def save_rows(snapshot_path: str | Path, csv_path: str | Path, rows: List[tuple], layout: str = "") -> bool:
+    """
+    Writes the rows parsed from csv_path, made of JSON types and datetimes, for the given row
+    layout. The file is written next to the target and then renamed over it, so readers never
+    see a partial snapshot. Returns False when the snapshot could not be written (e.g.
+    read-only directory), which only costs a re-parse.
+    """
+    snapshot_path = Path(snapshot_path)
+    size, mtime_ns, digest = csv_fingerprint(csv_path)
+    payload = json.dumps(rows, default=_encode_value, separators=(",", ":")).encode("utf-8")
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, size, mtime_ns, digest,
+                          hashlib.sha256(layout.encode("utf-8")).digest(), len(payload))
+    temporary_path = snapshot_path.with_name(f"{snapshot_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temporary_path, "wb") as f:
+            f.write(header)
+            f.write(payload)
+        os.replace(temporary_path, snapshot_path)
+    except OSError:
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def load_rows(snapshot_path: str | Path, csv_path: str | Path, layout: str = "") -> List[list] | None:
+    """
+    Returns the rows stored in the snapshot, each as a list, or None when there is no snapshot
+    or it was written by another format version, for another row layout or for another
+    content of csv_path.
+    """
+    try:
+        with open(snapshot_path, "rb") as f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return None
+            magic, version, size, mtime_ns, digest, layout_digest, payload_size = _HEADER.unpack(header)
+            if magic != MAGIC or version != FORMAT_VERSION \
+                    or layout_digest != hashlib.sha256(layout.encode("utf-8")).digest():
+                return None
+            # size and mtime are checked first, the hash only when they match
+            stat = os.stat(csv_path)
+            if (size, mtime_ns) != (stat.st_size, stat.st_mtime_ns) or digest != csv_fingerprint(csv_path)[2]:
+                return None
+            payload = f.read()
+        if len(payload) != payload_size:
+            return None
+        rows = json.loads(payload, object_hook=_decode_object)
+    except (OSError, ValueError):
+        return None
+    return rows if isinstance(rows, list) else None
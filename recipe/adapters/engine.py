@@ -0,0 +1,133 @@
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import NullPool, QueuePool, SingletonThreadPool
+
+# DATABASE_POOL setting -> pool class. null opens a new SQLite connection for every session,
+# queue keeps up to pool_size + max_overflow connections shared by all threads,
+# singleton keeps one connection per thread.
+POOL_CLASSES = {
+    'null': NullPool,
+    'queue': QueuePool,
+    'singleton': SingletonThreadPool,
+}
+
+# Applied to every new SQLite connection. WAL lets readers run while a writer commits,
+# and NORMAL only syncs at checkpoints, which is safe in WAL mode.
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # negative: KiB rather than pages
+    'temp_store': 'MEMORY',
+}
+
+
+def create_database_engine(database_uri: str, echo: bool = False, pool: str = 'queue', pool_size: int = 5,
+                           max_overflow: int = 10, pool_timeout: float = 30,
+                           pragmas: dict | None = None) -> Engine:
+    """
+    Engine for the database repository with the given pooling mode. pragmas are set on every new
+    connection, None applies DEFAULT_SQLITE_PRAGMAS and an empty dict applies none.
+    """
+    if pool not in POOL_CLASSES:
+        raise ValueError(f"pool must be one of {', '.join(POOL_CLASSES)}")
+    # Each connection to an in-memory database is a separate database, so it cannot be shared through a queue
+    if pool == 'queue' and make_url(database_uri).database in (None, '', ':memory:'):
+        pool = 'singleton'
+
+    pool_arguments = {}
+    if pool == 'queue':
+        pool_arguments = dict(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout)
+    elif pool == 'singleton':
+        pool_arguments = dict(pool_size=pool_size)
+    engine = create_engine(database_uri, connect_args={"check_same_thread": False}, poolclass=POOL_CLASSES[pool],
+                           echo=echo, **pool_arguments)
+    apply_sqlite_pragmas(engine, DEFAULT_SQLITE_PRAGMAS if pragmas is None else pragmas)
+    return engine
+
+
+def apply_sqlite_pragmas(engine: Engine, pragmas: dict) -> None:
+    """ Runs PRAGMA name = value for each pragma whenever the engine opens a connection. """
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+
+class PoolMetrics:
+    """
+    Counts connection checkouts of an engine's pool, the time spent opening new connections
+    and how long connections are held between checkout and checkin. Listeners are set on the
+    engine, so they carry over to the new pool engine.dispose() creates. A checkout waiting
+    for a free connection shows as peak_checked_out reaching the pool's limit.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.connections_opened = 0
+        self.connect_seconds_total = 0.0
+        self.connect_seconds_max = 0.0
+        self.checkouts = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.in_use_seconds_total = 0.0
+        self.in_use_seconds_max = 0.0
+        self.__engine = None
+
+    def install(self, engine: Engine) -> 'PoolMetrics':
+        event.listen(engine, 'do_connect', self.__on_do_connect)
+        event.listen(engine, 'connect', self.__on_connect)
+        event.listen(engine, 'checkout', self.__on_checkout)
+        event.listen(engine, 'checkin', self.__on_checkin)
+        self.__engine = engine
+        return self
+
+    def as_dict(self) -> dict:
+        with self.__lock:
+            metrics = dict(connections_opened=self.connections_opened,
+                           connect_seconds_total=self.connect_seconds_total,
+                           connect_seconds_max=self.connect_seconds_max, checkouts=self.checkouts,
+                           checked_out=self.checked_out, peak_checked_out=self.peak_checked_out,
+                           in_use_seconds_total=self.in_use_seconds_total,
+                           in_use_seconds_max=self.in_use_seconds_max)
+        metrics['pool_status'] = self.__engine.pool.status() if self.__engine is not None else None
+        return metrics
+
+    @staticmethod
+    def __on_do_connect(dialect, connection_record, cargs, cparams):
+        connection_record.info['connect_started'] = time.perf_counter()
+
+    def __on_connect(self, dbapi_connection, connection_record):
+        started = connection_record.info.pop('connect_started', None)
+        with self.__lock:
+            self.connections_opened += 1
+            if started is not None:
+                seconds = time.perf_counter() - started
+                self.connect_seconds_total += seconds
+                self.connect_seconds_max = max(self.connect_seconds_max, seconds)
+
+    def __on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        connection_record.info['checked_out_at'] = time.perf_counter()
+        with self.__lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def __on_checkin(self, dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop('checked_out_at', None)
+        with self.__lock:
+            self.checked_out = max(0, self.checked_out - 1)
+            if checked_out_at is not None:
+                seconds = time.perf_counter() - checked_out_at
+                self.in_use_seconds_total += seconds
+                self.in_use_seconds_max = max(self.in_use_seconds_max, seconds)
@@ -0,0 +1,231 @@
+from typing import Dict, List
+
+from sqlalchemy import text
+
+from recipe.adapters.query_parser import And, Not, Or, Term, parse_query, positive_terms
+from recipe.adapters.search_index import FIELD_WEIGHTS, SEARCH_FIELDS, SearchPage
+
+FULLTEXT_TABLE = 'recipe_fts'
+
+# Columns of the full-text table, the searchable fields of the in-memory index, the rowid is the recipe id
+FULLTEXT_COLUMNS = SEARCH_FIELDS
+
+# bm25 weight of each column, in FULLTEXT_COLUMNS order: a match in the name counts most
+FULLTEXT_WEIGHTS = tuple(FIELD_WEIGHTS[column] for column in FULLTEXT_COLUMNS)
+
+# Splits text like query_parser.tokenize: tokens are runs of letters, digits and underscores,
+# accents are kept, so both search backends find the same recipes
+FULLTEXT_TOKENIZER = "unicode61 remove_diacritics 0 categories 'L* N*' tokenchars '_'"
+
+# snippet() wraps matched terms in these, they cannot occur in stored text and are turned into markup for display
+SNIPPET_OPEN = '\x02'
+SNIPPET_CLOSE = '\x03'
+SNIPPET_TOKENS = 12
+
+FULLTEXT_DEFINITION = f'fts5({", ".join(FULLTEXT_COLUMNS)}, tokenize="{FULLTEXT_TOKENIZER}")'
+
+CREATE_FULLTEXT_TABLE = text(f"CREATE VIRTUAL TABLE IF NOT EXISTS {FULLTEXT_TABLE} USING {FULLTEXT_DEFINITION}")
+
+# One row per recipe, ingredients joined in their recipe order
+FILL_FULLTEXT_TABLE = text(f"""
+    INSERT INTO {FULLTEXT_TABLE} (rowid, {', '.join(FULLTEXT_COLUMNS)})
+    SELECT recipe.id, recipe.name, coalesce(category.name, ''), coalesce(authors.name, ''),
+           coalesce((SELECT group_concat(ingredient, ' ')
+                     FROM (SELECT ingredient FROM ingredient
+                           WHERE ingredient.recipe_id = recipe.id ORDER BY position)), '')
+    FROM recipe
+    LEFT JOIN category ON category.id = recipe.category_id
+    LEFT JOIN authors ON authors.id = recipe.author_id
+""")
+
+_RANK = f"bm25({FULLTEXT_TABLE}, {', '.join(str(weight) for weight in FULLTEXT_WEIGHTS)})"
+
+# Alphabetical sort value of each field read from the recipe tables, as the in-memory index sorts them
+_RECIPE_SORT_VALUES = {
+    'name': "lower(recipe.name)",
+    'category': "lower(coalesce((SELECT name FROM category WHERE category.id = recipe.category_id), ''))",
+    'author': "lower(coalesce((SELECT name FROM authors WHERE authors.id = recipe.author_id), ''))",
+    'ingredients': "lower(coalesce((SELECT ingredient FROM ingredient WHERE ingredient.recipe_id = recipe.id "
+                   "ORDER BY position LIMIT 1), ''))",
+}
+
+
+def match_expression(query: str, filter_by: str = "") -> str | None:
+    """
+    FTS5 query for a search query parsed by parse_query: words also match longer words starting
+    with them, phrases match their words in a row, and terms without a field prefix are searched
+    in the filtered field or in any column. Every word is quoted, so only the parsed operators
+    reach FTS5. None when the query has no words, or when it only excludes recipes, which FTS5
+    cannot express, see recipe_page.
+    """
+    parsed = parse_query(query)
+    if parsed is None:
+        return None
+    return _fts_expression(parsed, filter_by if filter_by in SEARCH_FIELDS else None)
+
+
+def _fts_expression(node, column: str | None) -> str | None:
+    if isinstance(node, Term):
+        prefix = f"{node.field or column} : " if node.field or column else ""
+        if node.phrase:
+            return f'{prefix}"{" ".join(node.tokens)}"'
+        return " AND ".join(f'{prefix}"{token}"*' for token in node.tokens)
+    if isinstance(node, Not):
+        # FTS5 only has the binary "a NOT b"
+        return None
+
+    if isinstance(node, Or):
+        children = [_fts_expression(child, column) for child in node.children]
+        if None in children:
+            return None
+        return " OR ".join(_grouped(child, expression) for child, expression in zip(node.children, children))
+
+    required = [(child, _fts_expression(child, column)) for child in node.children if not isinstance(child, Not)]
+    excluded = [(child.child, _fts_expression(child.child, column)) for child in node.children
+                if isinstance(child, Not)]
+    if not required or any(expression is None for _, expression in required + excluded):
+        return None
+    expression = " AND ".join(_grouped(child, expression) for child, expression in required)
+    for position, (child, excluded_expression) in enumerate(excluded):
+        if len(required) > 1 or position > 0:
+            expression = f"({expression})"
+        expression = f"{expression} NOT {_grouped(child, excluded_expression)}"
+    return expression
+
+
+def _recipe_condition(node, column: str | None, matches: Dict[str, str]) -> str:
+    """
+    SQL condition on recipe.id for a parsed query node. The parts FTS5 can express are matched
+    in a subquery, their match expressions are added to matches, and NOT keeps the other ids.
+    """
+    expression = _fts_expression(node, column)
+    if expression is not None:
+        name = f"match_{len(matches)}"
+        matches[name] = expression
+        return f"recipe.id IN (SELECT rowid FROM {FULLTEXT_TABLE} WHERE {FULLTEXT_TABLE} MATCH :{name})"
+    if isinstance(node, Not):
+        return f"NOT ({_recipe_condition(node.child, column, matches)})"
+    joiner = " OR " if isinstance(node, Or) else " AND "
+    return f"({joiner.join(_recipe_condition(child, column, matches) for child in node.children)})"
+
+
+def _grouped(node, expression: str) -> str:
+    """ Parenthesises the expression of a node that is not a single word or phrase. """
+    if isinstance(node, Term) and (node.phrase or len(node.tokens) == 1):
+        return expression
+    return f"({expression})"
+
+
+def rebuild_fulltext(connection) -> None:
+    """ Recreates the full-text table with the current definition and fills it from the recipe tables. """
+    connection.execute(text(f"DROP TABLE IF EXISTS {FULLTEXT_TABLE}"))
+    connection.execute(CREATE_FULLTEXT_TABLE)
+    connection.execute(FILL_FULLTEXT_TABLE)
+
+
+def fulltext_is_current(connection) -> bool:
+    """ Whether the full-text table exists with the columns and tokenizer of FULLTEXT_DEFINITION. """
+    definition = connection.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :table"), {'table': FULLTEXT_TABLE}
+    ).scalar()
+    return definition is not None and definition.endswith(f"USING {FULLTEXT_DEFINITION}")
+
+
+def index_recipe(connection, recipe_id: int, name: str, category: str, author: str,
+                 ingredients: List[str]) -> None:
+    """ Stores one recipe in the full-text table, replacing what was stored for its id. """
+    connection.execute(CREATE_FULLTEXT_TABLE)
+    connection.execute(text(f"DELETE FROM {FULLTEXT_TABLE} WHERE rowid = :id"), {'id': recipe_id})
+    connection.execute(
+        text(f"INSERT INTO {FULLTEXT_TABLE} (rowid, {', '.join(FULLTEXT_COLUMNS)}) "
+             f"VALUES (:id, :name, :category, :author, :ingredients)"),
+        {'id': recipe_id, 'name': name or '', 'category': category or '', 'author': author or '',
+         'ingredients': ' '.join(ingredients or [])}
+    )
+
+
+def search_page(connection, match: str, offset: int, limit: int, after: tuple | None = None,
+                order_by: str | None = None) -> SearchPage:
+    """
+    One page of the recipes matching an FTS5 query, best bm25 score first (ties by id), or
+    alphabetically by the order_by column, with a snippet of the best matching column for each.
+    after, the last_key of the previous page, starts the page right after that recipe: the page
+    seeks past its sort value instead of skipping rows, so a later page costs what the first does.
+    """
+    alphabetical = order_by in FULLTEXT_COLUMNS
+    total = connection.execute(
+        text(f"SELECT count(*) FROM {FULLTEXT_TABLE} WHERE {FULLTEXT_TABLE} MATCH :match"), {'match': match}
+    ).scalar()
+
+    # bm25() cannot be used in a WHERE clause, so the sort value is compared outside the matching query
+    parameters = {'match': match, 'open': SNIPPET_OPEN, 'close': SNIPPET_CLOSE, 'limit': limit,
+                  'offset': max(0, offset)}
+    seek = ""
+    # a cursor made for the other order (scores are numbers, names strings) starts from the offset
+    if after is not None and isinstance(after[0], str) == alphabetical:
+        seek = "WHERE (sort_value, id) > (:after_value, :after_id)"
+        parameters.update(after_value=after[0], after_id=after[1], offset=0)
+    rows = connection.execute(text(f"""
+        SELECT id, sort_value, snippet FROM (
+            SELECT rowid AS id, {f"lower({order_by})" if alphabetical else _RANK} AS sort_value,
+                   snippet({FULLTEXT_TABLE}, -1, :open, :close, '…', {SNIPPET_TOKENS}) AS snippet
+            FROM {FULLTEXT_TABLE} WHERE {FULLTEXT_TABLE} MATCH :match
+        ) {seek}
+        ORDER BY sort_value, id LIMIT :limit OFFSET :offset
+    """), parameters)
+    snippets: Dict[int, str] = {}
+    ids = []
+    last_key = None
+    for recipe_id, value, snippet in rows:
+        ids.append(recipe_id)
+        snippets[recipe_id] = snippet
+        last_key = (value, recipe_id)
+    return SearchPage(ids, total, snippets, last_key)
+
+
+def recipe_page(connection, query: str, filter_by: str, offset: int, limit: int, after: tuple | None = None,
+                order_by: str | None = None) -> SearchPage:
+    """
+    One page of the recipes for a query match_expression gives no FTS5 query for: every recipe
+    for a blank query, none for a query without words, and for a query with a unary NOT the
+    recipes whose id is not among the matches of the negated part. Ordered like search_page, by
+    the bm25 score of the query's positive terms or alphabetically by the order_by column, and
+    alphabetically by the filtered field (name by default) when no term can be ranked. Pages
+    seek past after, a blank query by name walks the (lower(name), id) index of the recipe table.
+    """
+    parsed = parse_query(query)
+    if parsed is None and (query or "").strip():
+        return SearchPage([], 0)
+    column = filter_by if filter_by in SEARCH_FIELDS else None
+    matches: Dict[str, str] = {}
+    condition = "1" if parsed is None else _recipe_condition(parsed, column, matches)
+    total = connection.execute(text(f"SELECT count(*) FROM recipe WHERE {condition}"), matches).scalar()
+
+    parameters = dict(matches, limit=limit, offset=max(0, offset))
+    ranked = [] if order_by is not None or parsed is None else [
+        _grouped(term, _fts_expression(term, column)) for term in positive_terms(parsed)
+    ]
+    ranking = ""
+    if ranked:
+        # recipes matching none of the positive terms score 0, after every match
+        parameters['rank_match'] = " OR ".join(ranked)
+        ranking = (f"LEFT JOIN (SELECT rowid AS ranked_id, {_RANK} AS score FROM {FULLTEXT_TABLE} "
+                   f"WHERE {FULLTEXT_TABLE} MATCH :rank_match) ON ranked_id = recipe.id")
+        sort_value = "coalesce(score, 0.0)"
+    else:
+        sort_value = _RECIPE_SORT_VALUES[order_by or column or 'name']
+
+    seek = ""
+    # a cursor made for the other order (scores are numbers, names strings) starts from the offset
+    if after is not None and isinstance(after[0], str) == (not ranked):
+        # spelled out rather than as a row value, so SQLite seeks in the index instead of scanning it
+        seek = "WHERE sort_value >= :after_value AND (sort_value > :after_value OR id > :after_id)"
+        parameters.update(after_value=after[0], after_id=after[1], offset=0)
+    rows = connection.execute(text(f"""
+        SELECT id, sort_value FROM (
+            SELECT recipe.id AS id, {sort_value} AS sort_value FROM recipe {ranking} WHERE {condition}
+        ) {seek}
+        ORDER BY sort_value, id LIMIT :limit OFFSET :offset
+    """), parameters).all()
+    return SearchPage([recipe_id for recipe_id, _ in rows], total,
+                      last_key=(rows[-1][1], rows[-1][0]) if rows else None)
@@ -0,0 +1,55 @@
+from typing import Iterable, List, Sequence
+
+import numpy as np
+
+from recipe.domainmodel.nutrition import Nutrition
+
+# Thresholds of Nutrition.calculate_health_stars: a value scores one point per threshold it is
+# above (baseline, subtracted) or at least equal to (modifying, added)
+BASELINE_THRESHOLDS = {
+    'saturated_fat': (1, 3, 5),
+    'sugar': (5, 10, 15),
+    'sodium': (120, 200, 400),
+}
+MODIFYING_THRESHOLDS = {
+    'fiber': (4, 8),
+    'protein': (5, 10),
+}
+HEALTH_STAR_FIELDS = tuple(BASELINE_THRESHOLDS) + tuple(MODIFYING_THRESHOLDS)
+
+
+def health_stars_from_columns(**columns: Sequence[float | None]) -> np.ndarray:
+    """
+    Vectorized Nutrition.calculate_health_stars over whole columns, one keyword argument per
+    name in HEALTH_STAR_FIELDS. Missing values (None) score no points, like in the domain model.
+    """
+    score = np.full(len(columns[HEALTH_STAR_FIELDS[0]]), 5.0)
+    for field, thresholds in BASELINE_THRESHOLDS.items():
+        values = _as_array(columns[field])
+        points = sum((values > threshold).astype(float) for threshold in thresholds)
+        # NaN fails every comparison of the scalar version and lands in its last branch
+        score -= np.where(np.isnan(values), len(thresholds), points)
+    for field, thresholds in MODIFYING_THRESHOLDS.items():
+        values = _as_array(columns[field])
+        score += sum((values >= threshold).astype(float) for threshold in thresholds)
+    return np.clip(np.round(score * 2) / 2, 0.5, 5)
+
+
+def compute_health_stars(nutrition: Sequence[Nutrition]) -> List[float]:
+    """ Health stars of every nutrition row, in order. """
+    if not nutrition:
+        return []
+    columns = {field: [getattr(n, field) for n in nutrition] for field in HEALTH_STAR_FIELDS}
+    return health_stars_from_columns(**columns).tolist()
+
+
+def backfill_health_stars(nutrition: Iterable[Nutrition]) -> None:
+    """ Stores the health stars of every nutrition row, computed in one vectorized pass. """
+    nutrition = list(nutrition)
+    for row, stars in zip(nutrition, compute_health_stars(nutrition)):
+        row.health_stars = stars
+
+
+def _as_array(values: Sequence[float | None]) -> np.ndarray:
+    # None and 0 both score nothing, NaN is kept so it can be told apart
+    return np.array([value if value else 0.0 for value in values], dtype=float)
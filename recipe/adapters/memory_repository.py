@@ -2,6 +2,10 @@ from typing import List
 from pathlib import Path
 from recipe.adapters.repository import AbstractRepository
 from recipe.adapters.datareader.csvreader import CSVReader
+from recipe.adapters.category_covers import CategoryCovers
+from recipe.adapters.related_recipes import RELATED_RECIPES_LIMIT, RelatedRecipesIndex
+from recipe.adapters.search_index import SearchIndex, SearchPage
+from recipe.adapters.sorted_views import CURSOR_KEYS, VIEW_KEYS, SortedView, resolve_sort_method
 from recipe.domainmodel.favourite import Favourite
 from recipe.domainmodel.nutrition import Nutrition
 from recipe.domainmodel.recipe import Recipe
@@ -17,9 +21,16 @@ from recipe.domainmodel.review import Review
 class MemoryRepository(AbstractRepository):
     def __init__(self):
         self.__recipes = []  # list of recipes
+        # Indexes over __recipes, kept in sync by add_recipe and add_multiple_recipe
+        self.__recipes_by_id = {}
+        self.__category_covers = CategoryCovers()
+        self.__related_recipes = RelatedRecipesIndex()
+        self.__sorted_views = {view: SortedView(key, CURSOR_KEYS[view]) for view, key in VIEW_KEYS.items()}
         self.__categories = {} #Dictionary to store categories by their id
         self.__nutrition = {}
         self.__authors = {}
+        self.__search_index = SearchIndex()
+        self.__catalogue_generation = 0  # bumped by every write to recipes, categories or authors
 
         self.__users = {}  # Dictionary to store users by their usernames
         self.__reviews = []
@@ -39,6 +50,21 @@ class MemoryRepository(AbstractRepository):
         else:
             return None
 
+    def user_exists(self, user_name: str) -> bool:
+        return user_name in self.__users
+
+    def remove_user(self, user_name: str):
+        """ Removes a user and its reviews. """
+        user = self.__users.pop(user_name, None)
+        if user is None:
+            return
+        for review in list(user.reviews):
+            recipe = self.get_recipe_by_id(review.recipe.id)
+            if recipe is not None:
+                recipe.remove_review(review)
+            if review in self.__reviews:
+                self.__reviews.remove(review)
+
     """-----------------------User actions-------------------"""
 
     def add_review(self, review: Review):
@@ -85,23 +111,77 @@ class MemoryRepository(AbstractRepository):
     def get_all_recipes(self) -> List[Recipe]:
         return self.__recipes
     def get_recipes(self, page: int, page_size: int, sort_method: str) -> List[Recipe]:
-        return self.__recipes[0:page * page_size]
+        # Sanitize pagination inputs like the database repository
+        if page is None or page < 1:
+            page = 1
+        if page_size is None or page_size < 1:
+            page_size = 10
+        view, backwards = resolve_sort_method(sort_method)
+        return self.__sorted_views[view].page((page - 1) * page_size, page_size, backwards)
+    def count_recipes(self) -> int:
+        return len(self.__recipes_by_id)
+    def get_recipes_after(self, after: tuple | None, page_size: int, sort_method: str) -> List[Recipe]:
+        if page_size is None or page_size < 1:
+            page_size = 10
+        view, backwards = resolve_sort_method(sort_method)
+        return self.__sorted_views[view].page_after(after, page_size, backwards)
+    def get_category_cover_images(self) -> dict[str, str | None]:
+        return self.__category_covers.cover_images()
     def get_categories(self) -> dict[int, Category]:
         return self.__categories
     def get_authors(self) -> dict[int, Author]:
         return self.__authors
     def add_recipe(self, recipe: Recipe) -> None:
         self.__recipes.append(recipe)
+        self.__index_recipe(recipe)
+        self.__search_index.add_recipe(recipe)
+        self.__catalogue_generation += 1
     def get_recipe_by_id(self, recipe_id: int):
-        for recipe in self.__recipes:
-            if recipe.id == recipe_id:
-                return recipe
-        else:
-            return None
+        return self.__recipes_by_id.get(recipe_id)
     def get_nutrition_by_recipe_id(self, recipe_id: int) -> Nutrition | None:
         if recipe_id in self.__nutrition:
             return self.__nutrition[recipe_id]
         return None
+    def get_nutrition_by_recipe_ids(self, recipe_ids: List[int]) -> dict[int, Nutrition]:
+        return {i: self.__nutrition[i] for i in recipe_ids if i in self.__nutrition}
+    def get_recipes_by_ids(self, recipe_ids: List[int]) -> List[Recipe]:
+        return [self.__recipes_by_id[i] for i in recipe_ids if i in self.__recipes_by_id]
+    def get_related_recipes(self, recipe_id: int, limit: int = RELATED_RECIPES_LIMIT) -> List[Recipe]:
+        return self.get_recipes_by_ids(self.__related_recipes.related(recipe_id, limit))
+
+    def __index_recipe(self, recipe: Recipe, sorted_views: bool = True) -> None:
+        # The first recipe stored with an id wins, later duplicates are not indexed
+        if recipe.id in self.__recipes_by_id:
+            return
+        self.__recipes_by_id[recipe.id] = recipe
+        if recipe.category is not None:
+            self.__category_covers.add(recipe.category.name, recipe.name, recipe.images[0] if recipe.images else None)
+        self.__related_recipes.add_entry(recipe.id, recipe.category.id if recipe.category is not None else None,
+                                         recipe.ingredients)
+        if sorted_views:
+            for view in self.__sorted_views.values():
+                view.add(recipe)
+
+    def __reindex_recipes(self) -> None:
+        self.__recipes_by_id.clear()
+        self.__category_covers.clear()
+        self.__related_recipes.clear()
+        for recipe in self.__recipes:
+            self.__index_recipe(recipe, sorted_views=False)
+        # sorting once is cheaper than one bisect insert per recipe
+        for view in self.__sorted_views.values():
+            view.rebuild(self.__recipes_by_id.values())
+
+    """----------------------Search----------------------"""
+    def search_recipe_page(self, query: str, filter_by: str, offset: int, limit: int,
+                           after: tuple | None = None, sort_by: str | None = None) -> SearchPage:
+        return self.__search_index.page(query, filter_by, offset, limit, after, sort_by)
+
+    def get_catalogue_generation(self) -> int:
+        return self.__catalogue_generation
+
+    def get_search_completions(self, prefix: str, group: str, limit: int = 10) -> List[str]:
+        return self.__search_index.suggestions.complete(prefix, group, limit)
 #    def get_recipes_sorted_by_nutrition(self, descending: bool = True) -> List[Recipe]:
 #        return sorted(
 #            self.__recipes,
@@ -115,9 +195,11 @@ class MemoryRepository(AbstractRepository):
 
     def add_category(self, id: str, category: Category) -> None:
         self.__categories[id] = category
+        self.__catalogue_generation += 1
 
     def add_author(self, id: str, author: Author) -> None:
         self.__authors[id] = author
+        self.__catalogue_generation += 1
 
     def add_nutrition(self, id: str, nutrition: Nutrition) -> None:
         self.__nutrition[id] = nutrition
@@ -131,15 +213,21 @@ class MemoryRepository(AbstractRepository):
 
     def add_multiple_author(self, authors: dict[int, Author]) -> None:
         self.__authors = authors
+        self.__catalogue_generation += 1
 
     def add_multiple_nutrition(self, nutrition: dict[int, Nutrition]) -> None:
         self.__nutrition = nutrition
 
     def add_multiple_recipe(self, recipes) -> None:
         self.__recipes = recipes
+        self.__reindex_recipes()
+        self.__search_index.clear()
+        self.__search_index.add_recipes(recipes)
+        self.__catalogue_generation += 1
 
     def add_multiple_category(self, category: dict[str, Category]) -> None:
         self.__categories = category
+        self.__catalogue_generation += 1
 
     def add_multiple_instruction(self, instructions: list[RecipeInstruction]) -> None:
         pass
@@ -0,0 +1,95 @@
+from typing import List
+
+from sqlalchemy import bindparam, func, inspect, select, text, update
+from sqlalchemy.engine import Engine
+
+from recipe.adapters import fulltext
+from recipe.adapters.health_stars import HEALTH_STAR_FIELDS, health_stars_from_columns
+from recipe.adapters.orm import catalogue_table, favorite_table, mapper_registry, nutrition_table, recipe_table
+
+
+def migrate(engine: Engine) -> None:
+    """
+    Brings a database created by an earlier version of the app up to the current schema.
+    Every step checks what is already there, so running it on an up to date database is a no-op.
+    """
+    tables = set(inspect(engine).get_table_names())
+    if nutrition_table.name in tables:
+        add_nutrition_health_stars(engine)
+    add_missing_indexes(engine)
+    if recipe_table.name in tables:
+        add_recipe_fulltext(engine)
+    if recipe_table.name in tables and catalogue_table.name not in tables:
+        catalogue_table.create(engine)
+
+
+def add_nutrition_health_stars(engine: Engine) -> int:
+    """
+    Adds the nutrition.health_stars column when missing and fills every row without a score,
+    computing the scores of all of them in one vectorized pass. Returns the number of rows filled.
+    """
+    columns = {column['name'] for column in inspect(engine).get_columns(nutrition_table.name)}
+    with engine.begin() as connection:
+        if 'health_stars' not in columns:
+            connection.execute(text(f"ALTER TABLE {nutrition_table.name} ADD COLUMN health_stars FLOAT"))
+
+        fields = [nutrition_table.c[field] for field in HEALTH_STAR_FIELDS]
+        rows = connection.execute(
+            select(nutrition_table.c.id, *fields).where(nutrition_table.c.health_stars.is_(None))
+        ).all()
+        if not rows:
+            return 0
+
+        ids, *values = zip(*rows)
+        stars = health_stars_from_columns(**dict(zip(HEALTH_STAR_FIELDS, values)))
+        connection.execute(
+            update(nutrition_table).where(nutrition_table.c.id == bindparam('nutrition_id')).values(
+                health_stars=bindparam('stars')
+            ),
+            [{'nutrition_id': i, 'stars': s} for i, s in zip(ids, stars.tolist())]
+        )
+    return len(rows)
+
+
+def add_missing_indexes(engine: Engine) -> List[str]:
+    """
+    Creates the indexes declared in the metadata that an existing table lacks, after dropping
+    duplicate favourites that would break the unique (username, id) index. Returns the names created.
+    """
+    created = []
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        tables = set(inspector.get_table_names())
+        for table in mapper_registry.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            # read from sqlite_master, reflection leaves out expression indexes such as lower(name)
+            existing = set(connection.execute(
+                text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"),
+                {'table': table.name}
+            ).scalars())
+            for index in sorted(table.indexes, key=lambda index: index.name):
+                if index.name in existing:
+                    continue
+                if table is favorite_table and index.unique:
+                    # keep the first favourite stored for each user and recipe
+                    first = select(func.min(favorite_table.c.PK)).group_by(
+                        favorite_table.c.username, favorite_table.c.id
+                    )
+                    connection.execute(favorite_table.delete().where(favorite_table.c.PK.not_in(first)))
+                index.create(connection)
+                created.append(index.name)
+    return created
+
+
+def add_recipe_fulltext(engine: Engine) -> bool:
+    """
+    Creates the full-text search table, or recreates one indexing other columns or tokenizing
+    differently, and fills it from the recipes already stored. Returns whether it was rebuilt.
+    """
+    with engine.begin() as connection:
+        if fulltext.fulltext_is_current(connection):
+            return False
+        fulltext.rebuild_fulltext(connection)
+    return True
+
@@ -1,7 +1,7 @@
 
 
 from sqlalchemy import (
-    Table, Column, Integer, Float, String, DateTime, ForeignKey, Text, UniqueConstraint, MetaData
+    Table, Column, Integer, Float, String, DateTime, ForeignKey, Text, UniqueConstraint, MetaData, Index, func, literal_column
 )
 from sqlalchemy.orm import registry, relationship, foreign
 
@@ -39,6 +39,9 @@ favorite_table = Table(
     Column('PK', Integer, primary_key=True, autoincrement=True),
     Column('id', Integer, ForeignKey('recipe.id'), nullable=False),
     Column('username', String(255), ForeignKey('user.username'), nullable=False),
+    # A unique index rather than a table constraint, so existing databases can get it without rebuilding the table
+    Index('uq_favorite_username_recipe', 'username', 'id', unique=True),
+    Index('ix_favorite_recipe', 'id'),
 )
 
 # Nutrition table
@@ -55,6 +58,8 @@ nutrition_table = Table(
     Column('fiber', Float, nullable=False),
     Column('sugar', Float, nullable=False),
     Column('protein', Float, nullable=False),
+    Column('health_stars', Float, nullable=True),
+    Index('ix_nutrition_recipe', 'recipe_id'),
 )
 
 # Recipe table
@@ -71,6 +76,17 @@ recipe_table = Table(
     Column('rating', Float, nullable=True),
     Column('servings', String(255), nullable=False),
     Column('recipe_yield', String(255), nullable=False),
+    Index('ix_recipe_author', 'author_id'),
+    Index('ix_recipe_category', 'category_id'),
+    # (lower(name), id) is the order of browse pages and cursors
+    Index('ix_recipe_lower_name_id', func.lower(literal_column('name')), 'id'),
+)
+
+# Catalogue table, a single row whose generation every write to the catalogue bumps
+catalogue_table = Table(
+    'catalogue', mapper_registry.metadata,
+    Column('id', Integer, primary_key=True),
+    Column('generation', Integer, nullable=False)
 )
 
 # Ingredient table
@@ -81,6 +97,9 @@ ingredient_table = Table(
     Column('ingredient', String(255), nullable=False),
     Column('quantity', String(255), nullable=False),
     Column('position', Integer, nullable=False),
+    Index('ix_ingredient_recipe_position', 'recipe_id', 'position'),
+    # search completions look up ingredients by lowercase prefix
+    Index('ix_ingredient_lower_ingredient', func.lower(literal_column('ingredient'))),
 )
 
 # Instruction table
@@ -90,6 +109,7 @@ instruction_table = Table(
     Column('recipe_id', Integer, nullable=False),
     Column('step', String(255), nullable=False),
     Column('position', Integer, nullable=False),
+    Index('ix_instruction_recipe_position', 'recipe_id', 'position'),
 )
 
 # Image table
@@ -98,7 +118,8 @@ image_table = Table(
     Column('id', Integer, primary_key=True, autoincrement=True),
     Column('recipe_id', Integer, nullable=False),
     Column('url', String(500), nullable=False),
-    Column('position', Integer, nullable=False)
+    Column('position', Integer, nullable=False),
+    Index('ix_image_recipe_position', 'recipe_id', 'position'),
 )
 
 # Review table
@@ -110,6 +131,8 @@ review_table = Table(
     Column('rating', Integer, nullable=False),
     Column('review', Text, nullable=False),
     Column('date', DateTime, nullable=False),
+    Index('ix_review_recipe', 'recipe_id'),
+    Index('ix_review_username', 'username'),
 )
 
 # User table
@@ -154,7 +177,18 @@ def map_model_to_tables():
         '_Recipe__servings': recipe_table.c.servings,
         '_Recipe__recipe_yield': recipe_table.c.recipe_yield,
         '_Recipe__reviews': relationship(Review, back_populates='_Review__recipe'),
-        '_Recipe__nutrition': relationship(Nutrition, back_populates='_Nutrition__recipe', uselist=False)
+        '_Recipe__nutrition': relationship(Nutrition, back_populates='_Nutrition__recipe', uselist=False),
+        # Child rows in position order. They are written through the add_*_image/ingredient/instruction
+        # methods, so these relationships are read-only; the loader strategy is chosen per query.
+        '_Recipe__image_rows': relationship(
+            RecipeImage, primaryjoin=recipe_table.c.id == foreign(image_table.c.recipe_id),
+            order_by=image_table.c.position, viewonly=True),
+        '_Recipe__ingredient_rows': relationship(
+            RecipeIngredient, primaryjoin=recipe_table.c.id == foreign(ingredient_table.c.recipe_id),
+            order_by=ingredient_table.c.position, viewonly=True),
+        '_Recipe__instruction_rows': relationship(
+            RecipeInstruction, primaryjoin=recipe_table.c.id == foreign(instruction_table.c.recipe_id),
+            order_by=instruction_table.c.position, viewonly=True),
     })
     # Nutrition mapping
     mapper_registry.map_imperatively(Nutrition, nutrition_table, properties={
@@ -168,6 +202,7 @@ def map_model_to_tables():
         '_Nutrition__fiber': nutrition_table.c.fiber,
         '_Nutrition__sugar': nutrition_table.c.sugar,
         '_Nutrition__protein': nutrition_table.c.protein,
+        '_Nutrition__health_stars': nutrition_table.c.health_stars,
         '_Nutrition__recipe': relationship(Recipe, back_populates='_Recipe__nutrition', uselist=False)
     })
     # Ingredient mapping
@@ -0,0 +1,182 @@
+import re
+from typing import Iterator, List, NamedTuple, Tuple
+
+# Field prefixes accepted in queries, e.g. ingredient:garlic, and the field each one searches
+FIELD_PREFIXES = {
+    'name': 'name',
+    'category': 'category',
+    'author': 'author',
+    'ingredient': 'ingredients',
+    'ingredients': 'ingredients',
+}
+
+# Operators are only recognised in capitals, so "and", "or" and "not" are still searched as words
+OPERATORS = ('AND', 'OR', 'NOT')
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_LEXEME_PATTERN = re.compile(
+    r'(?P<open>\()|(?P<close>\))|(?P<field>\w+):(?=\S)|"(?P<phrase>[^"]*)"?|(?P<word>[^\s()"]+)'
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """ Splits text into lowercase word tokens. """
+    if not text:
+        return []
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class Term(NamedTuple):
+    """
+    Words to find in one field, or in the searched fields when field is None. A phrase matches
+    its tokens next to each other; otherwise every token must occur, each matching by prefix.
+    """
+    tokens: Tuple[str, ...]
+    field: str | None = None
+    phrase: bool = False
+
+
+class And(NamedTuple):
+    children: tuple
+
+
+class Or(NamedTuple):
+    children: tuple
+
+
+class Not(NamedTuple):
+    child: Term | And | Or
+
+
+def parse_query(query: str):
+    """
+    Parses a search query into Term, And, Or and Not nodes, or None when it has no words.
+    Words next to each other must all match, OR, NOT and parentheses combine them, "quoted
+    words" form a phrase and a known prefix such as author: limits a term or group to one field.
+    Malformed input never fails: stray operators and parentheses are ignored.
+    """
+    return _Parser(query or "").parse()
+
+
+def positive_terms(node) -> Iterator[Term]:
+    """ The terms a match must or may contain, leaving out negated ones. """
+    if isinstance(node, Term):
+        yield node
+    elif isinstance(node, (And, Or)):
+        for child in node.children:
+            yield from positive_terms(child)
+
+
+def format_query(node) -> str:
+    """ A canonical spelling of a parsed query, equal for queries that search the same thing. """
+    if isinstance(node, Term):
+        prefix = f"{node.field}:" if node.field else ""
+        if node.phrase:
+            return f'{prefix}"{" ".join(node.tokens)}"'
+        if len(node.tokens) == 1:
+            return prefix + node.tokens[0]
+        return f"{prefix}({' AND '.join(node.tokens)})"
+    if isinstance(node, And):
+        return " AND ".join(_format_child(child) for child in node.children)
+    if isinstance(node, Or):
+        return " OR ".join(format_query(child) for child in node.children)
+    return f"NOT {_format_child(node.child)}"
+
+
+def _format_child(node) -> str:
+    text = format_query(node)
+    return f"({text})" if isinstance(node, (And, Or)) else text
+
+
+def _combine(node_type, children: list):
+    """ Joins nodes with And or Or, flattening nested nodes of the same kind and dropping repeats. """
+    flattened = []
+    for child in children:
+        if child is None:
+            continue
+        flattened.extend(child.children if isinstance(child, node_type) else (child,))
+    flattened = list(dict.fromkeys(flattened))
+    if not flattened:
+        return None
+    if len(flattened) == 1:
+        return flattened[0]
+    return node_type(tuple(flattened))
+
+
+class _Parser:
+    def __init__(self, query: str):
+        self.__lexemes = []
+        for match in _LEXEME_PATTERN.finditer(query):
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind == 'word' and value in OPERATORS:
+                kind = value
+            self.__lexemes.append((kind, value))
+        self.__position = 0
+
+    def parse(self):
+        nodes = []
+        while self.__peek() is not None:
+            nodes.append(self.__parse_or(None))
+            if self.__peek() == 'close':
+                self.__position += 1
+        return _combine(And, nodes)
+
+    def __peek(self) -> str | None:
+        if self.__position < len(self.__lexemes):
+            return self.__lexemes[self.__position][0]
+        return None
+
+    def __next(self) -> tuple:
+        lexeme = self.__lexemes[self.__position]
+        self.__position += 1
+        return lexeme
+
+    def __parse_or(self, field: str | None):
+        children = [self.__parse_and(field)]
+        while self.__peek() == 'OR':
+            self.__position += 1
+            children.append(self.__parse_and(field))
+        return _combine(Or, children)
+
+    def __parse_and(self, field: str | None):
+        children = []
+        while self.__peek() not in (None, 'close', 'OR'):
+            if self.__peek() == 'AND':
+                self.__position += 1
+                continue
+            children.append(self.__parse_unary(field))
+        return _combine(And, children)
+
+    def __parse_unary(self, field: str | None):
+        if self.__peek() == 'NOT':
+            self.__position += 1
+            if self.__peek() in (None, 'close', 'OR', 'AND'):
+                return None
+            child = self.__parse_unary(field)
+            return Not(child) if child is not None else None
+        return self.__parse_primary(field)
+
+    def __parse_primary(self, field: str | None):
+        kind, value = self.__next()
+        if kind == 'open':
+            node = self.__parse_or(field)
+            if self.__peek() == 'close':
+                self.__position += 1
+            return node
+        if kind == 'field':
+            prefixed = FIELD_PREFIXES.get(value.lower())
+            if prefixed is None:
+                # not a field, so the prefix is searched as words like the rest of the query
+                return self.__term(value, field, phrase=False)
+            if self.__peek() in ('close', 'OR', 'AND', 'NOT'):
+                return None
+            return self.__parse_primary(prefixed)
+        return self.__term(value, field, phrase=kind == 'phrase')
+
+    @staticmethod
+    def __term(text: str, field: str | None, phrase: bool):
+        tokens = tokenize(text)
+        if not tokens:
+            return None
+        return Term(tuple(tokens), field, phrase and len(tokens) > 1)
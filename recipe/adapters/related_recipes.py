@@ -0,0 +1,77 @@
+import heapq
+from collections import Counter
+from typing import Iterable, List
+
+# Related recipes shown for a recipe
+RELATED_RECIPES_LIMIT = 4
+
+# Ingredients used by more recipes than this (salt, butter, ...) say nothing about how close
+# two recipes are, so they are not indexed; this also bounds the work done per lookup
+MAX_POSTING_LENGTH = 200
+
+# Score added for being in the same category, on top of one point per shared ingredient
+CATEGORY_WEIGHT = 1
+
+
+class RelatedRecipesIndex:
+    """
+    Finds the recipes closest to a given one: most shared ingredients, then same category,
+    then lowest id. Lookups only walk the postings of the recipe's own ingredients, and each
+    result is kept until a recipe is added.
+    """
+
+    def __init__(self):
+        self.__ingredients = {}  # recipe id -> normalised ingredients
+        self.__categories = {}  # recipe id -> category id
+        self.__postings = {}  # ingredient -> ids of the recipes using it
+        self.__by_category = {}  # category id -> ids of its recipes, in insertion order
+        self.__memo = {}  # (recipe id, limit) -> related ids
+
+    def __len__(self) -> int:
+        return len(self.__ingredients)
+
+    def clear(self) -> None:
+        for mapping in (self.__ingredients, self.__categories, self.__postings, self.__by_category, self.__memo):
+            mapping.clear()
+
+    def add_entry(self, recipe_id: int, category_id: int | None, ingredients: Iterable[str]) -> None:
+        if recipe_id in self.__ingredients:
+            return
+        normalised = {ingredient.strip().lower() for ingredient in ingredients if ingredient and ingredient.strip()}
+        self.__ingredients[recipe_id] = normalised
+        self.__categories[recipe_id] = category_id
+        for ingredient in normalised:
+            self.__postings.setdefault(ingredient, []).append(recipe_id)
+        if category_id is not None:
+            self.__by_category.setdefault(category_id, []).append(recipe_id)
+        self.__memo.clear()
+
+    def related(self, recipe_id: int, limit: int = RELATED_RECIPES_LIMIT) -> List[int]:
+        """ Ids of the closest recipes, best first. Unknown recipes have none. """
+        if recipe_id not in self.__ingredients or limit < 1:
+            return []
+        key = (recipe_id, limit)
+        if key not in self.__memo:
+            self.__memo[key] = self.__compute(recipe_id, limit)
+        return list(self.__memo[key])
+
+    def __compute(self, recipe_id: int, limit: int) -> List[int]:
+        category_id = self.__categories[recipe_id]
+        scores = Counter()
+        for ingredient in self.__ingredients[recipe_id]:
+            postings = self.__postings[ingredient]
+            if len(postings) <= MAX_POSTING_LENGTH:
+                scores.update(postings)
+        scores.pop(recipe_id, None)
+        if category_id is not None:
+            for other in scores:
+                if self.__categories[other] == category_id:
+                    scores[other] += CATEGORY_WEIGHT
+            # Too few recipes share an ingredient: fill up with recipes of the same category
+            for other in self.__by_category[category_id]:
+                if len(scores) >= limit:
+                    break
+                if other != recipe_id and other not in scores:
+                    scores[other] = CATEGORY_WEIGHT
+
+        return [other for other, _ in heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))]
@@ -1,5 +1,7 @@
 from typing import List
 from pathlib import Path
+from recipe.adapters.related_recipes import RELATED_RECIPES_LIMIT
+from recipe.adapters.search_index import SearchPage
 from recipe.domainmodel.author import Author
 from recipe.domainmodel.category import Category
 from recipe.domainmodel.favourite import Favourite
@@ -29,6 +31,16 @@ class AbstractRepository(abc.ABC):
         # returns username from repo. If such username doesn't exist
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def user_exists(self, user_name: str) -> bool:
+        # tells whether a user is stored, without loading it
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def remove_user(self, user_name: str):
+        # removes a user together with its reviews and favourites
+        raise NotImplementedError
+
     """-----------------------User actions-------------------"""
     @abc.abstractmethod
     def add_review(self, review: Review):
@@ -61,10 +73,31 @@ class AbstractRepository(abc.ABC):
     def get_recipes(self, page: int, page_size: int, sort_method: str) -> List[Recipe]:
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def count_recipes(self) -> int:
+        """ Returns the number of recipes, without loading them. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_recipes_after(self, after: tuple | None, page_size: int, sort_method: str) -> List[Recipe]:
+        """
+        Keyset pagination: returns the page_size recipes following the recipe whose
+        (sort value, id) is after, see sorted_views.cursor_for, or the first page when after is None.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_authors(self) -> dict[int, Author]:
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_category_cover_images(self) -> dict[str, str | None]:
+        """
+        Returns, per category name, the first image of the category's first recipe by name,
+        or None when that recipe has no image. Categories without recipes are left out.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_categories(self) -> dict[str, Category]:
         raise NotImplementedError
@@ -81,6 +114,45 @@ class AbstractRepository(abc.ABC):
     def get_nutrition_by_recipe_id(self, recipe_id: int) -> Nutrition:
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_nutrition_by_recipe_ids(self, recipe_ids: List[int]) -> dict[int, Nutrition]:
+        """ Returns the nutrition of each given recipe by recipe id, recipes without nutrition are left out. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_recipes_by_ids(self, recipe_ids: List[int]) -> List[Recipe]:
+        """ Returns the recipes with the given ids, in the order of the ids. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_related_recipes(self, recipe_id: int, limit: int = RELATED_RECIPES_LIMIT) -> List[Recipe]:
+        """ Returns the recipes sharing the most ingredients with a recipe, then its category, best first. """
+        raise NotImplementedError
+
+    """----------------------Search----------------------"""
+    @abc.abstractmethod
+    def search_recipe_page(self, query: str, filter_by: str, offset: int, limit: int,
+                           after: tuple | None = None, sort_by: str | None = None) -> SearchPage:
+        """
+        Returns one page of the recipes matching the query and the number of matches, most relevant
+        first or alphabetically as sort_by asks (relevance by default when the query has words).
+        after is the last_key of the previous page: the page then starts right after that recipe.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_catalogue_generation(self) -> int:
+        """
+        Returns a number that changes whenever recipes, categories, authors or ingredients are
+        written, so results computed from an earlier catalogue can be told apart.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_search_completions(self, prefix: str, group: str, limit: int = 10) -> List[str]:
+        """ Returns the most used values of a suggestion group starting with the prefix. """
+        raise NotImplementedError
+
 #    @abc.abstractmethod
 #    def get_recipes_sorted_by_nutrition(self, descending: bool = True) -> List[Recipe]:
 #        raise NotImplementedError
@@ -1,27 +1,85 @@
+from itertools import islice
 from pathlib import Path
+from typing import Iterable, Iterator, List
 
-from recipe.adapters.datareader.csvreader import CSVReader
+from recipe.adapters.bulk_loader import BulkLoader, DEFAULT_BATCH_SIZE
+from recipe.adapters.datareader.csvreader import CSVReader, RecipeBundle
+from recipe.adapters.health_stars import backfill_health_stars
 from recipe.adapters.repository import AbstractRepository
 
 
-def populate(data_path: Path, repo: AbstractRepository, database_mode: bool):
+def populate(data_path: Path, repo: AbstractRepository, database_mode: bool, bulk: bool = False,
+             batch_size: int = DEFAULT_BATCH_SIZE, workers: int = 1, snapshot_path: Path | None = None):
+    """
+    workers > 1 parses the CSV rows in that many processes. In memory mode, snapshot_path
+    names a snapshot of the parsed rows used instead of parsing the CSV while it is unchanged.
+    """
 
     csv_reader = CSVReader(data_path)
-    csv_reader.extract_data()
-    recipes = csv_reader.get_recipes()
-    categories = csv_reader.get_categories()
-    nutrition = csv_reader.get_nutrition()
-    authors = csv_reader.get_authors()
-    instructions = csv_reader.get_instructions()
-    images = csv_reader.get_images()
-    ingredients = csv_reader.get_recipe_ingredients()
-
-    repo.add_multiple_recipe(recipes)
-    repo.add_multiple_category(categories)
-    repo.add_multiple_nutrition(nutrition)
-    repo.add_multiple_author(authors)
-
-    if database_mode:
-        repo.add_multiple_instruction(instructions)
-        repo.add_multiple_image(images)
-        repo.add_multiple_ingredient(ingredients)
+
+    if not database_mode:
+        # The memory repository keeps every object anyway, so read the whole file at once
+        csv_reader.extract_data(workers, snapshot_path)
+        backfill_health_stars(csv_reader.get_nutrition().values())
+        repo.add_multiple_recipe(csv_reader.get_recipes())
+        repo.add_multiple_category(csv_reader.get_categories())
+        repo.add_multiple_nutrition(csv_reader.get_nutrition())
+        repo.add_multiple_author(csv_reader.get_authors())
+        return
+
+    # The database is filled from the reader's stream, batch_size recipes at a time,
+    # so only one chunk of parsed rows is held in memory
+    if bulk:
+        _bulk_populate(csv_reader, repo, batch_size, workers)
+        repo.rebuild_fulltext_index()
+        return
+
+    for chunk in _chunks(csv_reader.iter_recipes(workers), batch_size):
+        backfill_health_stars(bundle.nutrition for bundle in chunk)
+        repo.add_multiple_recipe([bundle.recipe for bundle in chunk])
+        repo.add_multiple_nutrition({bundle.nutrition.id: bundle.nutrition for bundle in chunk})
+        repo.add_multiple_instruction([i for bundle in chunk for i in bundle.instructions])
+        repo.add_multiple_image([i for bundle in chunk for i in bundle.images])
+        repo.add_multiple_ingredient([i for bundle in chunk for i in bundle.ingredients])
+
+    repo.add_multiple_category(csv_reader.get_categories())
+    repo.add_multiple_author(csv_reader.get_authors())
+    # The full-text table is filled from the stored rows in one statement, once every ingredient is written
+    repo.rebuild_fulltext_index()
+
+
+def _bulk_populate(csv_reader: CSVReader, repo: AbstractRepository, batch_size: int, workers: int):
+    # Bulk mode writes the rows with batched Core inserts instead of one ORM merge per object
+    seen_authors = set()
+    seen_categories = set()
+    with repo.bulk_loader(batch_size) as loader:
+        for chunk in _chunks(csv_reader.iter_recipes(workers), batch_size):
+            backfill_health_stars(bundle.nutrition for bundle in chunk)
+            for bundle in chunk:
+                _load_bundle(loader, bundle, seen_authors, seen_categories)
+    print(f"Bulk loaded {loader.rows_written} rows in {loader.elapsed:.2f}s "
+          f"({loader.rows_per_second:.0f} rows/s)")
+
+
+def _load_bundle(loader: BulkLoader, bundle: RecipeBundle, seen_authors: set, seen_categories: set):
+    recipe = bundle.recipe
+    if recipe.author.id not in seen_authors:
+        seen_authors.add(recipe.author.id)
+        loader.add_author(recipe.author)
+    if recipe.category.id not in seen_categories:
+        seen_categories.add(recipe.category.id)
+        loader.add_category(recipe.category)
+    loader.add_recipe(recipe)
+    loader.add_nutrition(bundle.nutrition)
+    for image in bundle.images:
+        loader.add_image(image)
+    for ingredient in bundle.ingredients:
+        loader.add_ingredient(ingredient)
+    for instruction in bundle.instructions:
+        loader.add_instruction(instruction)
+
+
+def _chunks(bundles: Iterable[RecipeBundle], size: int) -> Iterator[List[RecipeBundle]]:
+    iterator = iter(bundles)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
@@ -0,0 +1,332 @@
+import heapq
+import math
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, List, NamedTuple, Tuple
+
+from recipe.adapters.query_parser import And, Not, Or, Term, format_query, parse_query, positive_terms, tokenize
+from recipe.adapters.sorted_views import fold_name
+from recipe.adapters.suggestion_catalogue import SuggestionCatalogue
+from recipe.domainmodel.recipe import Recipe
+
+# Fields that can be searched, in the order used for the default all-fields mode
+SEARCH_FIELDS = ('name', 'category', 'author', 'ingredients')
+
+# Weight of a match in each field when ranking by relevance
+FIELD_WEIGHTS = {'name': 3.0, 'ingredients': 2.0, 'category': 1.5, 'author': 1.0}
+# BM25 term frequency saturation and field length normalisation
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Result orders: relevance ranks by BM25, alphabetical sorts by the filtered field (name by default)
+SORT_RELEVANCE = 'relevance'
+SORT_ALPHABETICAL = 'alphabetical'
+
+
+class SearchPage(NamedTuple):
+    """ One page of search results: recipe ids in result order and the number of matches. """
+    ids: List[int]
+    total: int
+    # recipe id -> text around the matched terms, None when the search backend provides none
+    snippets: Dict[int, str] | None = None
+    # (sort value, id) of the last recipe of the page, pass it as after to get the page following it
+    last_key: Tuple[object, int] | None = None
+
+
+def normalize_query(query: str) -> str:
+    """ The parsed query spelled canonically, so queries searching the same thing compare equal. """
+    parsed = parse_query(query)
+    if parsed is None:
+        return " ".join((query or "").lower().split())
+    return format_query(parsed)
+
+
+def resolve_search_sort(query: str, sort_by: str | None) -> str:
+    """ The requested order, or relevance when the query has words and alphabetical otherwise. """
+    if sort_by in (SORT_RELEVANCE, SORT_ALPHABETICAL):
+        return sort_by
+    return SORT_RELEVANCE if tokenize(query) else SORT_ALPHABETICAL
+
+
+def intersect_postings(postings: List[List[int]]) -> List[int]:
+    """
+    Intersects sorted id lists, starting from the smallest one. Each id of the running result
+    is looked up in the next list by galloping, so a short list costs O(short · log long).
+    """
+    if not postings:
+        return []
+    postings = sorted(postings, key=len)
+    result = postings[0]
+    for other in postings[1:]:
+        if not result:
+            break
+        result = _gallop_intersect(result, other)
+    return list(result)
+
+
+def _gallop_intersect(shorter: List[int], longer: List[int]) -> List[int]:
+    merged = []
+    position = 0
+    end = len(longer)
+    for recipe_id in shorter:
+        # double the step until it passes the id, then bisect within the last step
+        step = 1
+        while position + step < end and longer[position + step] < recipe_id:
+            step *= 2
+        position = bisect_left(longer, recipe_id, position, min(position + step + 1, end))
+        if position == end:
+            break
+        if longer[position] == recipe_id:
+            merged.append(recipe_id)
+            position += 1
+    return merged
+
+
+def _contains_phrase(tokens: Tuple[str, ...], phrase: Tuple[str, ...]) -> bool:
+    length = len(phrase)
+    return any(tokens[start:start + length] == phrase
+               for start in range(len(tokens) - length + 1) if tokens[start] == phrase[0])
+
+
+class SearchIndex:
+    """
+    Inverted index mapping each token of the searchable recipe fields to the sorted
+    ids of the recipes containing it. Query tokens match indexed tokens by prefix.
+    """
+
+    def __init__(self):
+        # field -> token -> sorted list of recipe ids
+        self.__postings = {field: {} for field in SEARCH_FIELDS}
+        # field -> sorted list of every token seen in that field
+        self.__vocabulary = {field: [] for field in SEARCH_FIELDS}
+        # recipe id -> sort key per field
+        self.__sort_keys = {}
+        # field -> recipe id -> tokens in text order, for phrases and BM25, and field -> total tokens
+        self.__field_terms = {field: {} for field in SEARCH_FIELDS}
+        self.__total_lengths = dict.fromkeys(SEARCH_FIELDS, 0)
+        self.__suggestions = SuggestionCatalogue()
+
+    def __len__(self) -> int:
+        return len(self.__sort_keys)
+
+    def __contains__(self, recipe_id: int) -> bool:
+        return recipe_id in self.__sort_keys
+
+    def clear(self) -> None:
+        for field in SEARCH_FIELDS:
+            self.__postings[field].clear()
+            self.__vocabulary[field].clear()
+            self.__field_terms[field].clear()
+            self.__total_lengths[field] = 0
+        self.__sort_keys.clear()
+        self.__suggestions.clear()
+
+    @property
+    def suggestions(self) -> SuggestionCatalogue:
+        return self.__suggestions
+
+    """-----------------------indexing-------------------"""
+
+    def add_recipe(self, recipe: Recipe) -> None:
+        self.add_entry(*self._entry_for(recipe))
+
+    def add_recipes(self, recipes: Iterable[Recipe]) -> None:
+        """ Bulk version of add_recipe which sorts postings once at the end. """
+        self.add_entries(self._entry_for(recipe) for recipe in recipes)
+
+    def add_entry(self, recipe_id: int, name: str, category: str, author: str, ingredients: List[str]) -> None:
+        if recipe_id in self.__sort_keys:
+            return
+        self.__store_sort_keys(recipe_id, name, category, author, ingredients)
+        self.__suggestions.add(name, category, author, ingredients)
+        for field, tokens in self.__field_tokens(name, category, author, ingredients):
+            self.__store_field_terms(field, recipe_id, tokens)
+            postings = self.__postings[field]
+            for token in set(tokens):
+                ids = postings.get(token)
+                if ids is None:
+                    postings[token] = [recipe_id]
+                    insort(self.__vocabulary[field], token)
+                else:
+                    insort(ids, recipe_id)
+
+    def add_entries(self, entries: Iterable[tuple]) -> None:
+        touched = {field: set() for field in SEARCH_FIELDS}
+        for recipe_id, name, category, author, ingredients in entries:
+            if recipe_id in self.__sort_keys:
+                continue
+            self.__store_sort_keys(recipe_id, name, category, author, ingredients)
+            self.__suggestions.add(name, category, author, ingredients)
+            for field, tokens in self.__field_tokens(name, category, author, ingredients):
+                self.__store_field_terms(field, recipe_id, tokens)
+                postings = self.__postings[field]
+                for token in set(tokens):
+                    postings.setdefault(token, []).append(recipe_id)
+                    touched[field].add(token)
+
+        for field in SEARCH_FIELDS:
+            postings = self.__postings[field]
+            for token in touched[field]:
+                postings[token].sort()
+            if touched[field]:
+                self.__vocabulary[field] = sorted(postings)
+
+    @staticmethod
+    def _entry_for(recipe: Recipe) -> tuple:
+        category = recipe.category.name if recipe.category is not None else ""
+        return recipe.id, recipe.name, category, recipe.author.name, list(getattr(recipe, 'ingredients', []) or [])
+
+    @staticmethod
+    def __field_tokens(name: str, category: str, author: str, ingredients: List[str]):
+        yield 'name', tokenize(name)
+        yield 'category', tokenize(category)
+        yield 'author', tokenize(author)
+        yield 'ingredients', [token for ingredient in ingredients for token in tokenize(ingredient)]
+
+    def __store_field_terms(self, field: str, recipe_id: int, tokens: List[str]) -> None:
+        if tokens:
+            self.__field_terms[field][recipe_id] = tuple(tokens)
+            self.__total_lengths[field] += len(tokens)
+
+    def __store_sort_keys(self, recipe_id: int, name: str, category: str, author: str, ingredients: List[str]):
+        self.__sort_keys[recipe_id] = {
+            'name': fold_name(name),
+            'category': fold_name(category),
+            'author': fold_name(author),
+            'ingredients': fold_name(ingredients[0]) if ingredients else "",
+        }
+
+    """-----------------------querying-------------------"""
+
+    def search(self, query: str, filter_by: str = "") -> List[int]:
+        """
+        Returns the sorted ids of recipes matching the query, see parse_query. Terms without a
+        field prefix are searched in the given field or, when filter_by is not a known field,
+        in any field.
+        """
+        parsed = parse_query(query)
+        if parsed is None:
+            return sorted(self.__sort_keys) if not (query or "").strip() else []
+
+        fields = (filter_by,) if filter_by in SEARCH_FIELDS else SEARCH_FIELDS
+        return self.__evaluate(parsed, fields)
+
+    def __evaluate(self, node, fields: tuple) -> List[int]:
+        """ Sorted ids of the recipes matching a parsed query node. """
+        if isinstance(node, Term):
+            return self.__match_term(node, (node.field,) if node.field else fields)
+        if isinstance(node, Or):
+            return sorted(set().union(*(self.__evaluate(child, fields) for child in node.children)))
+        if isinstance(node, Not):
+            return self.__exclude(sorted(self.__sort_keys), self.__evaluate(node.child, fields))
+
+        required = [self.__evaluate(child, fields) for child in node.children if not isinstance(child, Not)]
+        matched = intersect_postings(required) if required else sorted(self.__sort_keys)
+        for child in node.children:
+            if isinstance(child, Not) and matched:
+                matched = self.__exclude(matched, self.__evaluate(child.child, fields))
+        return matched
+
+    @staticmethod
+    def __exclude(recipe_ids: List[int], excluded: List[int]) -> List[int]:
+        excluded = set(excluded)
+        return [recipe_id for recipe_id in recipe_ids if recipe_id not in excluded]
+
+    def __match_term(self, term: Term, fields: tuple) -> List[int]:
+        if not term.phrase:
+            return intersect_postings([self.__match_token(token, fields) for token in term.tokens])
+
+        # a phrase matches whole tokens, next to each other within one field
+        matched = set()
+        for field in fields:
+            postings = self.__postings[field]
+            field_terms = self.__field_terms[field]
+            candidates = intersect_postings([postings.get(token, []) for token in term.tokens])
+            matched.update(recipe_id for recipe_id in candidates
+                           if _contains_phrase(field_terms[recipe_id], term.tokens))
+        return sorted(matched)
+
+    def __match_token(self, token: str, fields: tuple) -> List[int]:
+        """ Union of the postings of every indexed token starting with the given token. """
+        matched = []
+        for field in fields:
+            vocabulary = self.__vocabulary[field]
+            postings = self.__postings[field]
+            position = bisect_left(vocabulary, token)
+            while position < len(vocabulary) and vocabulary[position].startswith(token):
+                matched.append(postings[vocabulary[position]])
+                position += 1
+
+        if len(matched) == 1:
+            return matched[0]
+        return sorted({recipe_id for ids in matched for recipe_id in ids})
+
+    def page(self, query: str, filter_by: str, offset: int, limit: int, after: tuple | None = None,
+             sort_by: str | None = None) -> SearchPage:
+        """
+        One page of the matches in the requested order, see resolve_search_sort. after is the
+        last_key of the previous page: the page then starts right after that recipe, and like
+        the first page only the best limit matches are kept, whatever the page number.
+        """
+        matched = self.search(query, filter_by)
+        key = None
+        if resolve_search_sort(query, sort_by) != SORT_ALPHABETICAL:
+            key = self.__relevance_key(query, filter_by)
+        alphabetical = key is None
+        if alphabetical:
+            key = self.__alphabetical_key(filter_by)
+
+        keyed = map(key, matched)
+        # a cursor made for the other order (scores are numbers, names strings) starts from the offset
+        if after is not None and isinstance(after[0], str) == alphabetical:
+            after = tuple(after)
+            best = heapq.nsmallest(limit, (sort_key for sort_key in keyed if sort_key > after))
+        else:
+            offset = max(0, offset)
+            best = heapq.nsmallest(offset + limit, keyed)[offset:]
+        return SearchPage([recipe_id for _, recipe_id in best], len(matched), last_key=best[-1] if best else None)
+
+    def __alphabetical_key(self, filter_by: str) -> Callable[[int], Tuple[str, int]]:
+        """ (value of the filtered field, name by default, id) of a recipe. """
+        field = filter_by if filter_by in SEARCH_FIELDS else 'name'
+        sort_keys = self.__sort_keys
+        return lambda recipe_id: (sort_keys[recipe_id][field], recipe_id)
+
+    def __relevance_key(self, query: str, filter_by: str) -> Callable[[int], Tuple[float, int]] | None:
+        """
+        (negated BM25 score, id) of a recipe, so the best match sorts first. Scores add up over the
+        searched fields, weighted by FIELD_WEIGHTS, and a query token counts every indexed token it
+        is a prefix of. Negated terms of the query do not count. None when no term of the query
+        matches an indexed token.
+        """
+        default_fields = (filter_by,) if filter_by in SEARCH_FIELDS else SEARCH_FIELDS
+        searched = {}  # (field, token) pairs of the terms a match must or may contain
+        for term in positive_terms(parse_query(query)):
+            for field in ((term.field,) if term.field else default_fields):
+                searched.update(dict.fromkeys((field, token) for token in term.tokens))
+
+        recipes = len(self.__sort_keys)
+        weights = []  # (field, token, field weight * inverse document frequency)
+        for field, token in searched:
+            matching = len(self.__match_token(token, (field,)))
+            if matching:
+                idf = math.log(1 + (recipes - matching + 0.5) / (matching + 0.5))
+                weights.append((field, token, FIELD_WEIGHTS[field] * idf))
+        if not weights:
+            return None
+        average_lengths = {field: self.__total_lengths[field] / max(1, len(self.__field_terms[field]))
+                           for field in SEARCH_FIELDS}
+
+        def key(recipe_id: int) -> Tuple[float, int]:
+            total = 0.0
+            for field, token, weight in weights:
+                terms = self.__field_terms[field].get(recipe_id)
+                if not terms:
+                    continue
+                frequency = sum(1 for term in terms if term.startswith(token))
+                if frequency:
+                    length = len(terms) / average_lengths[field]
+                    total += weight * frequency * (BM25_K1 + 1) / (
+                        frequency + BM25_K1 * (1 - BM25_B + BM25_B * length))
+            return -total, recipe_id
+
+        return key
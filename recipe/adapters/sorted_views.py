@@ -0,0 +1,110 @@
+import string
+from bisect import bisect_left, bisect_right
+from typing import Callable, Iterable, List, Tuple
+
+from recipe.domainmodel.recipe import Recipe
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def fold_name(name: str | None) -> str:
+    """
+    Name as recipes are sorted by it: SQLite's lower() only lowers ASCII letters, so other
+    letters are kept as they are, and cursors made here match the database's seek.
+    """
+    return (name or "").translate(_ASCII_LOWER)
+
+
+# Sort key of each presorted view. Keys end with the id so every key is unique.
+# Names compare case-insensitively, like lower(name) in the database and the category covers.
+VIEW_KEYS = {
+    'id': lambda recipe: recipe.id,
+    'name': lambda recipe: (fold_name(recipe.name), recipe.id),
+    # read backwards: names descending, equal names still in ascending id order
+    'name_desc': lambda recipe: (fold_name(recipe.name), -recipe.id),
+}
+
+# Key in each view of the recipe a cursor (sort value, id) points at
+CURSOR_KEYS = {
+    'id': lambda value, recipe_id: recipe_id,
+    'name': lambda value, recipe_id: (value, recipe_id),
+    'name_desc': lambda value, recipe_id: (value, -recipe_id),
+}
+
+# sort_method accepted by get_recipes -> (view, read backwards), same options as the database repository
+SORT_METHODS = {
+    'name': ('name', False),
+    'name_asc': ('name', False),
+    'name_desc': ('name_desc', True),
+    'desc_name': ('name_desc', True),
+    'id': ('id', False),
+    'id_asc': ('id', False),
+    'id_desc': ('id', True),
+    'desc_id': ('id', True),
+}
+
+
+def resolve_sort_method(sort_method: str) -> Tuple[str, bool]:
+    """ View and direction for a sort method, unknown methods sort by name ascending. """
+    return SORT_METHODS.get((sort_method or 'name').lower(), SORT_METHODS['name'])
+
+
+def cursor_for(recipe: Recipe, sort_method: str) -> Tuple[object, int]:
+    """ (sort value, id) of a recipe, to pass to get_recipes_after for the recipes following it. """
+    view, _ = resolve_sort_method(sort_method)
+    return (recipe.id, recipe.id) if view == 'id' else (fold_name(recipe.name), recipe.id)
+
+
+def is_cursor_value(value: object, sort_method: str) -> bool:
+    """ Whether value can be the sort value of a cursor for the sort method, as cursor_for makes it. """
+    view, _ = resolve_sort_method(sort_method)
+    if view == 'id':
+        return isinstance(value, int) and not isinstance(value, bool)
+    return isinstance(value, str)
+
+
+class SortedView:
+    """
+    Recipes kept sorted by one key. Inserts bisect into the sorted keys, and a page is a
+    plain slice, so reading a page does not depend on the number of recipes before it.
+    """
+
+    def __init__(self, key: Callable[[Recipe], object], cursor_key: Callable[[object, int], object]):
+        self.__key = key
+        self.__cursor_key = cursor_key
+        self.__keys = []
+        self.__recipes = []
+
+    def __len__(self) -> int:
+        return len(self.__recipes)
+
+    def add(self, recipe: Recipe) -> None:
+        key = self.__key(recipe)
+        position = bisect_right(self.__keys, key)
+        self.__keys.insert(position, key)
+        self.__recipes.insert(position, recipe)
+
+    def rebuild(self, recipes: Iterable[Recipe]) -> None:
+        keyed = sorted(((self.__key(recipe), recipe) for recipe in recipes), key=lambda pair: pair[0])
+        self.__keys = [key for key, _ in keyed]
+        self.__recipes = [recipe for _, recipe in keyed]
+
+    def page_after(self, cursor: Tuple[object, int] | None, size: int, backwards: bool = False) -> List[Recipe]:
+        """ size recipes following the cursor in reading order, from the first one without a cursor. """
+        if cursor is None:
+            return self.page(0, size, backwards)
+        key = self.__cursor_key(*cursor)
+        if not backwards:
+            start = bisect_right(self.__keys, key)
+            return self.__recipes[start:start + size]
+        end = bisect_left(self.__keys, key)
+        return self.__recipes[max(0, end - size):end][::-1]
+
+    def page(self, start: int, size: int, backwards: bool = False) -> List[Recipe]:
+        """ size recipes from position start, counted from the end when reading backwards. """
+        if not backwards:
+            return self.__recipes[start:start + size]
+        end = len(self.__recipes) - start
+        if end <= 0:
+            return []
+        return self.__recipes[max(0, end - size):end][::-1]
@@ -0,0 +1,69 @@
+import heapq
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# Suggestion groups a typed prefix is completed from
+SUGGESTION_GROUPS = ('names', 'categories', 'authors', 'ingredients')
+
+
+class SuggestionCatalogue:
+    """
+    Distinct names, categories, authors and ingredients of the indexed recipes, with the
+    number of recipes using each value. The sorted prefix index is built on first use
+    and only rebuilt after a value that was not known before has been added.
+    """
+
+    def __init__(self):
+        self.__counts = {group: Counter() for group in SUGGESTION_GROUPS}
+        # group -> (sorted lowercase values, original values in the same order)
+        self.__prefix_index: Dict[str, Tuple[List[str], List[str]]] | None = None
+
+    def clear(self) -> None:
+        for counts in self.__counts.values():
+            counts.clear()
+        self.invalidate()
+
+    def add(self, name: str, category: str, author: str, ingredients: List[str]) -> None:
+        values = {
+            'names': {name} if name else set(),
+            'categories': {category} if category else set(),
+            'authors': {author} if author else set(),
+            'ingredients': {ingredient for ingredient in ingredients if ingredient},
+        }
+        for group, group_values in values.items():
+            counts = self.__counts[group]
+            for value in group_values:
+                if value not in counts:
+                    self.invalidate()
+                counts[value] += 1
+
+    def invalidate(self) -> None:
+        self.__prefix_index = None
+
+    def counts(self, group: str) -> Counter:
+        """ Number of recipes using each value of the group. """
+        return self.__counts[group]
+
+    def complete(self, prefix: str, group: str, limit: int = 10) -> List[str]:
+        """
+        Returns at most limit values of the group starting with prefix (case-insensitive),
+        most used first. The matching range is found by bisecting a sorted array, so only
+        the values sharing the prefix are looked at.
+        """
+        prefix = (prefix or "").strip().lower()
+        if not prefix or limit < 1:
+            return []
+        keys, values = self.__get_prefix_index()[group]
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + "\uffff", start)
+        counts = self.__counts[group]
+        return heapq.nsmallest(limit, values[start:end], key=lambda value: (-counts[value], value.lower()))
+
+    def __get_prefix_index(self) -> Dict[str, Tuple[List[str], List[str]]]:
+        if self.__prefix_index is None:
+            self.__prefix_index = {}
+            for group in SUGGESTION_GROUPS:
+                ordered = sorted(self.__counts[group], key=str.lower)
+                self.__prefix_index[group] = ([value.lower() for value in ordered], ordered)
+        return self.__prefix_index
@@ -0,0 +1,68 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+
+class TTLCache:
+    """
+    A bounded mapping that forgets its least recently used entry when full, and each entry
+    ttl seconds after it was stored, so values changed elsewhere are picked up eventually.
+    Lookups are counted as hits and misses. Safe to share between request threads.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.__maxsize = maxsize
+        self.__ttl = ttl
+        self.__clock = clock
+        self.__lock = threading.Lock()
+        self.__entries = OrderedDict()  # key -> (expiry time, value), least recently used first
+        self.__hits = 0
+        self.__misses = 0
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    @property
+    def hits(self) -> int:
+        return self.__hits
+
+    @property
+    def misses(self) -> int:
+        return self.__misses
+
+    def stats(self) -> dict:
+        with self.__lock:
+            return {'hits': self.__hits, 'misses': self.__misses, 'size': len(self.__entries)}
+
+    def get(self, key: Hashable, default=None):
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.__misses += 1
+                return default
+            expires, value = entry
+            if expires <= self.__clock():
+                del self.__entries[key]
+                self.__misses += 1
+                return default
+            self.__entries.move_to_end(key)
+            self.__hits += 1
+            return value
+
+    def put(self, key: Hashable, value) -> None:
+        with self.__lock:
+            self.__entries[key] = (self.__clock() + self.__ttl, value)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__maxsize:
+                self.__entries.popitem(last=False)
+
+    def discard(self, key: Hashable) -> None:
+        with self.__lock:
+            self.__entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
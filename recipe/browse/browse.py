@@ -4,37 +4,23 @@ from flask import render_template, Blueprint, request
 
 import recipe.adapters.repository as repo
 from recipe.browse import services
+from recipe.health import get_health_stars
 
 
 browse_blueprint = Blueprint('browse_bp', __name__)
 
 @browse_blueprint.route('/browse', methods=['GET'])
 def browse():
-    category_images = {}
-
-    list_of_recipes = services.get_all_recipes(repo.repo_instance)
     list_of_categories = list(services.get_categories(repo.repo_instance).values())
-    # sort recipes by name
-    sorted_recipes = sorted(list_of_recipes, key=lambda r: r.name.lower())
-
-    for category in list_of_categories:
-        for recipe in sorted_recipes:
-            # Use singular category attribute
-            if hasattr(recipe, 'category') and recipe.category.name == category.name:
-                if recipe.images and len(recipe.images) > 0:
-                    category_images[category.name] = recipe.images[0]
-                else:
-                    category_images[category.name] = "https://via.placeholder.com/300x200?text=No+Image"
-                break
-
-    # pagination
+    # maintained by the repository, one entry per category
+    category_images = services.get_category_images(repo.repo_instance)
+
+    # pagination, a cursor from the Next link seeks straight to the following page
     page = request.args.get('page', 1, type=int)
     per_page = 12
-    all_recipes = list_of_recipes
-    start = (page - 1) * per_page
-    end = start + per_page
-    recipes = sorted_recipes[start:end]
-    total_pages = (len(all_recipes) + per_page - 1) // per_page
+    recipes, page = services.get_recipe_page(repo.repo_instance, page, per_page, request.args.get('cursor'))
+    total_pages = (services.count_recipes(repo.repo_instance) + per_page - 1) // per_page
+    next_cursor = services.get_next_cursor(recipes, page) if page < total_pages else None
 
     # limit displayed pages
     max_display = 5
@@ -44,14 +30,9 @@ def browse():
         start_page = max(1, end_page - (max_display - 1))
     pages = range(start_page, end_page + 1)
 
-    # Find Nutrition for this recipe
-    health_stars = {}
-    for recipe in list_of_recipes:
-        nutrition = repo.repo_instance.get_nutrition_by_recipe_id(recipe.id)
-        if nutrition:
-            health_stars[recipe.id] = nutrition.calculate_health_stars()
-        else:
-            health_stars[recipe.id] = None
+    # Health stars are only needed for the recipes shown on this page
+    health_stars = get_health_stars(recipes, repo.repo_instance)
 
     return render_template('browse.html', recipes=recipes, categories=list_of_categories, category_images = category_images,
-                           page=page, total_pages=total_pages, pages=pages, health_stars=health_stars)
\ No newline at end of file
+                           page=page, total_pages=total_pages, pages=pages, health_stars=health_stars,
+                           next_cursor=next_cursor)
\ No newline at end of file
@@ -1,8 +1,39 @@
 from recipe.adapters.repository import AbstractRepository
+from recipe.adapters.sorted_views import cursor_for, is_cursor_value
+from recipe.pagination import decode_cursor, encode_cursor
+
+# Browse always lists recipes by name
+BROWSE_SORT_METHOD = 'name'
+
+PLACEHOLDER_IMAGE = "https://via.placeholder.com/300x200?text=No+Image"
 
 def get_recipes(page: int, page_size: int, sort_method: str, repo: AbstractRepository):
     return repo.get_recipes(page, page_size, sort_method)
 def get_all_recipes(repo: AbstractRepository):
     return repo.get_all_recipes()
+def count_recipes(repo: AbstractRepository) -> int:
+    return repo.count_recipes()
 def get_categories(repo: AbstractRepository):
-    return repo.get_categories()
\ No newline at end of file
+    return repo.get_categories()
+def get_category_images(repo: AbstractRepository) -> dict[str, str]:
+    """ Cover image of each category: its first recipe by name's image, else a placeholder. """
+    return {name: image or PLACEHOLDER_IMAGE for name, image in repo.get_category_cover_images().items()}
+def get_recipe_page(repo: AbstractRepository, page: int, per_page: int, cursor: str | None = None):
+    """
+    Returns (recipes, page) for a page number or, when a valid cursor is given, for the page
+    following the recipe it points at; that page is found by a keyset seek instead of an offset.
+    A tampered cursor, with values of the wrong type or a page before the first, is ignored.
+    """
+    position = decode_cursor(cursor)
+    if position is not None and isinstance(position.get('p'), int) and position['p'] >= 1 \
+            and isinstance(position.get('i'), int) and is_cursor_value(position.get('k'), BROWSE_SORT_METHOD):
+        recipes = repo.get_recipes_after((position['k'], position['i']), per_page, BROWSE_SORT_METHOD)
+        return recipes, position['p']
+    page = max(1, page)
+    return repo.get_recipes(page, per_page, BROWSE_SORT_METHOD), page
+def get_next_cursor(recipes, page: int) -> str | None:
+    """ Cursor of the page after the given one, None when it is empty. """
+    if not recipes:
+        return None
+    sort_value, recipe_id = cursor_for(recipes[-1], BROWSE_SORT_METHOD)
+    return encode_cursor(p=page + 1, k=sort_value, i=recipe_id)
@@ -18,6 +18,8 @@ class Nutrition:
         self.__fiber = fiber
         self.__sugar = sugar
         self.__protein = protein
+        # Computed on first use, or set by a batch computation over many rows
+        self.__health_stars = None
 
     def __repr__(self):
         return f"calories:{self.__calories}, fat:{self.__fat}, saturated_fat:{self.__saturated_fat}, cholesterol:{self.__cholesterol}, sodium:{self.__sodium}, protein:{self.__protein}, fiber:{self.__fiber}, sugar:{self.__sugar}, carbohydrates:{self.__carbohydrates}"
@@ -89,6 +91,19 @@ class Nutrition:
     def protein(self) -> float:
         return self.__protein
 
+    @property
+    def health_stars(self) -> float:
+        """ Health star score, computed once; the nutrition values never change afterwards. """
+        if self.__health_stars is None:
+            self.__health_stars = self.calculate_health_stars()
+        return self.__health_stars
+
+    @health_stars.setter
+    def health_stars(self, value: float):
+        if not isinstance(value, (int, float)) or not 0.5 <= value <= 5:
+            raise ValueError("health stars must be a number between 0.5 and 5.")
+        self.__health_stars = float(value)
+
     def calculate_health_stars(self) -> float|None:
 
         # Baseline points (negative)
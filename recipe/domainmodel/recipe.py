@@ -174,7 +174,7 @@ class Recipe:
     @property
     def nutrition_rating(self) -> float | None:
         if self.__nutrition is not None:
-            return self.__nutrition.calculate_health_stars()
+            return self.__nutrition.health_stars
         return None
 
     @property
@@ -1,5 +1,6 @@
 from flask import render_template, Blueprint, session, request
 from recipe.favorites import services
+from recipe.health import get_health_stars
 import recipe.adapters.repository as repo
 
 favorite_blueprint = Blueprint('favorite_bp', __name__)
@@ -28,14 +29,8 @@ def favorite():
         start_page = max(1, end_page - (max_display - 1))
     pages = range(start_page, end_page + 1)
 
-    # Find Nutrition for this recipe
-    health_stars = {}
-    for recipe in fav_recipes:
-        nutrition = repo.repo_instance.get_nutrition_by_recipe_id(recipe.id)
-        if nutrition:
-            health_stars[recipe.id] = nutrition.calculate_health_stars()
-        else:
-            health_stars[recipe.id] = None
+    # Find Nutrition for the recipes of this page, in one lookup
+    health_stars = get_health_stars(recipes, repo.repo_instance)
 
     return render_template('favorite.html', recipes=recipes,
                            page=page, total_pages=total_pages, pages=pages, health_stars=health_stars)
\ No newline at end of file
@@ -4,4 +4,5 @@ from recipe.adapters.repository import AbstractRepository
 
 def get_favourite_recipes(username, repo: AbstractRepository):
     user = repo.get_user(username)
-    return [repo.get_recipe_by_id(f.recipe.id) for f in user.get_favourite_recipes]
\ No newline at end of file
+    # A favourite's id is the id of its recipe, all favourites are loaded in one batch
+    return repo.get_recipes_by_ids([f.id for f in user.get_favourite_recipes])
@@ -0,0 +1,11 @@
+from recipe.adapters.repository import AbstractRepository
+
+
+def health_stars_of(recipes, nutrition: dict) -> dict:
+    """ Health stars of the given recipes from their nutrition by recipe id, None when a recipe has none. """
+    return {recipe.id: nutrition[recipe.id].health_stars if recipe.id in nutrition else None for recipe in recipes}
+
+
+def get_health_stars(recipes, repo: AbstractRepository) -> dict:
+    """ Health stars of the given recipes only, their nutrition is fetched in one lookup. """
+    return health_stars_of(recipes, repo.get_nutrition_by_recipe_ids([recipe.id for recipe in recipes]))
@@ -8,4 +8,7 @@ def get_categories(repo: AbstractRepository):
     return repo.get_categories()
 
 def get_nutrition_by_recipe_id(recipe_id: int, repo: AbstractRepository):
-    return repo.get_nutrition_by_recipe_id(recipe_id)
\ No newline at end of file
+    return repo.get_nutrition_by_recipe_id(recipe_id)
+
+def get_nutrition_by_recipe_ids(recipe_ids: list[int], repo: AbstractRepository):
+    return repo.get_nutrition_by_recipe_ids(recipe_ids)
\ No newline at end of file
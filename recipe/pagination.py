@@ -0,0 +1,20 @@
+import base64
+import binascii
+import json
+
+
+def encode_cursor(**values) -> str:
+    """ Opaque, url-safe token carrying the position of a listing page. """
+    payload = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(token: str | None) -> dict | None:
+    """ Values of a token made by encode_cursor, None for a missing or tampered token. """
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, binascii.Error):
+        return None
+    return values if isinstance(values, dict) else None
@@ -7,6 +7,7 @@ from datetime import datetime
 
 import recipe.adapters.repository as repo
 import recipe.recipe_detail.services as services
+from recipe.health import health_stars_of
 from recipe.authentication.authentication import login_required
 
 recipe_blueprint = Blueprint('recipe_bp', __name__)
@@ -23,7 +24,6 @@ class ReviewForm(FlaskForm):
 @recipe_blueprint.route('/recipe/<int:recipe_id>', methods=['GET'])
 def recipe_detail(recipe_id):
     recipe = repo.repo_instance.get_recipe_by_id(recipe_id)
-    list_of_recipes = repo.repo_instance.get_recipes(1, 100, "s")
 
     if recipe is None:
         return render_template('404.html', message="Recipe not found"), 404
@@ -40,13 +40,13 @@ def recipe_detail(recipe_id):
             repo=repo.repo_instance,
         )
 
-    # Reviews & nutrition
+    # Reviews, related recipes & nutrition
     reviews = services.get_reviews_for_recipe(recipe_id, repo.repo_instance)
-    nutrition = repo.repo_instance.get_nutrition_by_recipe_id(recipe_id)
-    health_stars = {
-        recipe.id: repo.repo_instance.get_nutrition_by_recipe_id(recipe.id).calculate_health_stars()
-        for recipe in list_of_recipes
-    }
+    related_recipes = repo.repo_instance.get_related_recipes(recipe_id)
+    # The recipe's own nutrition is fetched together with the related recipes' in one lookup
+    nutrition_by_id = repo.repo_instance.get_nutrition_by_recipe_ids([recipe_id] + [r.id for r in related_recipes])
+    nutrition = nutrition_by_id.get(recipe_id)
+    health_stars = health_stars_of([recipe] + related_recipes, nutrition_by_id)
 
     return render_template(
         "recipe_detail.html",
@@ -56,6 +56,7 @@ def recipe_detail(recipe_id):
         handler_url=url_for("recipe_bp.add_review", recipe_id=recipe_id),
         nutrition=nutrition,
         health_stars=health_stars,
+        related_recipes=related_recipes,
         is_favorited=is_favorited,
         favorite_handler_url=url_for("recipe_bp.add_favorite", recipe_id=recipe_id),
     )
@@ -1,5 +1,5 @@
 import math
-from flask import request, render_template, Blueprint
+from flask import request, render_template, Blueprint, jsonify
 import recipe.adapters.repository as abs_repo
 
 from .services import SearchService
@@ -15,22 +15,32 @@ def search():
     query = request.args.get("q", "").strip()
     filter_by = request.args.get("filter_by", "").strip()
     page = request.args.get("page", 1, type=int)
+    cursor = request.args.get("cursor")
+    sort_by = request.args.get("sort", "").strip() or None
 
-    search_results = search_service.search_recipes(query, filter_by, page)
+    search_results = search_service.search_recipes(query, filter_by, page, cursor=cursor, sort_by=sort_by)
 
     return render_template(
         "search_results.html",
         recipes=search_results['recipes'],
         query=query,
         filter_by=filter_by,
-        names=search_results['suggestions']['names'],
-        categories=search_results['suggestions']['categories'],
-        authors=search_results['suggestions']['authors'],
-        ingredients=search_results['suggestions']['ingredients'],
+        sort=search_results['sort'],
         page=search_results['pagination']['page'],
         total_pages=search_results['pagination']['total_pages'],
         total_recipes=search_results['total_recipes'],
         pages=search_results['pagination']['pages'],
+        next_cursor=search_results['pagination']['next_cursor'],
         nutrition=search_results['nutrition'],
         health_stars=search_results['health_stars'],
-    )
\ No newline at end of file
+        snippets=search_results['snippets'],
+    )
+
+@search_blueprint.route("/search/suggest")
+def suggest():
+    # Autocomplete for the search box: only the top matches for the typed prefix are sent
+    prefix = request.args.get("q", "").strip()
+    field = request.args.get("field", "").strip()
+    limit = request.args.get("limit", 10, type=int)
+
+    return jsonify(suggestions=search_service.suggest(prefix, field, limit))
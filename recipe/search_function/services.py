@@ -1,90 +1,122 @@
 import math
 from typing import List, Dict, Any, Tuple
+
+from markupsafe import Markup, escape
+
+from recipe.adapters.fulltext import SNIPPET_CLOSE, SNIPPET_OPEN
+from recipe.adapters.search_index import SearchPage, normalize_query, resolve_search_sort
+from recipe.adapters.ttl_cache import TTLCache
+from recipe.health import health_stars_of
 from recipe.domainmodel.recipe import Recipe
 from recipe.domainmodel.nutrition import Nutrition
+from recipe.pagination import decode_cursor, encode_cursor
 
 
-class SearchService:
-    def __init__(self, repository):
-        self.repo = repository
+# Maps the search filters onto the suggestion groups they complete
+SUGGESTION_GROUP_BY_FILTER = {
+    'name': 'names',
+    'category': 'categories',
+    'author': 'authors',
+    'ingredients': 'ingredients',
+}
 
-    def search_recipes(self, query: str = "", filter_by: str = "", page: int = 1, per_page: int = 12) -> Dict[str, Any]:
-        """Search recipes with filtering and pagination"""
-        all_recipes = self.repo.get_all_recipes()
+# Pages of search results kept for repeated searches: only ids, totals and snippets are stored,
+# and entries of an older catalogue generation are never read again
+SEARCH_CACHE_SIZE = 512
+SEARCH_CACHE_TTL = 300
 
-        # Filter recipes
-        matched_recipes = self._filter_recipes(all_recipes, query, filter_by)
 
-        # Sort recipes
-        matched_recipes = self._sort_recipes(matched_recipes, filter_by)
+def highlight(snippet: str) -> Markup:
+    """Escapes a search snippet for HTML and marks up its matched terms"""
+    escaped = str(escape(snippet))
+    return Markup(escaped.replace(SNIPPET_OPEN, '<mark>').replace(SNIPPET_CLOSE, '</mark>'))
 
-        # Paginate results
-        paginated_recipes, pagination_data = self._paginate_recipes(matched_recipes, page, per_page)
+
+def _is_cursor(values: dict) -> bool:
+    """Whether decoded cursor values hold a page number, a sort value (score or name) and an id"""
+    page, sort_value, recipe_id = values.get('p'), values.get('k'), values.get('i')
+    return isinstance(page, int) and isinstance(recipe_id, int) \
+        and isinstance(sort_value, (str, int, float)) and not isinstance(sort_value, bool)
+
+
+class SearchService:
+    def __init__(self, repository, result_cache: TTLCache | None = None):
+        self.repo = repository
+        # One service, and so one cache, serves every request thread; TTLCache locks its own entries
+        if result_cache is None:
+            result_cache = TTLCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+        self.result_cache = result_cache
+
+    def search_recipes(self, query: str = "", filter_by: str = "", page: int = 1, per_page: int = 12,
+                       cursor: str | None = None, sort_by: str | None = None) -> Dict[str, Any]:
+        """
+        Search recipes with filtering and pagination, a cursor continues after the last recipe it names.
+        Results are ranked by relevance when the query has words, unless sort_by asks for alphabetical
+        """
+        # A cursor carries the sort value and id of the last recipe shown, so the next page seeks past
+        # it like the first page is read, and neither repeats nor skips results added in between
+        after = None
+        cursor_values = decode_cursor(cursor)
+        if cursor_values is not None and _is_cursor(cursor_values):
+            page, after = cursor_values['p'], (cursor_values['k'], cursor_values['i'])
+        page = max(1, page)
+        sort_by = resolve_search_sort(query, sort_by)
+
+        # Any write to the catalogue changes its generation, so older cached pages are never hit again
+        cache_key = (normalize_query(query), filter_by, sort_by, page, per_page, after,
+                     self.repo.get_catalogue_generation())
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            page, total_pages, result = cached
+        else:
+            page, total_pages, result = self._search_page(query, filter_by, page, per_page, after, sort_by)
+            self.result_cache.put(cache_key, (page, total_pages, result))
+        pagination_data = self._paginate_recipes(result.last_key, page, total_pages)
+        paginated_recipes = self.repo.get_recipes_by_ids(result.ids)
 
         # Get nutrition and health data
         nutrition_map, health_stars = self._get_nutrition_data(paginated_recipes)
 
-        # Get autocomplete suggestions
-        suggestions = self._get_autocomplete_suggestions(all_recipes)
-
         return {
             'recipes': paginated_recipes,
-            'total_recipes': len(matched_recipes),
+            'total_recipes': result.total,
             'nutrition': nutrition_map,
             'health_stars': health_stars,
-            'suggestions': suggestions,
+            'snippets': {recipe_id: highlight(snippet) for recipe_id, snippet in (result.snippets or {}).items()},
+            'sort': sort_by,
             'pagination': pagination_data
         }
 
-    def _filter_recipes(self, recipes: List[Recipe], query: str, filter_by: str) -> List[Recipe]:
-        """Filter recipes based on query and filter type"""
-        if not query:
-            return recipes
-
-        query_lower = query.lower()
-
-        filter_map = {
-            'name': lambda r: query_lower in r.name.lower(),
-            'category': lambda r: query_lower in r.category.name.lower(),
-            'author': lambda r: query_lower in r.author.name.lower(),
-            'ingredients': lambda r: any(query_lower in ing.lower() for ing in getattr(r, 'ingredients', []))
-        }
-
-        if filter_by in filter_map:
-            return [r for r in recipes if filter_map[filter_by](r)]
-
-        # Default search across multiple fields
-        return [r for r in recipes if (
-                query_lower in r.name.lower() or
-                query_lower in r.category.name.lower() or
-                query_lower in r.author.name.lower() or
-                any(query_lower in ing.lower() for ing in getattr(r, 'ingredients', []))
-        )]
-
-    def _sort_recipes(self, recipes: List[Recipe], filter_by: str) -> List[Recipe]:
-        """Sort recipes based on filter type"""
-        sort_map = {
-            'name': lambda r: r.name.lower(),
-            'category': lambda r: r.category.name.lower(),
-            'author': lambda r: r.author.name.lower(),
-            'ingredients': lambda r: (r.ingredients[0].lower() if getattr(r, 'ingredients', []) else "")
-        }
-
-        if filter_by in sort_map:
-            return sorted(recipes, key=sort_map[filter_by])
-
-        return sorted(recipes, key=lambda r: r.name.lower())
-
-    def _paginate_recipes(self, recipes: List[Recipe], page: int, per_page: int) -> Tuple[List[Recipe], Dict[str, Any]]:
-        """Paginate recipe results"""
-        total_recipes = len(recipes)
-        total_pages = max(1, math.ceil(total_recipes / per_page))
-        page = max(1, min(page, total_pages))
-
-        start = (page - 1) * per_page
-        end = start + per_page
-        paginated_recipes = recipes[start:end]
-
+    def cache_stats(self) -> Dict[str, int]:
+        """Hits, misses and size of the search result cache"""
+        return self.result_cache.stats()
+
+    def _search_page(self, query: str, filter_by: str, page: int, per_page: int, after: tuple | None,
+                     sort_by: str) -> Tuple[int, int, SearchPage]:
+        """The page actually shown, the number of pages and the page of matching ids"""
+        # The repository matches, orders and pages the results, only the requested page of ids comes back
+        result = self.repo.search_recipe_page(query, filter_by, (page - 1) * per_page, per_page, after, sort_by)
+        total_pages = max(1, math.ceil(result.total / per_page))
+        if page > total_pages:
+            page = total_pages
+            result = self.repo.search_recipe_page(query, filter_by, (page - 1) * per_page, per_page,
+                                                  sort_by=sort_by)
+        return page, total_pages, result
+
+    def suggest(self, prefix: str, field: str, limit: int = 10) -> List[str]:
+        """Top matches for a typed prefix, most used values first"""
+        limit = max(1, min(limit, 50))
+        if field in SUGGESTION_GROUP_BY_FILTER:
+            return self.repo.get_search_completions(prefix, SUGGESTION_GROUP_BY_FILTER[field], limit)
+
+        # No filter selected: merge the top matches of every group
+        matches = []
+        for group in SUGGESTION_GROUP_BY_FILTER.values():
+            matches.extend(self.repo.get_search_completions(prefix, group, limit))
+        return list(dict.fromkeys(matches))[:limit]
+
+    def _paginate_recipes(self, last_key: tuple | None, page: int, total_pages: int) -> Dict[str, Any]:
+        """Pagination links around the current page, last_key is the sort key of its last recipe"""
         # Calculate pagination range
         max_display = 5
         start_page = max(1, page - 2)
@@ -99,28 +131,15 @@ class SearchService:
             'has_prev': page > 1,
             'has_next': page < total_pages,
             'prev_page': page - 1 if page > 1 else None,
-            'next_page': page + 1 if page < total_pages else None
+            'next_page': page + 1 if page < total_pages else None,
+            'next_cursor': encode_cursor(p=page + 1, k=last_key[0], i=last_key[1])
+            if page < total_pages and last_key is not None else None
         }
 
-        return paginated_recipes, pagination_data
+        return pagination_data
 
     def _get_nutrition_data(self, recipes: List[Recipe]) -> Tuple[Dict[int, Nutrition], Dict[int, float]]:
         """Get nutrition data and health stars for recipes"""
-        nutrition_map = {}
-        health_stars = {}
-
-        for recipe in recipes:
-            nutrition = self.repo.get_nutrition_by_recipe_id(recipe.id)
-            nutrition_map[recipe.id] = nutrition
-            health_stars[recipe.id] = nutrition.calculate_health_stars() if nutrition else None
-
-        return nutrition_map, health_stars
-
-    def _get_autocomplete_suggestions(self, recipes: List[Recipe]) -> Dict[str, List[str]]:
-        """Get autocomplete suggestions for search"""
-        return {
-            'names': sorted({r.name for r in recipes}),
-            'categories': sorted({r.category.name for r in recipes}),
-            'authors': sorted({r.author.name for r in recipes}),
-            'ingredients': sorted({ing for r in recipes for ing in getattr(r, 'ingredients', [])})
-        }
+        found = self.repo.get_nutrition_by_recipe_ids([recipe.id for recipe in recipes])
+        nutrition_map = {recipe.id: found.get(recipe.id) for recipe in recipes}
+        return nutrition_map, health_stars_of(recipes, found)
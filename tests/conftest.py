@@ -85,6 +85,7 @@ def in_memory_repo():
 def client():
     my_app = create_app({
         'TESTING': True,                                # Set to True during testing.
+        'CATALOGUE_SNAPSHOT': False,                    # Keep tests from writing a snapshot next to the test data.
         'TEST_DATA_PATH': TEST_DATA_PATH,               # Path for loading test data into the repository.
         'WTF_CSRF_ENABLED': False                       # test_client will not send a CSRF token, so disable validation.
     })
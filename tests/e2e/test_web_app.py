@@ -1,6 +1,8 @@
 import pytest
 from recipe import create_app
 from flask import session
+import recipe.adapters.repository as repo
+from recipe.pagination import encode_cursor
 
 # ----------------- Authentication -----------------
 def test_register_new_user(client):
@@ -65,6 +67,29 @@ def test_logout(client):
     response = client.get("/authentication/logout", follow_redirects=True)
     assert b"HOME" in response.data
 
+def test_session_cleared_once_user_is_removed(client):
+    client.post("/authentication/register", data={"user_name": "goneuser", "password": "Password123"})
+    client.post("/authentication/login", data={"user_name": "goneuser", "password": "Password123"})
+    with client:
+        client.get("/")
+        assert session.get("user_name") == "goneuser"
+
+        repo.repo_instance.remove_user("goneuser")
+        client.get("/")
+        assert "user_name" not in session
+
+
+def test_static_files_skip_the_user_check(client, monkeypatch):
+    client.post("/authentication/register", data={"user_name": "staticuser", "password": "Password123"})
+    client.post("/authentication/login", data={"user_name": "staticuser", "password": "Password123"})
+    checked = []
+    monkeypatch.setattr(repo.repo_instance, "user_exists", lambda user_name: checked.append(user_name) or True)
+
+    assert client.get("/static/css/main.css").status_code == 200
+    assert checked == []
+    client.get("/")
+    assert checked == ["staticuser"]
+
 # ----------------- post review -----------------
 
 RECIPE_ID = 38  # exists in tests/data/test_recipes.csv
@@ -145,12 +170,11 @@ def test_search_pagination(search_service):
     assert results['pagination']['total_pages'] == 2
 
 def test_search_suggestions(search_service):
-    results = search_service.search_recipes()
-    assert "Low-Fat Berry Blue Frozen Dessert" in results['suggestions']['names']
-    assert "Soy/Tofu" in results['suggestions']['categories']
-    assert "Frozen Desserts" in results['suggestions']['categories']
-    assert "Dancer" in results['suggestions']['authors']
-    assert "sugar" in results['suggestions']['ingredients']
+    assert "Low-Fat Berry Blue Frozen Dessert" in search_service.suggest("low", "name")
+    assert "Soy/Tofu" in search_service.suggest("soy", "category")
+    assert "Frozen Desserts" in search_service.suggest("frozen", "category")
+    assert "Dancer" in search_service.suggest("dan", "author")
+    assert "sugar" in search_service.suggest("sug", "ingredients")
 
 def test_search_route_integration(client):
     response = client.get("/search?q=chicken")
@@ -193,6 +217,38 @@ def test_remove_favorite_recipe(client):
 
     assert r.status_code == 200
 
+def test_search_suggest_returns_top_matches(client):
+    response = client.get("/search/suggest?q=best&field=name")
+    assert response.status_code == 200
+    assert response.get_json() == {"suggestions": ["Best Lemonade"]}
+
+    response = client.get("/search/suggest?q=zzz&field=author")
+    assert response.get_json() == {"suggestions": []}
+
+
+def test_search_page_does_not_embed_vocabulary(client):
+    response = client.get("/search?q=lemonade&filter_by=name")
+    assert b'<datalist id="suggestions"></datalist>' in response.data
+
+
+def test_recipe_detail_lists_related_recipes(client):
+    response = client.get("/recipe/38")
+    assert response.status_code == 200
+    assert b"Related Recipes" in response.data
+    assert b'href="/recipe/40"' in response.data
+
+
+@pytest.mark.parametrize("values", [
+    {"p": 2, "k": 5, "i": 3},
+    {"p": 2, "k": None, "i": 3},
+    {"p": -4, "k": "Best Lemonade", "i": 40},
+])
+def test_browse_ignores_tampered_cursor(client, values):
+    response = client.get(f"/browse?cursor={encode_cursor(**values)}")
+    assert response.status_code == 200
+    assert b'<span class="current-page">1</span>' in response.data
+
+
 def test_search_pagination_route(client):
     response = client.get("/search?page=2")
     assert response.status_code == 200
@@ -1,3 +1,4 @@
+import io
 import pytest
 from datetime import datetime
 
@@ -9,7 +10,9 @@ from recipe.domainmodel.recipe import Recipe
 from recipe.domainmodel.review import Review
 from recipe.domainmodel.favourite import Favourite
 from recipe.domainmodel.nutrition import Nutrition
-from recipe.adapters.datareader.csvreader import CSVReader
+from recipe.adapters.datareader import snapshot
+from recipe.adapters.health_stars import backfill_health_stars, compute_health_stars
+from recipe.adapters.datareader.csvreader import CSVReader, chunk_offsets, parse_list
 from recipe.adapters.repository_populate import populate
 from pathlib import Path
 
@@ -302,6 +305,25 @@ def test_nutrition_comparison():
     assert n1.__lt__(n2)
     assert not n2.__lt__(n1,)
 
+def test_nutrition_health_stars_are_computed_once_and_settable():
+    n1 = Nutrition(1, saturated_fat=4, sugar=12, sodium=50, fiber=9, protein=3)
+    assert n1.health_stars == n1.calculate_health_stars() == 3
+    n1.health_stars = 4.5
+    assert n1.health_stars == 4.5
+    with pytest.raises(ValueError):
+        n1.health_stars = 7
+
+def test_vectorized_health_stars_match_scalar_thresholds():
+    rows = [Nutrition(i, saturated_fat=sat, sugar=sugar, sodium=sodium, fiber=fiber, protein=protein)
+            for i, (sat, sugar, sodium, fiber, protein) in enumerate([
+                (None, None, None, None, None), (0, 0, 0, 0, 0), (1, 5, 120, 4, 5), (1.01, 5.5, 121, 8, 10),
+                (3, 10, 200, 7.9, 9.9), (5, 15, 400, 20, 50), (5.1, 16, 401, 0, 0), (float("nan"), 3, 3, 3, 3),
+            ], start=1)]
+    assert compute_health_stars(rows) == [n.calculate_health_stars() for n in rows]
+
+    backfill_health_stars(rows)
+    assert [n.health_stars for n in rows] == [n.calculate_health_stars() for n in rows]
+
 def test_nutrition_repr_and_hash():
     n1 = Nutrition(1, calories=100)
     repr_str = repr(n1)
@@ -373,5 +395,128 @@ def test_csvreader_get_recipe_ingredients(info):
 def test_csvreader_get_instructions(info):
     instructions = info.get_instructions()
     assert len(instructions) == 29
+
+def test_csvreader_iter_recipes_yields_one_bundle_per_row():
+    data_path = Path(__file__).resolve().parent.parent / "data" / "test_recipes.csv"
+    reader = CSVReader(data_path)
+    bundles = list(reader.iter_recipes())
+
+    assert [b.recipe.id for b in bundles] == [38, 40, 41]
+    assert sum(len(b.images) for b in bundles) == 9
+    assert sum(len(b.ingredients) for b in bundles) == 23
+    assert sum(len(b.instructions) for b in bundles) == 29
+    first = bundles[0]
+    assert first.nutrition is first.recipe.nutrition
+    assert [i.url for i in first.images] == first.recipe.images
+    assert [c.id for c in reader.get_categories().values()] == [1, 2]
+    # streaming does not materialise the accessor lists
+    assert reader.get_recipes() == []
+
+def test_parse_list_reads_both_quote_styles():
+    assert parse_list("['4', \"confectioners' sugar\", 'butter']") == ['4', "confectioners' sugar", 'butter']
+    assert parse_list('[ "a" ,"b"]') == ['a', 'b']
+
+def test_parse_list_falls_back_for_escaped_quotes():
+    assert parse_list("['Fannie Flagg\\'s pie', 'a\\\\b']") == ["Fannie Flagg's pie", 'a\\b']
+
+def test_parse_list_sentinels_and_malformed_cells():
+    for value in (None, "", "None", "NA", "[]", " character(0) "):
+        assert parse_list(value) == []
+    assert parse_list("['NA', '1']") == ['NA', '1']
+    assert parse_list("['a', 'b'") == []
+    assert parse_list("['a',]") == ['a']
+
+def test_chunk_offsets_keep_quoted_newlines_in_their_row():
+    data = 'h\na,"first\nline ""quoted""\nend"\nb,plain\nc,"x\ny"\n'.encode("utf-8")
+    for chunk_size in (1, 3, 7, 1000):
+        ranges = list(chunk_offsets(io.BytesIO(data), 2, chunk_size))
+        chunks = [data[start:end] for start, end in ranges]
+        assert b"".join(chunks) == data[2:]
+        assert all(chunk.endswith(b"\n") for chunk in chunks)
+        assert all(end - start >= chunk_size for start, end in ranges[:-1])
+    assert [data[start:end] for start, end in chunk_offsets(io.BytesIO(data), 2, 3)][0] == \
+        b'a,"first\nline ""quoted""\nend"\n'
+
+def test_csvreader_parallel_read_matches_serial_read():
+    data_path = Path(__file__).resolve().parent.parent / "data" / "test_recipes.csv"
+    serial = CSVReader(data_path)
+    serial.extract_data()
+    parallel = CSVReader(data_path)
+    parallel.extract_data(workers=2)
+
+    assert [r.id for r in parallel.get_recipes()] == [r.id for r in serial.get_recipes()]
+    assert [(c.id, c.name) for c in parallel.get_categories().values()] == \
+        [(c.id, c.name) for c in serial.get_categories().values()]
+    assert list(parallel.get_authors()) == list(serial.get_authors())
+    assert [r.ingredients for r in parallel.get_recipes()] == [r.ingredients for r in serial.get_recipes()]
+    assert len(parallel.get_instructions()) == len(serial.get_instructions())
+    first = parallel.get_recipes()[0]
+    assert first.author is parallel.get_authors()[first.author.id]
+
+def test_csvreader_parallel_read_keeps_row_order_across_many_chunks(monkeypatch):
+    data_path = Path(__file__).resolve().parent.parent / "data" / "test_recipes.csv"
+    serial = CSVReader(data_path)
+    serial.extract_data()
+
+    # a chunk per row, more than fit in flight at once
+    monkeypatch.setattr("recipe.adapters.datareader.csvreader.CHUNK_BYTES", 16)
+    monkeypatch.setattr("recipe.adapters.datareader.csvreader.CHUNKS_IN_FLIGHT_PER_WORKER", 1)
+    parallel = CSVReader(data_path)
+    parallel.extract_data(workers=2)
+    assert [(r.id, r.date, r.instructions) for r in parallel.get_recipes()] == \
+        [(r.id, r.date, r.instructions) for r in serial.get_recipes()]
+
+def test_csvreader_snapshot_is_written_then_reused(tmp_path, monkeypatch):
+    data_path = Path(__file__).resolve().parent.parent / "data" / "test_recipes.csv"
+    snapshot_path = tmp_path / "recipes.snapshot"
+    first = CSVReader(data_path)
+    first.extract_data(snapshot_path=snapshot_path)
+    assert snapshot_path.exists()
+
+    # a valid snapshot means the csv is not parsed again
+    monkeypatch.setattr("recipe.adapters.datareader.csvreader.parse_row", None)
+    second = CSVReader(data_path)
+    second.extract_data(snapshot_path=snapshot_path)
+    assert [(r.id, r.name, r.ingredients) for r in second.get_recipes()] == \
+        [(r.id, r.name, r.ingredients) for r in first.get_recipes()]
+    assert [(c.id, c.name) for c in second.get_categories().values()] == \
+        [(c.id, c.name) for c in first.get_categories().values()]
+    assert len(second.get_images()) == len(first.get_images())
+    assert [r.date for r in second.get_recipes()] == [r.date for r in first.get_recipes()]
+
+def test_csvreader_reparses_a_snapshot_of_another_row_layout(tmp_path, monkeypatch):
+    data_path = Path(__file__).resolve().parent.parent / "data" / "test_recipes.csv"
+    snapshot_path = tmp_path / "recipes.snapshot"
+    CSVReader(data_path).extract_data(snapshot_path=snapshot_path)
+
+    monkeypatch.setattr("recipe.adapters.datareader.csvreader.ROW_LAYOUT", "0:recipe_id,name")
+    reader = CSVReader(data_path)
+    reader.extract_data(snapshot_path=snapshot_path)
+    assert len(reader.get_recipes()) == 3
+    assert snapshot.load_rows(snapshot_path, data_path, "0:recipe_id,name") is not None
+
+    # rows that do not fit RecipeRow are a miss too, not an error
+    snapshot.save_rows(snapshot_path, data_path, [[1, "a"]], "0:recipe_id,name")
+    reader = CSVReader(data_path)
+    reader.extract_data(snapshot_path=snapshot_path)
+    assert len(reader.get_recipes()) == 3
+
+def test_snapshot_is_ignored_when_csv_changes_or_file_is_corrupt(tmp_path):
+    csv_path = tmp_path / "recipes.csv"
+    csv_path.write_bytes((Path(__file__).resolve().parent.parent / "data" / "test_recipes.csv").read_bytes())
+    snapshot_path = tmp_path / "recipes.snapshot"
+    created = datetime(2020, 5, 17, 9, 30)
+    assert snapshot.save_rows(snapshot_path, csv_path, [(1, "a", created, {"fat": 1.5})], "v1")
+    assert snapshot.load_rows(snapshot_path, csv_path, "v1") == [[1, "a", created, {"fat": 1.5}]]
+    # written for another row layout
+    assert snapshot.load_rows(snapshot_path, csv_path, "v2") is None
+
+    with open(csv_path, "a") as f:
+        f.write("\n")
+    assert snapshot.load_rows(snapshot_path, csv_path) is None
+
+    snapshot_path.write_bytes(b"not a snapshot")
+    assert snapshot.load_rows(snapshot_path, csv_path) is None
+    assert snapshot.load_rows(tmp_path / "missing.snapshot", csv_path) is None
 # ---------------------------------------------
 
@@ -0,0 +1,35 @@
+from recipe.adapters.query_parser import And, Not, Or, Term, format_query, parse_query, positive_terms
+
+
+def test_words_are_and_ed_and_operators_combine_them():
+    assert parse_query("chicken garlic") == And((Term(("chicken",)), Term(("garlic",))))
+    assert parse_query("chicken AND garlic") == parse_query("Chicken  garlic")
+    assert parse_query("cake OR pie NOT nut") == Or((Term(("cake",)), And((Term(("pie",)), Not(Term(("nut",)))))))
+    assert parse_query("(cake OR pie) nut") == And((Or((Term(("cake",)), Term(("pie",)))), Term(("nut",))))
+    # lowercase operators are words
+    assert parse_query("salt and pepper") == And((Term(("salt",)), Term(("and",)), Term(("pepper",))))
+
+
+def test_phrases_and_field_prefixes():
+    assert parse_query('"Lemon Juice"') == Term(("lemon", "juice"), phrase=True)
+    assert parse_query("ingredient:garlic author:dancer") == \
+        And((Term(("garlic",), "ingredients"), Term(("dancer",), "author")))
+    assert parse_query('name:(cake OR "apple pie")') == \
+        Or((Term(("cake",), "name"), Term(("apple", "pie"), "name", phrase=True)))
+    # unknown prefixes are searched as words
+    assert parse_query("colour:red") == And((Term(("colour",)), Term(("red",))))
+
+
+def test_malformed_queries_do_not_fail():
+    assert parse_query("") is None
+    assert parse_query('NOT "') is None
+    assert parse_query("OR cake AND") == Term(("cake",))
+    assert parse_query(") cake (pie") == And((Term(("cake",)), Term(("pie",))))
+    assert parse_query("name:") == Term(("name",))
+
+
+def test_format_and_positive_terms():
+    parsed = parse_query('pie  (cake OR  tart) NOT author:"jo smith"')
+    assert format_query(parsed) == 'pie AND (cake OR tart) AND NOT author:"jo smith"'
+    assert format_query(parse_query(format_query(parsed))) == format_query(parsed)
+    assert [term.tokens for term in positive_terms(parsed)] == [("pie",), ("cake",), ("tart",)]
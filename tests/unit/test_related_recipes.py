@@ -0,0 +1,37 @@
+from recipe.adapters import related_recipes
+from recipe.adapters.related_recipes import RelatedRecipesIndex
+
+
+def test_ranked_by_shared_ingredients_then_category_then_id():
+    index = RelatedRecipesIndex()
+    index.add_entry(1, 10, ["Flour", "sugar", "eggs"])
+    index.add_entry(2, 20, ["flour", "sugar ", "butter"])
+    index.add_entry(3, 10, ["flour", "milk"])
+    index.add_entry(4, 20, ["flour"])
+    index.add_entry(5, 10, ["rice"])
+
+    assert index.related(1) == [2, 3, 4, 5]
+    assert index.related(1, limit=2) == [2, 3]
+    assert index.related(5) == [1, 3]
+    assert index.related(99) == []
+
+
+def test_common_ingredients_are_ignored(monkeypatch):
+    monkeypatch.setattr(related_recipes, "MAX_POSTING_LENGTH", 2)
+    index = RelatedRecipesIndex()
+    index.add_entry(1, 10, ["salt", "beef"])
+    index.add_entry(2, 20, ["salt", "beef"])
+    index.add_entry(3, 20, ["salt"])
+
+    assert index.related(1) == [2]
+
+
+def test_results_follow_added_recipes():
+    index = RelatedRecipesIndex()
+    index.add_entry(1, 10, ["tofu"])
+    index.add_entry(2, 20, ["rice"])
+    assert index.related(1) == []
+
+    index.add_entry(3, 20, ["tofu", "rice"])
+    assert index.related(1) == [3]
+    assert index.related(2) == [3]
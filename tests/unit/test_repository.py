@@ -2,6 +2,7 @@ from datetime import datetime
 from tests.conftest import *
 import pytest
 
+from recipe.adapters.sorted_views import cursor_for
 from recipe.domainmodel.nutrition import Nutrition
 
 
@@ -13,6 +14,21 @@ def test_add_and_get_user(repo, sample_user):
     assert repo.get_user("bob") is None
 
 
+def test_user_exists_and_remove_user(repo, sample_user):
+    repo.add_user(sample_user)
+    recipe = repo.get_recipe_by_id(38)
+    review = Review(sample_user.username, recipe, 4, "Nice", datetime.now(), 1)
+    repo.add_review(review)
+    assert repo.user_exists("alice")
+    assert not repo.user_exists("bob")
+
+    repo.remove_user("alice")
+    repo.remove_user("alice")
+    assert not repo.user_exists("alice")
+    assert repo.get_user("alice") is None
+    assert review not in recipe.reviews
+
+
 # ----------------- Reviews -----------------
 
 def test_add_review(repo, sample_user, sample_recipe, sample_review):
@@ -61,12 +77,100 @@ def test_add_and_get_recipe(repo, sample_recipe):
     assert sample_recipe in recipes1
 
 
+def test_get_recipes_by_ids_keeps_requested_order(repo):
+    recipes = repo.get_recipes_by_ids([41, 38, 12345])
+    assert [r.id for r in recipes] == [41, 38]
+
+
+def test_search_recipe_page_uses_index_and_add_recipe(repo, sample_author, sample_category):
+    assert repo.search_recipe_page("lemonade", "name", 0, 10, sort_by="alphabetical").ids == [40]
+    assert repo.search_recipe_page("", "", 0, 10).ids == [40, 41, 38]
+
+    repo.add_recipe(Recipe(500, "Pink Lemonade", sample_author, category=sample_category))
+    assert repo.search_recipe_page("lemonade", "name", 0, 10, sort_by="alphabetical").ids == [40, 500]
+
+
+def test_catalogue_generation_changes_with_catalogue_writes(repo, sample_author, sample_category):
+    generation = repo.get_catalogue_generation()
+    assert repo.get_catalogue_generation() == generation
+
+    repo.add_recipe(Recipe(500, "Pink Lemonade", sample_author, category=sample_category))
+    after_recipe = repo.get_catalogue_generation()
+    assert after_recipe != generation
+
+    repo.add_author(sample_author.id, sample_author)
+    assert repo.get_catalogue_generation() != after_recipe
+
+
 def test_get_recipe_by_id(repo, sample_recipe):
     repo.add_recipe(sample_recipe)
     assert repo.get_recipe_by_id(38) == sample_recipe
     assert repo.get_recipe_by_id(99) is None
 
 
+def test_get_recipes_returns_one_sorted_page(repo, sample_author):
+    # names: "Best Lemonade" (40), "Carina's Tofu-Vegetable Kebabs" (41), "Low-Fat Berry Blue Frozen Dessert" (38)
+    assert [r.id for r in repo.get_recipes(1, 2, "name")] == [40, 41]
+    assert [r.id for r in repo.get_recipes(2, 2, "name")] == [38]
+    assert [r.id for r in repo.get_recipes(1, 2, "name_desc")] == [38, 41]
+    assert [r.id for r in repo.get_recipes(1, 3, "id_desc")] == [41, 40, 38]
+    assert [r.id for r in repo.get_recipes(1, 20, "unknown")] == [40, 41, 38]
+    assert repo.get_recipes(3, 2, "id") == []
+
+    repo.add_recipe(Recipe(39, "Best Lemonade", sample_author))
+    assert [r.id for r in repo.get_recipes(1, 2, "name")] == [39, 40]
+    # equal names keep ascending ids in both directions, like the database repository
+    assert [r.id for r in repo.get_recipes(1, 4, "name_desc")] == [38, 41, 39, 40]
+    assert [r.id for r in repo.get_recipes(1, 2, "id")] == [38, 39]
+
+
+def test_get_recipes_sorts_names_case_insensitively(repo, sample_author):
+    frozen = repo.get_recipe_by_id(40).category
+    repo.add_recipe(Recipe(500, "creamed corn", sample_author, category=frozen))
+
+    # "Best Lemonade", "Carina's ...", "creamed corn", "Low-Fat ..."
+    assert [r.id for r in repo.get_recipes(1, 4, "name")] == [40, 41, 500, 38]
+    assert [r.id for r in repo.get_recipes_after(("carina's tofu-vegetable kebabs", 41), 1, "name")] == [500]
+
+    # only ASCII letters are folded, as by lower() in the database
+    repo.add_recipe(Recipe(501, "Éclair", sample_author, category=frozen))
+    assert [r.id for r in repo.get_recipes(1, 5, "name")] == [40, 41, 500, 38, 501]
+    assert cursor_for(repo.get_recipe_by_id(501), "name") == ("Éclair", 501)
+
+
+def test_count_recipes_counts_distinct_ids(repo, sample_author):
+    assert repo.count_recipes() == 3
+    repo.add_recipe(Recipe(500, "Toast", sample_author))
+    repo.add_recipe(Recipe(500, "Toast again", sample_author))
+    assert repo.count_recipes() == 4
+
+
+def test_category_covers_follow_add_recipe(repo, sample_author):
+    frozen = repo.get_recipe_by_id(40).category
+    # "Best Lemonade" comes before "Low-Fat Berry Blue Frozen Dessert"
+    assert repo.get_category_cover_images()["Frozen Desserts"] == repo.get_recipe_by_id(40).images[0]
+    assert set(repo.get_category_cover_images()) == {"Frozen Desserts", "Soy/Tofu"}
+
+    repo.add_recipe(Recipe(500, "apple ice", sample_author, category=frozen))
+    assert repo.get_category_cover_images()["Frozen Desserts"] is None
+
+
+def test_get_recipes_after_seeks_past_the_cursor(repo):
+    for sort_method in ("name", "name_desc", "id", "id_desc"):
+        first = repo.get_recipes(1, 2, sort_method)
+        last = first[-1]
+        after = (last.id, last.id) if sort_method.startswith("id") else (last.name.lower(), last.id)
+        assert repo.get_recipes_after(None, 2, sort_method) == first
+        assert repo.get_recipes_after(after, 2, sort_method) == repo.get_recipes(2, 2, sort_method)
+
+
+def test_add_multiple_recipe_rebuilds_indexes(repo, sample_author):
+    repo.add_multiple_recipe([Recipe(7, "Toast", sample_author)])
+    assert repo.get_recipe_by_id(38) is None
+    assert repo.get_recipe_by_id(7).name == "Toast"
+    assert [r.id for r in repo.get_recipes(1, 10, "name")] == [7]
+
+
 # ----------------- Categories -----------------
 
 def test_get_categories(repo, sample_category):
@@ -90,4 +194,20 @@ def test_get_nutrition_by_recipe_id(repo):
     repo._MemoryRepository__nutrition = {1: n}
     result = repo.get_nutrition_by_recipe_id(1)
     assert result == n
-    assert repo.get_nutrition_by_recipe_id(99) is None
\ No newline at end of file
+    assert repo.get_nutrition_by_recipe_id(99) is None
+
+def test_get_nutrition_by_recipe_ids_skips_missing(repo):
+    nutrition = repo.get_nutrition_by_recipe_ids([41, 38, 99])
+    assert set(nutrition) == {41, 38}
+    assert nutrition[38] == repo.get_nutrition_by_recipe_id(38)
+
+def test_get_related_recipes(repo, sample_author):
+    # 40 shares the category of 38, 41 shares lemon juice; ties go to the lower id
+    assert [r.id for r in repo.get_related_recipes(38)] == [40, 41]
+    assert [r.id for r in repo.get_related_recipes(41)] == [38]
+    assert repo.get_related_recipes(999) == []
+
+    frozen = repo.get_recipe_by_id(38).category
+    repo.add_recipe(Recipe(500, "Blueberry Ice", sample_author, category=frozen,
+                           ingredients=["blueberries", "granulated sugar"]))
+    assert [r.id for r in repo.get_related_recipes(38, limit=1)] == [500]
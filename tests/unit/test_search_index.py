@@ -0,0 +1,171 @@
+import pytest
+
+from recipe.adapters.fulltext import match_expression
+from recipe.adapters.search_index import SearchIndex, intersect_postings, resolve_search_sort, tokenize
+
+
+def test_tokenize_lowercases_and_splits_words():
+    assert tokenize("Low-Fat Berry Blue") == ["low", "fat", "berry", "blue"]
+    assert tokenize("") == []
+
+
+def test_intersect_postings():
+    assert intersect_postings([[1, 3, 5, 7], [3, 7, 9], [0, 3, 7]]) == [3, 7]
+    assert intersect_postings([[1, 2], []]) == []
+    assert intersect_postings([]) == []
+    assert intersect_postings([list(range(0, 10000, 3)), [5, 9, 10, 2997, 9999]]) == [9, 2997, 9999]
+
+
+def test_index_built_from_recipes(recipes):
+    index = SearchIndex()
+    index.add_recipes(recipes)
+
+    assert len(index) == 3
+    assert index.search("cake", "name") == [1]
+    assert index.search("chicken", "ingredients") == [3]
+    assert index.search("chicken", "name") == []
+    assert index.search("main course", "category") == [2, 3]
+    assert index.search("chef") == [1, 3]
+
+
+def test_query_tokens_match_by_prefix_and_are_intersected(recipes):
+    index = SearchIndex()
+    index.add_recipes(recipes)
+
+    assert index.search("choc") == [1]
+    assert index.search("chef sal") == [3]
+    assert index.search("chef beef") == []
+
+
+def test_empty_query_returns_every_recipe(recipes):
+    index = SearchIndex()
+    index.add_recipes(recipes)
+
+    assert index.search("") == [1, 2, 3]
+
+
+def test_add_recipe_updates_index(recipes):
+    index = SearchIndex()
+    index.add_recipes(recipes[:2])
+    assert index.search("lettuce") == []
+
+    index.add_recipe(recipes[2])
+    index.add_recipe(recipes[2])
+    assert index.search("lettuce") == [3]
+    assert len(index) == 3
+
+
+def test_page_without_words_is_sorted_by_field(recipes):
+    index = SearchIndex()
+    index.add_recipes(recipes)
+
+    assert index.page("", "", 0, 3).ids == [2, 1, 3]
+    assert index.page("", "author", 0, 3).ids == [1, 3, 2]
+    assert index.page("", "ingredients", 0, 3).ids == [2, 1, 3]
+
+
+def test_completions_refresh_when_a_new_value_is_added(recipes):
+    index = SearchIndex()
+    index.add_recipes(recipes[:2])
+    assert index.suggestions.complete("s", "names") == []
+
+    index.add_recipe(recipes[2])
+    assert index.suggestions.complete("s", "names") == ["Salad Bowl"]
+    assert index.suggestions.complete("m", "authors") == ["Mary Berry"]
+    assert index.suggestions.counts("authors")["Chef John"] == 2
+
+
+def test_completions_match_prefix_ranked_by_recipe_count(recipes):
+    index = SearchIndex()
+    index.add_recipes(recipes)
+
+    assert index.suggestions.complete("c", "authors") == ["Chef John"]
+    assert index.suggestions.complete("CH", "ingredients") == ["chicken", "chocolate"]
+    assert index.suggestions.complete("", "names") == []
+    assert index.suggestions.complete("b", "names", limit=1) == ["Beef Stew"]
+
+
+def test_fulltext_match_expression_quotes_words():
+    assert match_expression("Chicken  garlic chicken") == '"chicken"* AND "garlic"*'
+    assert match_expression("cake", "name") == 'name : "cake"*'
+    assert match_expression("cake", "description") == '"cake"*'
+    assert match_expression('NOT "') is None
+    assert match_expression("  ") is None
+
+
+def test_fulltext_match_expression_maps_boolean_queries():
+    assert match_expression("ingredient:garlic author:dancer") == 'ingredients : "garlic"* AND author : "dancer"*'
+    assert match_expression('"Lemon Juice" OR lime NOT salt', "name") == \
+        'name : "lemon juice" OR (name : "lime"* NOT name : "salt"*)'
+    assert match_expression("cake pie NOT (nut OR seed)") == '("cake"* AND "pie"*) NOT ("nut"* OR "seed"*)'
+    # FTS5 has no unary NOT
+    assert match_expression("NOT chicken") is None
+    assert match_expression("cake OR NOT chicken") is None
+
+
+def test_boolean_phrase_and_field_queries(recipes):
+    index = SearchIndex()
+    index.add_recipes(recipes)
+
+    assert index.search("cake OR stew") == [1, 2]
+    assert index.search("main NOT beef") == [3]
+    assert index.search("NOT chef") == [2]
+    assert index.search("ingredient:chicken") == [3]
+    assert index.search("name:chicken") == []
+    # a field prefix wins over the selected filter
+    assert index.search("ingredient:beef", "name") == [2]
+    assert index.search('"chocolate cake"') == [1]
+    assert index.search('"cake chocolate"') == []
+    assert index.search("main AND (salad OR stew) NOT carrot") == [3]
+
+
+def _ranking_index():
+    index = SearchIndex()
+    index.add_entries([
+        (1, "Apple Pie", "Dessert", "Lemon Baker", ["flour", "butter"]),
+        (2, "Lemon Tart", "Dessert", "Baker", ["sugar", "flour"]),
+        (3, "Tea Cake", "Dessert", "Baker", ["lemon", "flour"]),
+        (4, "Plain Bun", "Bread", "Baker", ["lemon", "lemon zest"]),
+    ])
+    return index
+
+
+def test_page_weights_fields_and_keeps_the_top_k():
+    index = _ranking_index()
+
+    # a name match outweighs ingredients, which outweigh the author
+    assert index.page("lemon", "", 0, 4).ids == [2, 4, 3, 1]
+    assert index.page("lemon", "", 0, 2).ids == [2, 4]
+    # within a field a term used more often scores higher
+    assert index.page("lemon", "ingredients", 0, 4).ids == [4, 3]
+    # without words the field order is kept
+    assert index.page("", "", 0, 4).ids == [1, 2, 4, 3]
+
+
+def test_page_is_ranked_by_relevance_unless_alphabetical_is_asked_for():
+    index = _ranking_index()
+
+    assert index.page("lemon", "", 0, 2).ids == [2, 4]
+    assert index.page("lemon", "", 0, 4, sort_by="alphabetical").ids == [1, 2, 4, 3]
+    assert index.page("lemon", "", 0, 2).total == 4
+    # the in-memory index makes no snippets, and pages share no snippet dict
+    assert index.page("lemon", "", 0, 2).snippets is None
+
+    assert resolve_search_sort("lemon", None) == "relevance"
+    assert resolve_search_sort("", None) == "alphabetical"
+    assert resolve_search_sort("lemon", "alphabetical") == "alphabetical"
+
+
+@pytest.mark.parametrize("sort_by", ["relevance", "alphabetical"])
+def test_page_after_last_key_continues_like_the_offset_page(sort_by):
+    index = _ranking_index()
+    first = index.page("lemon", "", 0, 2, sort_by=sort_by)
+
+    following = index.page("lemon", "", 0, 2, after=first.last_key, sort_by=sort_by)
+    assert following == index.page("lemon", "", 2, 2, sort_by=sort_by)
+    assert index.page("lemon", "", 0, 2, after=following.last_key, sort_by=sort_by).ids == []
+    # a cursor of the other order is ignored
+    other = "alphabetical" if sort_by == "relevance" else "relevance"
+    assert index.page("lemon", "", 0, 2, after=index.page("lemon", "", 0, 2, sort_by=other).last_key,
+                      sort_by=sort_by) == first
+
@@ -1,3 +1,4 @@
+import threading
 from datetime import datetime
 
 import pytest
@@ -7,9 +8,17 @@ from recipe.authentication.services import AuthenticationException
 from recipe.authentication import services as auth_services
 from recipe.domainmodel.favourite import Favourite
 from recipe.domainmodel.review import Review
+from recipe.domainmodel.recipe import Recipe
+from recipe.domainmodel.author import Author
+from recipe.domainmodel.category import Category
 from recipe.recipe_detail import services as recipe_services
 from recipe.favorites import services as favorite_services
+from recipe.search_function import services as search_services
 from recipe.search_function.services import SearchService
+from recipe.adapters.ttl_cache import TTLCache
+from recipe.browse import services as browse_services
+from recipe.health import get_health_stars, health_stars_of
+from recipe.pagination import decode_cursor, encode_cursor
 from recipe.domainmodel.user import User
 from recipe.recipe_detail.services import ReviewException, FavouriteException
 
@@ -235,8 +244,6 @@ def test_search_by_name_filter(search_service):
     names = [r.name for r in out["recipes"]]
     assert names == ["Best Lemonade"]
     assert out["total_recipes"] == 1
-    assert "names" in out["suggestions"]
-    assert "Best Lemonade" in out["suggestions"]["names"]
 
 
 def test_search_by_ingredients_default(search_service):
@@ -262,12 +269,136 @@ def test_pagination_fields_and_counts(search_service):
     assert len(out["recipes"]) == 1
 
 
-def test_suggestions_structure(search_service):
-    out = search_service.search_recipes(query="", filter_by="")
-    s = out["suggestions"]
-    assert set(s.keys()) >= {"names", "authors", "categories", "ingredients"}
-    assert 'Best Lemonade' in s["names"]
+def test_search_cursor_continues_after_last_recipe(search_service):
+    first = search_service.search_recipes(query="", filter_by="", page=1, per_page=2)
+    cursor = first["pagination"]["next_cursor"]
+    second = search_service.search_recipes(query="", filter_by="", per_page=2, cursor=cursor)
+    by_page = search_service.search_recipes(query="", filter_by="", page=2, per_page=2)
+
+    assert second["pagination"]["page"] == 2
+    assert [r.id for r in second["recipes"]] == [r.id for r in by_page["recipes"]]
+    assert second["pagination"]["next_cursor"] is None
+
+    # a cursor without the sort value of its recipe is ignored, the page number is used
+    old = search_service.search_recipes(query="", filter_by="", page=1, per_page=2, cursor=encode_cursor(p=2, i=41))
+    assert old["pagination"]["page"] == 1
+
+
+def test_search_page_beyond_the_last_shows_the_last(search_service):
+    out = search_service.search_recipes(query="", filter_by="", page=9, per_page=2)
+    assert out["pagination"]["page"] == 2
+    assert [r.id for r in out["recipes"]] == [38]
+    assert out["snippets"] == {}
+
+
+def test_search_ranks_by_relevance_unless_alphabetical_is_asked_for(search_service):
+    ranked = search_service.search_recipes(query="lemon", filter_by="")
+    alphabetical = search_service.search_recipes(query="lemon", filter_by="", sort_by="alphabetical")
+
+    assert ranked["sort"] == "relevance"
+    assert ranked["recipes"][0].name == "Best Lemonade"
+    assert alphabetical["sort"] == "alphabetical"
+    assert [r.name for r in alphabetical["recipes"]] == sorted(r.name for r in ranked["recipes"])
+    assert search_service.search_recipes(query="", filter_by="")["sort"] == "alphabetical"
+
+
+def test_repeated_searches_are_served_from_the_result_cache(search_service, repo):
+    first = search_service.search_recipes(query="lemon", filter_by="")
+    again = search_service.search_recipes(query="  LEMON ", filter_by="")
+    assert [r.id for r in again["recipes"]] == [r.id for r in first["recipes"]]
+    assert search_service.cache_stats() == {'hits': 1, 'misses': 1, 'size': 1}
+
+    # a catalogue write makes the cached pages stale
+    author = repo.get_recipe_by_id(40).author
+    repo.add_recipe(Recipe(500, "Lemon Curd", author, category=repo.get_recipe_by_id(40).category))
+    after_write = search_service.search_recipes(query="lemon", filter_by="")
+    assert 500 in [r.id for r in after_write["recipes"]]
+    assert search_service.cache_stats()['misses'] == 2
+
+
+def test_result_cache_is_shared_safely_between_threads(repo):
+    # a tiny cache so threads keep evicting each other's pages
+    search_service = SearchService(repo, TTLCache(2, ttl=60))
+    queries = ["lemon", "tofu", "berry", "", "NOT lemon", "dessert"]
+    expected = {query: [r.id for r in search_service.search_recipes(query=query, filter_by="")["recipes"]]
+                for query in queries}
+    errors = []
+    start = threading.Barrier(6)
+
+    def worker(offset):
+        try:
+            start.wait()
+            for i in range(200):
+                query = queries[(offset + i) % len(queries)]
+                out = search_service.search_recipes(query=query, filter_by="")
+                assert [r.id for r in out["recipes"]] == expected[query]
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert search_service.cache_stats()['size'] <= 2
+
+
+def test_search_snippets_are_escaped_and_highlighted():
+    assert str(search_services.highlight("<b>Lemon</b> \x02Chicken\x03")) == \
+        "&lt;b&gt;Lemon&lt;/b&gt; <mark>Chicken</mark>"
+
+
+def test_cursor_round_trip_and_tampered_tokens():
+    assert decode_cursor(encode_cursor(p=2, k="Best Lemonade", i=40)) == {"p": 2, "k": "Best Lemonade", "i": 40}
+    for token in (None, "", "not base64!", encode_cursor(p=1)[:-2] + "~~"):
+        assert decode_cursor(token) is None
+
+
+def test_browse_cursor_page_matches_numbered_page(repo):
+    first, page = browse_services.get_recipe_page(repo, 1, 2)
+    cursor = browse_services.get_next_cursor(first, page)
+    second, page = browse_services.get_recipe_page(repo, 1, 2, cursor)
+
+    assert page == 2
+    assert second == browse_services.get_recipe_page(repo, 2, 2)[0]
+    # a broken cursor falls back to the page number
+    assert browse_services.get_recipe_page(repo, 1, 2, "garbage")[0] == first
+
+
+@pytest.mark.parametrize("values", [
+    {"p": 2, "k": 5, "i": 3},
+    {"p": 2, "k": None, "i": 3},
+    {"p": -4, "k": "Best Lemonade", "i": 40},
+    {"p": 2, "k": "Best Lemonade", "i": "40"},
+])
+def test_browse_tampered_cursor_falls_back_to_the_page_number(repo, values):
+    first, _ = browse_services.get_recipe_page(repo, 1, 2)
+    assert browse_services.get_recipe_page(repo, 1, 2, encode_cursor(**values)) == (first, 1)
+
+
+def test_browse_health_stars_only_for_given_recipes(repo):
+    recipes, _ = browse_services.get_recipe_page(repo, 1, 2)
+    health_stars = get_health_stars(recipes, repo)
+
+    assert set(health_stars) == {r.id for r in recipes}
+    assert health_stars[recipes[0].id] == repo.get_nutrition_by_recipe_id(recipes[0].id).calculate_health_stars()
+    assert browse_services.count_recipes(repo) == 3
+
+
+def test_health_stars_are_none_without_nutrition(repo, sample_author):
+    recipes = [repo.get_recipe_by_id(40), Recipe(500, "Toast", sample_author)]
+    health_stars = health_stars_of(recipes, repo.get_nutrition_by_recipe_ids([40]))
+    assert health_stars == {40: repo.get_nutrition_by_recipe_id(40).health_stars, 500: None}
+
+
+def test_browse_category_images_use_placeholder_without_image(repo):
+    repo.add_recipe(Recipe(500, "Aardvark Pie", Author(1, "Chef John"), category=Category("Pies", category_id=99)))
+    images = browse_services.get_category_images(repo)
 
+    assert images["Pies"] == browse_services.PLACEHOLDER_IMAGE
+    assert images["Frozen Desserts"].startswith("http")
 
 
 def test_empty_query_returns_all(search_service):
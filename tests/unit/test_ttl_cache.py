@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+
+from recipe.adapters.ttl_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(10, ttl=5, clock=clock)
+    cache.put("alice", True)
+
+    clock.now = 4.9
+    assert cache.get("alice") is True
+    clock.now = 5
+    assert cache.get("alice") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_discard_and_clear():
+    cache = TTLCache(4, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.discard("a")
+    cache.discard("missing")
+    assert cache.get("a", "gone") == "gone"
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_lookups_are_counted():
+    clock = FakeClock()
+    cache = TTLCache(4, ttl=5, clock=clock)
+    cache.get("a")
+    cache.put("a", 1)
+    cache.get("a")
+    clock.now = 5
+    cache.get("a")
+
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert cache.stats() == {'hits': 1, 'misses': 2, 'size': 0}
+
+
+def test_maxsize_must_be_positive():
+    with pytest.raises(ValueError):
+        TTLCache(0, ttl=60)
+
+
+def test_concurrent_gets_puts_and_discards():
+    clock = FakeClock()
+    cache = TTLCache(8, ttl=5, clock=clock)
+    errors = []
+    start = threading.Barrier(8)
+
+    def worker(offset):
+        try:
+            start.wait()
+            for i in range(2000):
+                key = (offset + i) % 16
+                cache.put(key, i)
+                cache.get(key)
+                cache.discard((key + 1) % 16)
+                if i % 100 == 0:
+                    # expire everything so gets race on deleting stale entries
+                    clock.now += 10
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(cache) <= 8
+    assert cache.hits + cache.misses == 8 * 2000
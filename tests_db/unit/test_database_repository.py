@@ -1,6 +1,14 @@
+import re
+from contextlib import contextmanager
 from datetime import datetime
 import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
 
+from recipe.adapters.orm import favorite_table
+from recipe.adapters.related_recipes import RelatedRecipesIndex
+from recipe.adapters.search_index import SORT_ALPHABETICAL, SearchIndex, resolve_search_sort
+from recipe.adapters.sorted_views import cursor_for
 from recipe.adapters.database_repository import SqlAlchemyRepository
 from recipe.domainmodel.user import User
 from recipe.domainmodel.recipe import Recipe
@@ -11,6 +19,21 @@ from recipe.domainmodel.author import Author
 from recipe.domainmodel.nutrition import Nutrition
 
 
+@contextmanager
+def count_statements(engine):
+    """ Collects the SQL statements run on the engine inside the with block, with their parameters. """
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+
 # ----------------------- USER TESTS -----------------------
 
 def test_can_add_and_retrieve_user(session_factory):
@@ -29,6 +52,20 @@ def test_get_user_returns_none_for_unknown_user(session_factory):
     assert repo.get_user("nonexistent") is None
 
 
+def test_user_exists_is_cached_until_the_user_is_removed(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    repo.add_user(User("carol", "Password123"))
+    with count_statements(session_factory.kw["bind"]) as statements:
+        assert repo.user_exists("carol")
+        assert repo.user_exists("carol")
+    assert len(statements) == 1
+    assert "password" not in statements[0][0]
+
+    repo.remove_user("carol")
+    assert not repo.user_exists("carol")
+    assert repo.get_user("carol") is None
+
+
 # ----------------------- RECIPE TESTS -----------------------
 
 def test_can_retrieve_all_recipes(session_factory):
@@ -174,6 +211,296 @@ def test_get_recipes_with_pagination(session_factory):
     assert page_1 != page_2
 
 
+def test_count_recipes_matches_all_recipes(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    assert repo.count_recipes() == len(repo.get_all_recipes())
+
+
+def test_category_covers_match_first_recipe_by_name(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    recipes = sorted(repo.get_all_recipes(), key=lambda r: r.name.lower())
+    covers = repo.get_category_cover_images()
+
+    for category_name, image in covers.items():
+        first = next(r for r in recipes if r.category.name == category_name)
+        assert image == (first.images[0] if first.images else None)
+    assert set(covers) == {r.category.name for r in recipes}
+
+
+def test_get_recipes_sorts_names_case_insensitively(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    expected = [r.id for r in sorted(repo.get_all_recipes(), key=lambda r: (r.name.lower(), r.id))]
+    assert [r.id for r in repo.get_recipes(1, len(expected), "name")] == expected
+
+
+@pytest.mark.parametrize("sort_method", ["name", "name_desc", "id", "id_desc"])
+def test_get_recipes_after_walks_the_same_pages_as_offsets(session_factory, sort_method):
+    repo = SqlAlchemyRepository(session_factory)
+    after = None
+    for page in range(1, 4):
+        recipes = repo.get_recipes_after(after, 7, sort_method)
+        assert [r.id for r in recipes] == [r.id for r in repo.get_recipes(page, 7, sort_method)]
+        after = cursor_for(recipes[-1], sort_method)
+
+
+def test_get_recipes_after_walks_non_ascii_names_like_offsets(session_factory):
+    # lower() in SQLite leaves É as it is, so "Éclair Cake" sorts after every ASCII name
+    repo = SqlAlchemyRepository(session_factory)
+    author, category = Author(9000, "Quibble Chef"), Category("Zanzibari", category_id=9000)
+    for recipe_id, name in ((9000, "Éclair Cake"), (9001, "éclair"), (9002, "Zucchini Bread"),
+                            (9003, "ÉCLAIR"), (9004, "apple tart")):
+        repo.add_recipe(Recipe(recipe_id, name, author, category=category))
+
+    for sort_method in ("name", "name_desc"):
+        expected = [r.id for r in repo.get_recipes(1, repo.count_recipes(), sort_method)]
+        walked, after = [], None
+        while recipes := repo.get_recipes_after(after, 2, sort_method):
+            walked.extend(r.id for r in recipes)
+            after = cursor_for(recipes[-1], sort_method)
+        assert walked == expected
+
+
+def test_get_recipes_loads_children_in_constant_number_of_queries(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    with count_statements(session_factory.kw["bind"]) as statements:
+        recipes = repo.get_recipes(page=1, page_size=50, sort_method="name")
+        names = [recipe.name for recipe in recipes]
+
+    assert len(names) == 50
+    assert all(recipe.images for recipe in recipes)
+    # one query for the recipes plus one per child table, independent of the page size
+    assert len(statements) <= 4
+
+
+def test_get_related_recipes_match_index_built_from_recipes(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    index = RelatedRecipesIndex()
+    recipes = sorted(repo.get_all_recipes(), key=lambda r: r.id)
+    for recipe in recipes:
+        index.add_entry(recipe.id, recipe.category.id, recipe.ingredients)
+
+    for recipe in recipes[:20]:
+        related = repo.get_related_recipes(recipe.id)
+        assert [r.id for r in related] == index.related(recipe.id)
+        assert recipe.id not in [r.id for r in related]
+    assert repo.get_related_recipes(999999999) == []
+
+
+def test_get_nutrition_by_recipe_ids_uses_one_query(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    ids = [r.id for r in repo.get_recipes(1, 30, "name")] + [999999999]
+    with count_statements(session_factory.kw["bind"]) as statements:
+        nutrition = repo.get_nutrition_by_recipe_ids(ids)
+        stars = [n.health_stars for n in nutrition.values()]
+
+    assert set(nutrition) == set(ids[:-1])
+    assert len(stars) == 30
+    assert len(statements) == 1
+
+
+def test_batched_children_match_single_recipe_load(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    batched = {r.id: r for r in repo.get_recipes_by_ids([38, 39, 40])}
+    single = repo.get_recipe_by_id(40)
+
+    assert batched[40].ingredients == single.ingredients
+    assert batched[40].instructions == single.instructions
+    assert batched[40].images == single.images
+
+
+@pytest.mark.parametrize("child_loading", ["selectin", "joined", "lazy"])
+def test_child_loading_strategies_give_same_recipe(session_factory, child_loading):
+    repo = SqlAlchemyRepository(session_factory)
+    default = repo.get_recipe_by_id(40)
+    recipe = repo.get_recipes_by_ids([40], child_loading=child_loading)[0]
+
+    assert recipe.images == default.images
+    assert recipe.ingredients == default.ingredients
+    assert recipe.instructions == default.instructions
+
+
+def test_unknown_child_loading_strategy_is_rejected(session_factory):
+    with pytest.raises(ValueError):
+        SqlAlchemyRepository(session_factory, child_loading="eager")
+
+
+
+# ----------------------- SEARCH TESTS -----------------------
+
+def test_search_recipe_page_matches_ingredients_and_loads_page(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    ids = repo.search_recipe_page("blueberries", "ingredients", 0, 10).ids
+
+    assert 38 in ids
+    recipes = repo.get_recipes_by_ids(ids[:3])
+    assert [r.id for r in recipes] == ids[:3]
+    assert all(any("blueberries" in i.lower() for i in r.ingredients) for r in recipes)
+
+
+def test_search_recipe_page_sorted_by_name(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    page = repo.search_recipe_page("chicken", "name", 0, repo.count_recipes(), sort_by="alphabetical")
+    recipes = repo.get_recipes_by_ids(page.ids)
+
+    names = [r.name.lower() for r in recipes]
+    assert names and names == sorted(names)
+    assert all("chicken" in name for name in names)
+
+
+def _memory_search_index(repo: SqlAlchemyRepository) -> SearchIndex:
+    """ The index the memory repository searches, over the recipes stored in the database. """
+    index = SearchIndex()
+    index.add_recipes(repo.get_recipes(1, repo.count_recipes(), "id"))
+    return index
+
+
+def test_fulltext_search_matches_the_index_for_a_field(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    expected = _memory_search_index(repo).search("blueberries", "ingredients")
+
+    first = repo.search_recipe_page("blueberries", "ingredients", 0, 5)
+    everything = repo.search_recipe_page("blueberries", "ingredients", 0, len(expected) + 10)
+
+    assert first.total == everything.total == len(expected)
+    assert sorted(everything.ids) == sorted(expected)
+    assert first.ids == everything.ids[:5]
+    assert all("\x02" in first.snippets[recipe_id] for recipe_id in first.ids)
+
+
+def test_fulltext_search_ranks_name_matches_first_and_resumes_after_a_recipe(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    page = repo.search_recipe_page("chicken", "", 0, 10)
+    names = [r.name.lower() for r in repo.get_recipes_by_ids(page.ids)]
+    assert "chicken" in names[0]
+
+    first = repo.search_recipe_page("chicken", "", 0, 5)
+    following = repo.search_recipe_page("chicken", "", 0, 5, after=first.last_key)
+    assert following.ids == page.ids[5:10]
+    assert following.last_key == page.last_key
+
+
+def test_fulltext_search_can_sort_alphabetically(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    page = repo.search_recipe_page("chicken", "", 0, 10, sort_by="alphabetical")
+    names = [r.name.lower() for r in repo.get_recipes_by_ids(page.ids)]
+    assert names == sorted(names)
+
+    first = repo.search_recipe_page("chicken", "", 0, 5, sort_by="alphabetical")
+    following = repo.search_recipe_page("chicken", "", 0, 5, after=first.last_key, sort_by="alphabetical")
+    assert following.ids == page.ids[5:10]
+
+
+@pytest.mark.parametrize("sort_by", ["relevance", "alphabetical"])
+def test_fulltext_search_walks_the_same_pages_by_cursor_as_by_offset(session_factory, sort_by):
+    repo = SqlAlchemyRepository(session_factory)
+    total = repo.search_recipe_page("chicken", "", 0, 1, sort_by=sort_by).total
+
+    walked, after = [], None
+    while (page := repo.search_recipe_page("chicken", "", 0, 25, after, sort_by)).ids:
+        walked.extend(page.ids)
+        after = page.last_key
+    assert walked == repo.search_recipe_page("chicken", "", 0, total, sort_by=sort_by).ids
+    assert len(walked) == total
+
+
+def test_fulltext_search_without_words(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    assert repo.search_recipe_page("", "", 0, 3).total == repo.count_recipes()
+    assert repo.search_recipe_page('" * :', "", 0, 3) == ([], 0, None, None)
+
+
+def test_both_search_backends_find_the_same_recipes(session_factory):
+    # the full-text table indexes the fields of the in-memory index and splits words the same way
+    repo = SqlAlchemyRepository(session_factory)
+    index = _memory_search_index(repo)
+    for query, filter_by in (("chicken", ""), ("_", ""), ("(a", ""), ("chicken", "category"),
+                             ("chicken NOT garlic", "name"), ("chicken OR beef", "name"),
+                             ('ingredient:garlic ingredient:"olive oil"', ""), ("NOT chicken", "name")):
+        expected = index.search(query, filter_by)
+        page = repo.search_recipe_page(query, filter_by, 0, len(expected) + 10)
+        assert expected, query
+        assert (query, page.total, sorted(page.ids)) == (query, len(expected), expected)
+
+
+@pytest.mark.parametrize("query, filter_by, sort_by", [
+    ("", "", None), ("", "ingredients", None), ("NOT chicken", "name", None),
+    ("NOT chicken", "", "alphabetical"), ("cake OR NOT chicken", "name", None),
+])
+def test_queries_fts5_cannot_run_alone_page_like_the_index(session_factory, query, filter_by, sort_by):
+    repo = SqlAlchemyRepository(session_factory)
+    expected = _memory_search_index(repo).page(query, filter_by, 0, repo.count_recipes(), sort_by=sort_by)
+    everything = repo.search_recipe_page(query, filter_by, 0, repo.count_recipes(), sort_by=sort_by)
+    assert everything.total == expected.total
+    if resolve_search_sort(query, sort_by) == SORT_ALPHABETICAL or not query.startswith("cake"):
+        assert everything.ids == expected.ids
+    else:
+        # both rank recipes with cake in the name first, by their own bm25 flavour
+        assert sorted(everything.ids) == sorted(expected.ids)
+
+    walked, after = [], None
+    while (page := repo.search_recipe_page(query, filter_by, 0, 200, after, sort_by)).ids:
+        walked.extend(page.ids)
+        after = page.last_key
+    assert walked == everything.ids
+
+
+def test_search_completions_match_the_suggestion_catalogue(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    catalogue = _memory_search_index(repo).suggestions
+    for prefix, group in (("ch", "names"), ("ch", "ingredients"), (" Des", "categories"), ("a", "authors"),
+                          ("zzzz", "names"), ("", "names")):
+        assert repo.get_search_completions(prefix, group, 5) == catalogue.complete(prefix, group, 5), prefix
+
+
+def test_add_recipe_is_searchable(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    category = Category("Zanzibari", category_id=987654)
+    author = Author(987654, "Quibble Chef")
+    recipe = Recipe(987654, "Quixotic Flatbread", author, category=category, description="a <b>bold</b> bread",
+                    ingredients=["spelt flour"])
+    repo.add_recipe(recipe)
+
+    assert repo.search_recipe_page("quixotic", "name", 0, 5).ids == [987654]
+    assert repo.search_recipe_page("spelt", "ingredients", 0, 5).ids == [987654]
+    # like the in-memory index, descriptions are not searched
+    assert repo.search_recipe_page("bold", "", 0, 5).ids == []
+
+
+def test_fulltext_search_keeps_accents_and_underscores_like_the_index(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    repo.add_recipe(Recipe(987657, "Crème Brûlée_Tart", Author(987657, "Quibble Baker"),
+                           category=Category("Zanzibari", category_id=987657)))
+    index = SearchIndex()
+    index.add_recipes([repo.get_recipe_by_id(987657)])
+
+    for query in ("brûlée_tart", "crème", "brulee", "tart"):
+        found = 987657 in repo.search_recipe_page(query, "name", 0, 50).ids
+        assert found == (index.search(query, "name") == [987657]), query
+    assert 987657 in repo.search_recipe_page("brûlée_", "name", 0, 50).ids
+    assert 987657 not in repo.search_recipe_page("brulee", "name", 0, 50).ids
+
+
+def test_catalogue_writes_change_the_generation(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    generation = repo.get_catalogue_generation()
+    repo.add_recipe(Recipe(987655, "Quiet Flatbread", Author(987655, "Quibble Cook"),
+                           category=Category("Zanzibari", category_id=987655)))
+    assert repo.get_catalogue_generation() != generation
+
+    generation = repo.get_catalogue_generation()
+    repo.rebuild_fulltext_index()
+    assert repo.get_catalogue_generation() != generation
+
+
+def test_catalogue_generation_is_shared_by_every_repository(session_factory):
+    # each worker process has its own repository, the generation lives in the database
+    repo, other_worker = SqlAlchemyRepository(session_factory), SqlAlchemyRepository(session_factory)
+    generation = other_worker.get_catalogue_generation()
+    repo.add_author(987656, Author(987656, "Quorum Cook"))
+    other_worker.reset_session()
+    assert other_worker.get_catalogue_generation() != generation
+
+
 # ----------------------- EDGE CASES -----------------------
 
 def test_get_user_favorites_returns_empty_list_for_new_user(session_factory):
@@ -193,3 +520,80 @@ def test_add_existing_user_does_not_duplicate(session_factory):
 
     retrieved = repo.get_user("frank")
     assert retrieved.username == "frank"
+
+
+# ----------------------- INDEX TESTS -----------------------
+
+def _query_plans(session_factory, action):
+    """ EXPLAIN QUERY PLAN details of every SELECT run by action, by queried table. """
+    engine = session_factory.kw["bind"]
+    with count_statements(engine) as statements:
+        action()
+
+    plans = {}
+    with engine.connect() as connection:
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith("SELECT"):
+                continue
+            table = re.search(r"\bFROM\s+(\w+)", statement).group(1)
+            details = [row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+            plans.setdefault(table, []).extend(details)
+    return plans
+
+
+def test_hot_queries_use_indexes(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    recipe = repo.get_recipes(1, 1, "name")[0]
+    recipe_id = recipe.id
+    repo.add_user(User("planner", "Password123"))
+    repo.add_favorite_recipe(Favourite("planner", recipe, recipe_id))
+    repo.reset_session()
+
+    def hot_queries():
+        repo.get_recipe_by_id(recipe_id)
+        [favourite.recipe.name for favourite in repo.get_user_favorites("planner")]
+        repo.get_user("planner").reviews
+        repo.get_recipes(1, 10, "name")
+
+    plans = _query_plans(session_factory, hot_queries)
+
+    for table, index in (("ingredient", "ix_ingredient_recipe_position"),
+                         ("instruction", "ix_instruction_recipe_position"),
+                         ("image", "ix_image_recipe_position"),
+                         ("favorite", "uq_favorite_username_recipe"),
+                         ("review", "ix_review_username")):
+        assert any(index in detail for detail in plans[table]), plans[table]
+    assert any("ix_recipe_lower_name_id" in detail for detail in plans["recipe"])
+    # no table is read in full without an index
+    assert not [detail for details in plans.values() for detail in details
+                if detail.startswith("SCAN") and "INDEX" not in detail]
+
+
+def test_search_without_words_and_completions_use_indexes(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    first = repo.search_recipe_page("", "", 0, 10)
+
+    def search_queries():
+        repo.search_recipe_page("", "", 0, 10, after=first.last_key)
+        repo.get_search_completions("ch", "names")
+        repo.get_search_completions("ch", "ingredients")
+
+    plans = _query_plans(session_factory, search_queries)
+
+    # the page after a cursor seeks in the index instead of reading the recipes before it
+    assert any(detail.startswith("SEARCH") and "ix_recipe_lower_name_id" in detail for detail in plans["recipe"])
+    assert any("ix_ingredient_lower_ingredient" in detail for detail in plans["ingredient"])
+
+
+def test_favorite_is_unique_per_user_and_recipe(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    recipe = repo.get_recipes(1, 1, "id")[0]
+    recipe_id = recipe.id
+    repo.add_user(User("twice", "Password123"))
+    repo.add_favorite_recipe(Favourite("twice", recipe, recipe_id))
+    repo.reset_session()
+    with pytest.raises(IntegrityError):
+        with session_factory() as session:
+            session.execute(favorite_table.insert().values(id=recipe_id, username="twice"))
+            session.commit()
+
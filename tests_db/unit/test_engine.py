@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool, SingletonThreadPool, NullPool
+
+from recipe.adapters.engine import PoolMetrics, create_database_engine
+
+
+def test_pragmas_are_set_on_new_connections(tmp_path):
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert connection.execute(text("PRAGMA temp_store")).scalar() == 2  # MEMORY
+        assert connection.execute(text("PRAGMA cache_size")).scalar() == -64 * 1024
+    assert isinstance(engine.pool, QueuePool)
+
+
+def test_pragmas_can_be_turned_off(tmp_path):
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'plain.db'}", pool='null', pragmas={})
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "delete"
+    assert isinstance(engine.pool, NullPool)
+
+
+def test_in_memory_database_is_not_queued():
+    engine = create_database_engine("sqlite://")
+    assert isinstance(engine.pool, SingletonThreadPool)
+
+
+def test_unknown_pool_is_rejected():
+    with pytest.raises(ValueError):
+        create_database_engine("sqlite://", pool='bogus')
+
+
+def test_pool_metrics_count_checkouts_and_reuse(tmp_path):
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'pooled.db'}")
+    metrics = PoolMetrics().install(engine)
+    for _ in range(3):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    stats = metrics.as_dict()
+    assert stats["checkouts"] == 3
+    assert stats["connections_opened"] == 1
+    assert stats["checked_out"] == 0
+    assert stats["peak_checked_out"] == 1
+    assert stats["connect_seconds_total"] == stats["connect_seconds_max"] > 0
+    assert stats["in_use_seconds_total"] >= stats["in_use_seconds_max"] > 0
+
+    # the listeners are on the engine, so the pool made by dispose() is measured too
+    engine.dispose()
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    stats = metrics.as_dict()
+    assert stats["checkouts"] == 4
+    assert stats["connections_opened"] == 2
@@ -1,5 +1,13 @@
-from sqlalchemy import select, inspect
+from sqlalchemy import select, inspect, create_engine, func, text
+from sqlalchemy.orm import sessionmaker
+
+from recipe.adapters import migrations, repository_populate
+from recipe.adapters.database_repository import SqlAlchemyRepository
+from recipe.adapters.bulk_loader import TABLES_IN_INSERT_ORDER
 from recipe.adapters.orm import mapper_registry
+from recipe.domainmodel.author import Author
+from recipe.domainmodel.nutrition import Nutrition
+from tests_db.conftest import TEST_DATA_PATH
 
 
 def test_database_populate_inspect_table_names(database_engine):
@@ -20,6 +28,14 @@ def test_database_populate_inspect_table_names(database_engine):
         "ingredient",
         "instruction",
         "image",
+        "catalogue",
+        # full-text search table and the shadow tables FTS5 keeps its index in
+        "recipe_fts",
+        "recipe_fts_config",
+        "recipe_fts_content",
+        "recipe_fts_data",
+        "recipe_fts_docsize",
+        "recipe_fts_idx",
     ]
 
     assert sorted(table_names) == sorted(expected)
@@ -146,6 +162,103 @@ def test_database_populate_select_all_nutrition(database_engine):
         assert first[2] > 0
 
 
+def test_database_populate_stores_health_stars(database_engine):
+    with database_engine.connect() as connection:
+        rows = connection.execute(select(mapper_registry.metadata.tables["nutrition"])).mappings().all()
+
+    assert rows
+    for row in rows:
+        expected = Nutrition(row["id"], saturated_fat=row["saturated_fat"], sugar=row["sugar"], sodium=row["sodium"],
+                             fiber=row["fiber"], protein=row["protein"]).calculate_health_stars()
+        assert row["health_stars"] == expected
+
+
+def test_migrate_adds_and_backfills_health_stars(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        # nutrition table as written by versions without the health_stars column
+        connection.execute(text(
+            "CREATE TABLE nutrition (id INTEGER PRIMARY KEY, recipe_id INTEGER NOT NULL, calories FLOAT, fat FLOAT, "
+            "saturated_fat FLOAT, cholesterol FLOAT, sodium FLOAT, carbohydrates FLOAT, fiber FLOAT, sugar FLOAT, "
+            "protein FLOAT)"
+        ))
+        connection.execute(text(
+            "INSERT INTO nutrition VALUES (1, 1, 100, 1, 6, 0, 500, 1, 9, 20, 12), (2, 2, 100, 1, 0.5, 0, 10, 1, 0, 0, 0)"
+        ))
+
+    migrations.migrate(engine)
+    migrations.migrate(engine)
+
+    with engine.connect() as connection:
+        stars = dict(connection.execute(text("SELECT id, health_stars FROM nutrition ORDER BY id")).all())
+    assert stars == {1: 0.5, 2: 5.0}
+    assert migrations.add_nutrition_health_stars(engine) == 0
+
+
+def test_migrate_adds_indexes_and_drops_duplicate_favorites(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        # favorite and ingredient tables as written by versions without indexes
+        connection.execute(text("CREATE TABLE favorite (PK INTEGER PRIMARY KEY, id INTEGER NOT NULL, "
+                                "username VARCHAR(255) NOT NULL)"))
+        connection.execute(text("CREATE TABLE ingredient (id INTEGER PRIMARY KEY, recipe_id INTEGER NOT NULL, "
+                                "ingredient VARCHAR(255), quantity VARCHAR(255), position INTEGER)"))
+        connection.execute(text("INSERT INTO favorite VALUES (1, 38, 'ann'), (2, 40, 'ann'), (3, 38, 'ann')"))
+
+    assert sorted(migrations.add_missing_indexes(engine)) == [
+        "ix_favorite_recipe", "ix_ingredient_lower_ingredient", "ix_ingredient_recipe_position",
+        "uq_favorite_username_recipe"
+    ]
+    assert migrations.add_missing_indexes(engine) == []
+
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT PK FROM favorite ORDER BY PK")).scalars().all() == [1, 2]
+    assert {index["name"] for index in inspect(engine).get_indexes("favorite")} == {
+        "ix_favorite_recipe", "uq_favorite_username_recipe"
+    }
+
+
+def test_migrate_adds_fulltext_table_for_stored_recipes(database_engine):
+    with database_engine.begin() as connection:
+        connection.execute(text("DROP TABLE recipe_fts"))
+
+    migrations.migrate(database_engine)
+    migrations.migrate(database_engine)
+
+    with database_engine.connect() as connection:
+        matches = connection.execute(text("SELECT rowid FROM recipe_fts WHERE recipe_fts MATCH 'lemonade'")).all()
+        rows = connection.execute(text("SELECT count(*) FROM recipe_fts")).scalar()
+    assert matches == [(40,)]
+    assert rows == 3
+
+
+def test_migrate_rebuilds_a_fulltext_table_of_an_earlier_version(database_engine):
+    with database_engine.begin() as connection:
+        connection.execute(text("DROP TABLE recipe_fts"))
+        connection.execute(text(
+            "CREATE VIRTUAL TABLE recipe_fts USING fts5(name, description, category, author, ingredients)"
+        ))
+
+    assert migrations.add_recipe_fulltext(database_engine)
+    assert not migrations.add_recipe_fulltext(database_engine)
+
+    with database_engine.connect() as connection:
+        columns = [row[1] for row in connection.execute(text("PRAGMA table_info(recipe_fts)"))]
+        rows = connection.execute(text("SELECT count(*) FROM recipe_fts")).scalar()
+    assert columns == ["name", "category", "author", "ingredients"]
+    assert rows == 3
+
+
+def test_migrate_adds_catalogue_table(database_engine):
+    with database_engine.begin() as connection:
+        connection.execute(text("DROP TABLE catalogue"))
+
+    migrations.migrate(database_engine)
+    migrations.migrate(database_engine)
+
+    assert "catalogue" in inspect(database_engine).get_table_names()
+
+
 def test_database_populate_select_all_favorites(database_engine):
     """
     Ensure favorite relationships between user and recipe are populated.
@@ -186,3 +299,47 @@ def test_database_populate_select_all_images(database_engine):
         assert isinstance(rid, int)
         assert isinstance(url, str)
         assert url.startswith("http") or url.endswith(".jpg") or url.endswith(".png")
+
+
+
+def _table_counts(engine):
+    with engine.connect() as connection:
+        return {
+            table.name: connection.execute(select(func.count()).select_from(table)).scalar()
+            for table in mapper_registry.metadata.sorted_tables
+        }
+
+
+def test_bulk_populate_loads_same_rows_as_orm_populate(database_engine):
+    """
+    The bulk (Core executemany) path must write the same rows as the ORM path, and loading twice must not duplicate.
+    """
+    bulk_engine = create_engine('sqlite://')
+    mapper_registry.metadata.create_all(bulk_engine)
+    repo = SqlAlchemyRepository(sessionmaker(autocommit=False, autoflush=True, bind=bulk_engine))
+
+    repository_populate.populate(TEST_DATA_PATH, repo, database_mode=True, bulk=True, batch_size=7)
+    counts = _table_counts(bulk_engine)
+
+    assert counts == _table_counts(database_engine)
+    assert counts["recipe"] == 3
+
+    # every table the loader writes, child rows with generated ids included
+    repository_populate.populate(TEST_DATA_PATH, repo, database_mode=True, bulk=True)
+    assert _table_counts(bulk_engine) == counts
+    assert all(counts[table.name] > 0 for table in TABLES_IN_INSERT_ORDER)
+
+
+def test_bulk_loader_counts_only_inserted_rows():
+    engine = create_engine('sqlite://')
+    mapper_registry.metadata.create_all(engine)
+    repo = SqlAlchemyRepository(sessionmaker(autocommit=False, autoflush=True, bind=engine))
+
+    with repo.bulk_loader(batch_size=2) as loader:
+        for author_id in (1, 2, 1, 2, 3):
+            loader.add_author(Author(author_id, f"Author {author_id}"))
+    assert loader.rows_written == 3
+
+    with repo.bulk_loader() as loader:
+        loader.add_author(Author(1, "Author 1"))
+    assert loader.rows_written == 0